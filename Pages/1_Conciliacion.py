@@ -1,16 +1,25 @@
 # -*- coding: utf-8 -*-
 
+import io
 import streamlit as st
 import pandas as pd
 import numpy as np
-from io import BytesIO
 import sys
 import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 # Agregar la carpeta padre al path para importar reconciliacion
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from reconciliacion import conciliacion_mvp, is_previous_result, extract_mayor_from_previous, merge_with_previous
+from almacen import AlmacenConciliacion
+from cache_resultados import CacheResultados
+from exportacion import exportar
+from ingesta import guardar_instantanea, leer_lado
+from segundo_plano import TrabajoEnSegundoPlano
+from vista_resultados import IndiceDetalle
+from reconciliacion import COLUMNAS_CUENTA, DIRECCIONES, MODOS_ASIGNACION, LibroNormalizado, MetricasConciliacion, conciliacion_mvp, conciliacion_por_cuenta, is_previous_result, extract_mayor_from_previous, merge_with_previous
 
 # Configuración de página
 st.set_page_config(
@@ -135,13 +144,57 @@ max_items_grupo = st.sidebar.number_input(
     min_value=1,
     max_value=10,
     value=3,
-    help="Número máximo de registros del Mayor que se pueden agrupar para conciliar con un registro del Banco"
+    help="Número máximo de registros que se pueden agrupar para conciliar con un único registro del otro lado"
 )
 
 direccion = st.sidebar.selectbox(
     "Dirección de agrupación",
-    ["MAYOR→BANCO", "BANCO→MAYOR"],
-    help="Dirección para la agrupación: varios registros del Mayor hacia uno del Banco, o viceversa"
+    DIRECCIONES,
+    help="Dirección para la agrupación: varios registros del Mayor hacia uno del Banco, o viceversa. "
+         "AMBAS ejecuta primero MAYOR→BANCO y luego BANCO→MAYOR"
+)
+
+st.sidebar.subheader("🧮 Asignación")
+modo_asignacion = st.sidebar.selectbox(
+    "Modo de asignación one-to-one",
+    MODOS_ASIGNACION,
+    help="greedy: cada registro del Banco toma su mejor candidato en orden. "
+         "optimo: maximiza la cantidad de pares y minimiza las diferencias en conjunto"
+)
+
+procesos = st.sidebar.number_input(
+    "Procesos",
+    min_value=1,
+    max_value=os.cpu_count() or 1,
+    value=1,
+    help="Cantidad de procesos para el one-to-one greedy y la agrupación. "
+         "El resultado es el mismo que con un solo proceso"
+)
+
+st.sidebar.subheader("💾 Almacén incremental")
+usar_almacen = st.sidebar.checkbox(
+    "Guardar estado entre corridas",
+    help="Guarda las filas y los matches en un archivo local. Cada corrida carga solo las filas "
+         "nuevas y las concilia contra las partidas abiertas, sin reprocesar la historia"
+)
+ruta_almacen = st.sidebar.text_input(
+    "Archivo del almacén",
+    value="conciliacion.sqlite",
+    disabled=not usar_almacen
+)
+
+st.sidebar.subheader("🏷️ Cuentas")
+por_cuenta = st.sidebar.checkbox(
+    "Conciliar por cuenta",
+    disabled=usar_almacen,
+    help="Para un Mayor con varias cuentas bancarias: el Banco solo se compara con las filas del "
+         "Mayor de la cuenta del extracto, sin matches cruzados entre cuentas. No aplica con el almacén"
+) and not usar_almacen
+columna_cuenta = st.sidebar.selectbox(
+    "Columna de cuenta del Mayor",
+    COLUMNAS_CUENTA,
+    index=COLUMNAS_CUENTA.index("Cuenta"),
+    disabled=not por_cuenta
 )
 
 # Sección principal
@@ -153,7 +206,7 @@ with col1:
     st.subheader("📊 Archivo del Mayor")
     mayor_file = st.file_uploader(
         "Selecciona el archivo del Mayor",
-        type=['csv', 'xlsx', 'xls'],
+        type=['csv', 'xlsx', 'xls', 'parquet', 'arrow', 'feather'],
         key="mayor_upload",
         help="Archivo con los registros contables del Mayor"
     )
@@ -162,7 +215,7 @@ with col2:
     st.subheader("🏦 Archivo del Banco")
     banco_file = st.file_uploader(
         "Selecciona el archivo del Banco",
-        type=['csv', 'xlsx', 'xls'],
+        type=['csv', 'xlsx', 'xls', 'parquet', 'arrow', 'feather'],
         key="banco_upload",
         help="Archivo con el extracto bancario"
     )
@@ -172,43 +225,103 @@ st.markdown('<div class="section-header"><h3>🔄 Resultado Previo (Opcional)</h
 
 resultado_previo_file = st.file_uploader(
     "Archivo de resultado previo para combinar",
-    type=['csv', 'xlsx', 'xls'],
+    type=['csv', 'xlsx', 'xls', 'parquet'],
     key="previo_upload",
     help="Archivo de un resultado de conciliación anterior que se combinará con el nuevo resultado"
 )
 
 # Función para cargar archivos
 @st.cache_data
-def load_file(file):
-    """Carga un archivo CSV o Excel"""
+def load_file(file, lado=None):
+    """Carga un archivo CSV, Excel, Parquet o Arrow. Con `lado` ("MAYOR"/"BANCO") lo lee ya normalizado y por bloques."""
     if file is None:
         return None
     
     try:
+        if lado is not None:
+            return leer_lado(file, lado, nombre=file.name)
         if file.name.endswith('.csv'):
             return pd.read_csv(file)
+        elif file.name.endswith('.parquet'):
+            return pd.read_parquet(file)
         else:
             return pd.read_excel(file)
     except Exception as e:
         st.error(f"Error al cargar el archivo {file.name}: {str(e)}")
         return None
 
-# Función para convertir DataFrame a Excel
+# Instantánea Arrow del lado normalizado: subida en lugar del archivo original, no se vuelve a parsear
+@st.cache_data
+def snapshot_bytes(file, lado):
+    """Devuelve la instantánea normalizada de un archivo ya cargado, como bytes para descargar"""
+    salida = io.BytesIO()
+    guardar_instantanea(load_file(file, lado), lado, salida)
+    return salida.getvalue()
+
+# Lado normalizado y ordenado una sola vez por archivo: cambiar tolerancias no vuelve a parsear
+@st.cache_resource
+def load_libro(file, lado):
+    """Devuelve el LibroNormalizado de un archivo ya cargado"""
+    df = load_file(file, lado)
+    return LibroNormalizado(df, lado) if df is not None else None
+
+# Cache de resultados en disco, compartido entre sesiones y con los procesos batch
+@st.cache_resource
+def get_result_cache():
+    """Devuelve la cache de resultados del motor"""
+    return CacheResultados()
+
+# Hilos para correr las conciliaciones fuera de la ejecución del script, compartidos entre sesiones
+@st.cache_resource
+def get_executor():
+    """Devuelve el ejecutor de conciliaciones en segundo plano"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="conciliacion")
+
+def run_reconciliation(df_mayor, df_banco, df_previo, parametros, opciones_por_cuenta, ruta_almacen, cache, progreso):
+    """
+    Corre la conciliación completa (almacén, o motor y combinación con el resultado previo) en un
+    hilo del ejecutor. No usa Streamlit: devuelve detalle, resumen, métricas y mensajes para mostrar.
+    """
+    metricas = MetricasConciliacion()
+    mensajes = []
+    if ruta_almacen is not None:
+        with AlmacenConciliacion(ruta_almacen) as almacen:
+            corrida = almacen.conciliar(df_mayor, df_banco, metricas=metricas, progreso=progreso, **parametros)
+            detalle = almacen.detalle()
+            resumen = almacen.resumen()
+        mensajes.append(
+            f"💾 Corrida {corrida.id}: {corrida.nuevas_mayor} filas nuevas del Mayor, "
+            f"{corrida.nuevas_banco} del Banco, {corrida.matches} matches nuevos"
+        )
+    else:
+        detalle, resumen = (conciliacion_por_cuenta if opciones_por_cuenta else conciliacion_mvp)(
+            df_mayor, df_banco, cache=cache, metricas=metricas, progreso=progreso,
+            **parametros, **opciones_por_cuenta
+        )
+        # Combinar con resultado previo si existe
+        if df_previo is not None:
+            mensajes.append("🔗 Resultado combinado con el resultado previo")
+            detalle = merge_with_previous(df_previo, detalle)
+            cantidades = detalle["estado"].value_counts()
+            resumen = cantidades[cantidades > 0].rename_axis("estado").reset_index(name="cantidad")
+    return detalle, resumen, metricas.tabla(), mensajes
+
+# Función para exportar resultados
 @st.cache_data
-def convert_to_excel(df):
-    """Convierte DataFrame a bytes de Excel"""
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Conciliacion')
-    return output.getvalue()
+def export_results(resultado_id, _detalle, _resumen, formato, _metricas=None):
+    """
+    Exporta detalle y resumen (y las métricas, en el Excel) a bytes en el formato pedido.
+    La cache se identifica por `resultado_id`: no vuelve a hashear el detalle en cada corrida.
+    """
+    return exportar(_detalle, _resumen, formato, metricas=_metricas)
 
 # Procesamiento principal
 if mayor_file is not None and banco_file is not None:
     
     # Cargar archivos
     with st.spinner("Cargando archivos..."):
-        df_mayor = load_file(mayor_file)
-        df_banco = load_file(banco_file)
+        df_mayor = load_file(mayor_file, "MAYOR")
+        df_banco = load_file(banco_file, "BANCO")
         df_previo = load_file(resultado_previo_file) if resultado_previo_file else None
     
     if df_mayor is not None and df_banco is not None:
@@ -230,101 +343,216 @@ if mayor_file is not None and banco_file is not None:
             else:
                 st.metric("🔄 Registros Previos", 0)
         
-        # Botón de procesamiento
-        if st.button("🚀 Ejecutar Conciliación", type="primary", use_container_width=True):
-            
-            with st.spinner("Procesando conciliación..."):
-                try:
+        # Filas descartadas al parsear fechas e importes
+        for nombre, df_lado in (("Mayor", df_mayor), ("Banco", df_banco)):
+            rechazos = df_lado.attrs.get("rechazos", {})
+            if rechazos.get("filas"):
+                st.warning(
+                    f"⚠️ {nombre}: {rechazos['filas']} filas descartadas "
+                    f"({rechazos['importe']} con importe inválido, {rechazos['fecha']} con fecha inválida)"
+                )
+        
+        # Instantáneas normalizadas para las próximas corridas (solo si se piden: ocupan memoria)
+        with st.expander("💾 Instantáneas normalizadas"):
+            st.caption(
+                "Guardan cada lado ya normalizado en formato Arrow; subidas en lugar del archivo original "
+                "se abren sin volver a leer ni parsear fechas e importes."
+            )
+            if st.checkbox("Preparar instantáneas", key="preparar_instantaneas"):
+                col1, col2 = st.columns(2)
+                for col, nombre, archivo, lado in ((col1, "Mayor", mayor_file, "MAYOR"), (col2, "Banco", banco_file, "BANCO")):
+                    with col:
+                        st.download_button(
+                            label=f"📥 Instantánea del {nombre}",
+                            data=snapshot_bytes(archivo, lado),
+                            file_name=f"{os.path.splitext(archivo.name)[0]}_normalizado.arrow",
+                            mime="application/vnd.apache.arrow.file",
+                            use_container_width=True,
+                        )
+        
+        # Cuenta del Mayor a la que pertenece el extracto bancario
+        if por_cuenta:
+            cuentas_mayor = sorted(df_mayor[columna_cuenta].dropna().astype(str).str.strip().unique())
+            cuenta_banco = st.selectbox("🏷️ Cuenta del extracto bancario", cuentas_mayor)
+        
+        # Botón de procesamiento: la conciliación corre en segundo plano y la página sigue su avance
+        en_curso = 'trabajo' in st.session_state
+        if st.button("🚀 Ejecutar Conciliación", type="primary", use_container_width=True, disabled=en_curso):
+            parametros = {
+                "tolerancia_dias": tolerancia_dias,
+                "max_items_grupo": max_items_grupo,
+                "direccion": direccion,
+                "tolerancia_valor": tolerancia_valor,
+                "modo_asignacion": modo_asignacion,
+                "procesos": procesos,
+            }
+            with st.spinner("Preparando archivos..."):
+                if usar_almacen:
+                    entrada = (df_mayor, df_banco, None, parametros, {}, ruta_almacen, None)
+                else:
                     # Determinar el DataFrame del Mayor a usar
-                    if df_previo is not None and is_previous_result(df_previo):
+                    previo = df_previo is not None and is_previous_result(df_previo)
+                    if previo:
                         st.info("📋 Detectado resultado previo. Extrayendo datos del Mayor...")
                         df_mayor_usar = extract_mayor_from_previous(df_previo)
                     else:
-                        df_mayor_usar = df_mayor
-                    
-                    # Ejecutar conciliación
-                    detalle, resumen = conciliacion_mvp(
-                        df_mayor_usar,
-                        df_banco,
-                        tolerancia_dias=tolerancia_dias,
-                        max_items_grupo=max_items_grupo,
-                        direccion=direccion,
-                        tolerancia_valor=tolerancia_valor
+                        df_mayor_usar = load_libro(mayor_file, "MAYOR")
+                    opciones_por_cuenta = (
+                        {"cuentas_banco": cuenta_banco, "columna_cuenta": columna_cuenta} if por_cuenta else {}
+                    )
+                    entrada = (
+                        df_mayor_usar, load_libro(banco_file, "BANCO"), df_previo if previo else None,
+                        parametros, opciones_por_cuenta, None, get_result_cache(),
                     )
-                    
-                    # Combinar con resultado previo si existe
-                    if df_previo is not None and is_previous_result(df_previo):
-                        st.info("🔗 Combinando con resultado previo...")
-                        detalle = merge_with_previous(df_previo, detalle)
-                        resumen = detalle["estado"].value_counts().rename_axis("estado").reset_index(name="cantidad")
-                    
-                    # Guardar en session_state
-                    st.session_state['detalle'] = detalle
-                    st.session_state['resumen'] = resumen
-                    
-                    st.success("✅ Conciliación completada exitosamente!")
-                    
-                except Exception as e:
-                    st.error(f"❌ Error durante la conciliación: {str(e)}")
-                    st.exception(e)
+            st.session_state['trabajo'] = TrabajoEnSegundoPlano(get_executor(), run_reconciliation, *entrada)
+
+# Avance de la conciliación en curso, o su resultado cuando termina
+if 'trabajo' in st.session_state:
+    trabajo = st.session_state['trabajo']
+    if not trabajo.terminado:
+        st.progress(
+            trabajo.fraccion,
+            text=f"⏳ {trabajo.fase or 'En espera'}: {trabajo.hechos:,} de {trabajo.total:,} ({trabajo.segundos:.0f}s)"
+        )
+        if st.button("⛔ Cancelar conciliación"):
+            trabajo.cancelar()
+    else:
+        del st.session_state['trabajo']
+        if trabajo.cancelado:
+            st.warning("⛔ Conciliación cancelada")
+        else:
+            try:
+                detalle, resumen, metricas, mensajes = trabajo.resultado()
+            except Exception as e:
+                st.error(f"❌ Error durante la conciliación: {str(e)}")
+                st.exception(e)
+            else:
+                # Guardar en session_state
+                st.session_state['detalle'] = detalle
+                st.session_state['resumen'] = resumen
+                st.session_state['metricas'] = metricas
+                st.session_state['indice'] = IndiceDetalle(detalle)
+                st.session_state['resultado_id'] = uuid.uuid4().hex
+                for mensaje in mensajes:
+                    st.info(mensaje)
+                st.success(f"✅ Conciliación completada exitosamente en {trabajo.segundos:.1f}s!")
 
 # Mostrar resultados si existen
 if 'detalle' in st.session_state and 'resumen' in st.session_state:
     
     detalle = st.session_state['detalle']
     resumen = st.session_state['resumen']
+    metricas = st.session_state.get('metricas')
+    # Índice armado una vez por resultado: conteos, posiciones por estado y grupo, fechas e importes
+    if 'indice' not in st.session_state:
+        st.session_state['indice'] = IndiceDetalle(detalle)
+        st.session_state['resultado_id'] = uuid.uuid4().hex
+    indice = st.session_state['indice']
+    resultado_id = st.session_state['resultado_id']
     
     st.markdown('<div class="section-header"><h3>📊 Resultados de la Conciliación</h3></div>', unsafe_allow_html=True)
     
-    # Resumen en métricas
+    # Resumen en métricas (de los conteos por estado del índice)
     col1, col2, col3, col4 = st.columns(4)
     
-    total_registros = len(detalle)
-    conciliados = len(detalle[detalle['estado'].str.contains('Conciliado', na=False)])
-    solo_mayor = len(detalle[detalle['estado'] == 'Solo en Mayor'])
-    solo_banco = len(detalle[detalle['estado'] == 'Solo en Banco'])
-    
     with col1:
-        st.metric("📋 Total Registros", total_registros)
+        st.metric("📋 Total Registros", len(indice))
     with col2:
-        st.metric("✅ Conciliados", conciliados)
+        st.metric("✅ Conciliados", indice.conciliados)
     with col3:
-        st.metric("📊 Solo en Mayor", solo_mayor)
+        st.metric("📊 Solo en Mayor", indice.cantidad('Solo en Mayor'))
     with col4:
-        st.metric("🏦 Solo en Banco", solo_banco)
+        st.metric("🏦 Solo en Banco", indice.cantidad('Solo en Banco'))
     
     # Resumen detallado
     st.subheader("📈 Resumen por Estado")
     st.dataframe(resumen, use_container_width=True)
     
-    # Detalle completo
-    st.subheader("📋 Detalle Completo")
-    st.dataframe(detalle, use_container_width=True)
+    # Tiempos y tamaños de cada fase del motor
+    if metricas is not None:
+        with st.expander("⏱️ Métricas por fase"):
+            st.dataframe(metricas, use_container_width=True)
+            st.download_button(
+                label="📥 Descargar Métricas (CSV)",
+                data=metricas.to_csv(index=False).encode("utf-8"),
+                file_name=f"conciliacion_metricas_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                mime="text/csv"
+            )
+    
+    # Detalle filtrado y paginado: al navegador solo viaja la página pedida
+    st.subheader("📋 Detalle")
+    
+    col1, col2, col3 = st.columns([2, 1, 2])
+    with col1:
+        estados_filtro = st.multiselect("Estado", indice.estados, default=indice.estados)
+    with col2:
+        grupo_filtro = st.text_input("Grupo", placeholder="G12").strip()
+    with col3:
+        rango = indice.rango_fechas()
+        fechas_filtro = st.date_input(
+            "Fechas", value=rango, min_value=rango[0], max_value=rango[1]
+        ) if rango else ()
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        importe_min = st.number_input("Importe desde (valor absoluto)", min_value=0.0, value=None, step=100.0)
+    with col2:
+        importe_max = st.number_input("Importe hasta (valor absoluto)", min_value=0.0, value=None, step=100.0)
+    
+    desde = fechas_filtro[0] if len(fechas_filtro) > 0 else None
+    hasta = fechas_filtro[1] if len(fechas_filtro) > 1 else None
+    posiciones = indice.filtrar(
+        estados=estados_filtro if len(estados_filtro) < len(indice.estados) else None,
+        grupo_id=grupo_filtro or None,
+        desde=desde if rango and desde != rango[0] else None,
+        hasta=hasta if rango and hasta != rango[1] else None,
+        importe_min=importe_min,
+        importe_max=importe_max,
+    )
+    
+    with col3:
+        tamano_pagina = st.selectbox("Filas por página", [50, 100, 500, 1000], index=1)
+    paginas = max(1, -(-len(posiciones) // tamano_pagina))
+    with col4:
+        # La clave depende de los filtros: al cambiarlos se vuelve a la primera página
+        filtros = (tuple(estados_filtro), grupo_filtro, desde, hasta, importe_min, importe_max, tamano_pagina)
+        pagina = st.number_input(
+            f"Página (de {paginas})", min_value=1, max_value=paginas, value=1,
+            key=f"pagina_{resultado_id}_{hash(filtros)}"
+        )
+    
+    inicio_pagina = (pagina - 1) * tamano_pagina
+    st.caption(
+        f"Filas {min(inicio_pagina + 1, len(posiciones)):,}–{min(inicio_pagina + tamano_pagina, len(posiciones)):,} "
+        f"de {len(posiciones):,} filtradas ({len(indice):,} en total)"
+    )
+    st.dataframe(indice.pagina(posiciones, pagina, tamano_pagina), use_container_width=True)
     
     # Botones de descarga
     st.markdown('<div class="section-header"><h3>💾 Descargar Resultados</h3></div>', unsafe_allow_html=True)
     
     col1, col2 = st.columns(2)
+    marca = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
     
     with col1:
-        # Descarga del detalle
-        excel_data = convert_to_excel(detalle)
+        # Excel con hojas Detalle, Resumen y Métricas
+        excel_data = export_results(resultado_id, detalle, resumen, "xlsx", metricas)
         st.download_button(
-            label="📥 Descargar Detalle (Excel)",
+            label="📥 Descargar Detalle, Resumen y Métricas (Excel)",
             data=excel_data,
-            file_name=f"conciliacion_detalle_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+            file_name=f"conciliacion_{marca}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             use_container_width=True
         )
     
     with col2:
-        # Descarga del resumen
-        resumen_excel = convert_to_excel(resumen)
+        # Detalle en formatos para otros sistemas
+        formato = st.selectbox("Formato alternativo del detalle", ["csv", "parquet"], label_visibility="collapsed")
         st.download_button(
-            label="📊 Descargar Resumen (Excel)",
-            data=resumen_excel,
-            file_name=f"conciliacion_resumen_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            label=f"📄 Descargar Detalle ({formato.upper()})",
+            data=export_results(resultado_id, detalle, resumen, formato),
+            file_name=f"conciliacion_detalle_{marca}.{formato}",
+            mime="text/csv" if formato == "csv" else "application/octet-stream",
             use_container_width=True
         )
 
@@ -333,13 +561,13 @@ with st.expander("ℹ️ Ayuda y Documentación"):
     st.markdown("""
     ### 🔧 Cómo usar esta herramienta:
     
-    1. **Carga de archivos**: Selecciona los archivos del Mayor y del Banco en formato CSV o Excel.
+    1. **Carga de archivos**: Selecciona los archivos del Mayor y del Banco en formato CSV, Excel, Parquet o una instantánea normalizada (.arrow).
     
     2. **Configuración de tolerancias**:
        - **Tolerancia de fechas**: Días de diferencia permitidos entre fechas
        - **Tolerancia de valor**: Diferencia máxima permitida entre importes
     
-    3. **Agrupación**: Configura si quieres agrupar varios registros del Mayor con uno del Banco.
+    3. **Agrupación**: Configura si quieres agrupar varios registros del Mayor con uno del Banco, varios del Banco con uno del Mayor, o ambas.
     
     4. **Resultado previo**: Opcionalmente, carga un resultado anterior para combinarlo con el nuevo.
     
@@ -347,7 +575,7 @@ with st.expander("ℹ️ Ayuda y Documentación"):
     - **Conciliado exacto**: Fechas e importes coinciden exactamente
     - **Conciliado por tolerancia de fecha**: Importes iguales, fechas dentro de tolerancia
     - **Conciliado por tolerancia de valor**: Fechas iguales, importes dentro de tolerancia
-    - **Conciliado por agrupación**: Varios registros del Mayor suman el importe del Banco
+    - **Conciliado por agrupación**: Varios registros de un lado suman el importe de un registro del otro
     - **Solo en Mayor**: Registros que no tienen correspondencia en el Banco
     - **Solo en Banco**: Registros que no tienen correspondencia en el Mayor
     
@@ -364,4 +592,9 @@ st.markdown("""
     <p>🏢 <strong>Ofizant</strong> - Conciliación Bancaria v1.0</p>
     <p><em>Optimizando procesos financieros</em></p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Mientras haya una conciliación en curso, volver a correr el script para actualizar el avance
+if 'trabajo' in st.session_state:
+    time.sleep(0.5)
+    st.rerun()
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+Almacén persistente para conciliación incremental (SQLite).
+
+Guarda las filas normalizadas del Mayor y del Banco bajo una huella de contenido estable,
+junto con los matches encontrados. Cada corrida carga solo las filas nuevas, concilia contra
+las partidas abiertas (las que todavía no tienen match) y agrega los matches nuevos: el costo
+depende de lo nuevo y de lo pendiente, no de la historia ya conciliada.
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from reconciliacion import (
+    BANCO_COLS,
+    COLUMNAS_NORMALIZADAS,
+    ESTADOS,
+    MAYOR_COLS,
+    armar_detalle,
+    conciliacion_mvp,
+    normalizar_fragmento,
+    texto_clave,
+)
+
+_ESQUEMAS = {"MAYOR": MAYOR_COLS, "BANCO": BANCO_COLS}
+_TABLAS = {"MAYOR": "mayor", "BANCO": "banco"}
+
+# Columnas de fecha e importe de cada lado: en la huella entran ya normalizadas
+_COLUMNAS_VALOR = {"MAYOR": ("Fecha", "Importe"), "BANCO": ("FECHA", "IMPORTE")}
+
+# Versión de las huellas guardadas (PRAGMA user_version); al cambiar se recalculan al abrir
+_VERSION_HUELLAS = 1
+
+
+class Corrida(NamedTuple):
+    """Resultado de una corrida incremental."""
+    id: int
+    nuevas_mayor: int
+    nuevas_banco: int
+    matches: int
+
+
+def _q(nombre: str) -> str:
+    """Nombre de columna entre comillas para SQL (los del esquema tienen espacios y acentos)."""
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def _opciones_registrables(opciones: dict) -> dict:
+    """Opciones con valores simples (texto, números, None), las que se guardan como JSON."""
+    return {k: v for k, v in opciones.items() if v is None or isinstance(v, (str, int, float, bool))}
+
+
+def _texto(serie: pd.Series) -> list:
+    """Valores como texto, con None en los faltantes."""
+    return [None if pd.isna(v) else str(v) for v in serie.tolist()]
+
+
+def huellas(df: pd.DataFrame, lado: str) -> np.ndarray:
+    """
+    Huella de contenido (int64) de cada fila normalizada de un lado.
+
+    Usa fecha e importe normalizados (día y centavos) y el resto de las columnas del esquema
+    como `texto_clave` (sin espacios extremos ni '.0' de enteros, faltantes como ""), así la
+    misma fila exportada en otro formato (123.0 de un xlsx, "123" de un CSV) conserva su huella.
+    """
+    otras = [c for c in _ESQUEMAS[lado] if c not in _COLUMNAS_VALOR[lado]]
+    partes = pd.DataFrame({c: texto_clave(df[c]) for c in otras})
+    partes["Fecha_dia"] = df["Fecha_dia"].to_numpy(dtype=np.int64)
+    partes["Importe_cent"] = df["Importe_cent"].to_numpy(dtype=np.int64)
+    return pd.util.hash_pandas_object(partes, index=False).to_numpy().view(np.int64)
+
+
+class AlmacenConciliacion:
+    """
+    Estado de conciliación persistido en un archivo SQLite.
+
+    Una fila se identifica por (huella, ocurrencia): la ocurrencia numera las filas idénticas
+    guardadas, de modo que volver a cargar un archivo acumulado no duplica lo ya guardado y una
+    fila idéntica que llega de verdad repetida se guarda aparte (ver `_cargar`). Las filas nunca
+    se borran; `conciliado` marca las que ya tienen match.
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._con = sqlite3.connect(ruta)
+        self._crear_tablas()
+        self._migrar_huellas()
+
+    def close(self):
+        self._con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _crear_tablas(self):
+        with self._con:
+            for lado, tabla in _TABLAS.items():
+                esquema = ", ".join(f"{_q(c)} TEXT" for c in _ESQUEMAS[lado])
+                self._con.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {tabla} (
+                        id INTEGER PRIMARY KEY,
+                        huella INTEGER NOT NULL,
+                        ocurrencia INTEGER NOT NULL,
+                        {esquema},
+                        Importe_norm REAL NOT NULL,
+                        Fecha_dia INTEGER NOT NULL,
+                        Importe_cent INTEGER NOT NULL,
+                        corrida INTEGER NOT NULL,
+                        conciliado INTEGER NOT NULL DEFAULT 0,
+                        UNIQUE (huella, ocurrencia)
+                    )""")
+                self._con.execute(f"CREATE INDEX IF NOT EXISTS {tabla}_abiertos ON {tabla} (conciliado)")
+                self._con.execute(f"CREATE INDEX IF NOT EXISTS {tabla}_dia ON {tabla} (Fecha_dia)")
+            self._con.execute("""
+                CREATE TABLE IF NOT EXISTS corridas (
+                    id INTEGER PRIMARY KEY,
+                    fecha TEXT NOT NULL,
+                    parametros TEXT NOT NULL
+                )""")
+            self._con.execute("""
+                CREATE TABLE IF NOT EXISTS matches (
+                    id INTEGER PRIMARY KEY,
+                    corrida INTEGER NOT NULL,
+                    id_mayor INTEGER NOT NULL,
+                    id_banco INTEGER NOT NULL,
+                    estado TEXT NOT NULL,
+                    regla TEXT NOT NULL,
+                    diferencia_dias INTEGER NOT NULL,
+                    grupo INTEGER
+                )""")
+
+    def _migrar_huellas(self):
+        """Recalcula huella y ocurrencia de las filas guardadas con una versión anterior de `huellas`."""
+        if self._con.execute("PRAGMA user_version").fetchone()[0] >= _VERSION_HUELLAS:
+            return
+        with self._con:
+            for lado, tabla in _TABLAS.items():
+                df = self._leer(lado, False)
+                h = huellas(df, lado)
+                ocurrencia = pd.Series(h).groupby(h).cumcount().to_numpy()
+                # Ocurrencias provisorias únicas para no chocar con UNIQUE (huella, ocurrencia)
+                self._con.execute(f"UPDATE {tabla} SET ocurrencia = -id")
+                self._con.executemany(
+                    f"UPDATE {tabla} SET huella = ?, ocurrencia = ? WHERE id = ?",
+                    zip(h.tolist(), ocurrencia.tolist(), df["id"].tolist()),
+                )
+            self._con.execute(f"PRAGMA user_version = {_VERSION_HUELLAS}")
+
+    # --- Carga de filas nuevas ---
+
+    def _cargar(self, df: pd.DataFrame | None, lado: str, corrida: int) -> int:
+        """
+        Inserta las filas nuevas de un archivo; devuelve cuántas entraron.
+
+        Como la huella incluye la fecha, una fila solo puede repetir filas guardadas de su mismo
+        día. Por cada día, si el archivo trae al menos todas las filas ya guardadas de ese día
+        (un archivo acumulado o que se vuelve a cargar), esas se toman como reenviadas y solo
+        entran las que sobran: k copias idénticas contra e guardadas agregan k - e. Si le falta
+        alguna de las guardadas, el archivo no es un reenvío de ese día (por ejemplo, un
+        extracto parcial posterior) y todas sus filas de ese día entran. Las ocurrencias de una
+        huella siguen la numeración de las guardadas. Queda un caso indistinguible: un día cuyo
+        único contenido guardado es idéntico a lo que trae el archivo se toma como reenvío.
+        """
+        if df is None or df.empty:
+            return 0
+        if not all(c in df.columns for c in COLUMNAS_NORMALIZADAS):
+            df = normalizar_fragmento(df, lado)
+        tabla = _TABLAS[lado]
+        h = huellas(df, lado)
+        dia = df["Fecha_dia"].to_numpy(dtype=np.int64)
+        guardadas = pd.read_sql_query(
+            f"SELECT huella, Fecha_dia FROM {tabla} WHERE Fecha_dia BETWEEN ? AND ?",
+            self._con, params=(int(dia.min()), int(dia.max())),
+        )
+        previas = guardadas["huella"].value_counts()
+        traidas = pd.Series(h).value_counts().reindex(previas.index, fill_value=0)
+        # Días con alguna fila guardada que el archivo no vuelve a traer
+        incompletos = guardadas.loc[guardadas["huella"].map(previas > traidas), "Fecha_dia"].unique()
+        repeticion = pd.Series(h).groupby(h).cumcount().to_numpy()
+        e = previas.reindex(h, fill_value=0).to_numpy()
+        reenvio = ~np.isin(dia, incompletos)
+        ocurrencia = np.where(reenvio, repeticion, e + repeticion)
+        nuevas = ~reenvio | (repeticion >= e)
+        df, h, ocurrencia = df[nuevas], h[nuevas], ocurrencia[nuevas]
+
+        esquema = _ESQUEMAS[lado]
+        columnas = ["huella", "ocurrencia", *esquema, *COLUMNAS_NORMALIZADAS, "corrida"]
+        valores = zip(
+            h.tolist(),
+            ocurrencia.tolist(),
+            *(_texto(df[c]) for c in esquema),
+            df["Importe_norm"].to_numpy(dtype=float).tolist(),
+            df["Fecha_dia"].to_numpy(dtype=np.int64).tolist(),
+            df["Importe_cent"].to_numpy(dtype=np.int64).tolist(),
+            [corrida] * len(df),
+        )
+        self._con.executemany(
+            f"INSERT INTO {tabla} ({', '.join(map(_q, columnas))}) VALUES ({', '.join('?' * len(columnas))})",
+            valores,
+        )
+        return len(df)
+
+    def _leer(self, lado: str, solo_abiertos: bool) -> pd.DataFrame:
+        """Filas de un lado en orden de carga, con las columnas que usa el motor."""
+        esquema = _ESQUEMAS[lado]
+        columnas = ["id", *esquema, *COLUMNAS_NORMALIZADAS]
+        filtro = " WHERE conciliado = 0" if solo_abiertos else ""
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(map(_q, columnas))} FROM {_TABLAS[lado]}{filtro} ORDER BY id", self._con
+        )
+        return df.astype({
+            "id": np.int64, **{c: object for c in esquema},
+            "Importe_norm": float, "Fecha_dia": np.int32, "Importe_cent": np.int64,
+        })
+
+    # --- Corridas ---
+
+    def conciliar(
+        self,
+        df_mayor: pd.DataFrame | None,
+        df_banco: pd.DataFrame | None,
+        tolerancia_dias: int,
+        max_items_grupo: int,
+        **opciones,
+    ) -> Corrida:
+        """
+        Carga las filas nuevas y concilia las partidas abiertas de ambos lados.
+
+        Acepta DataFrames crudos o ya normalizados (`ingesta`); cualquiera de los dos lados
+        puede ser None si ese día no hay archivo. `opciones` pasa a `conciliacion_mvp`
+        (direccion, tolerancia_valor, modo_asignacion, procesos, candidatos_grupo, cache,
+        metricas, progreso); la corrida registra solo las de valor simple, no objetos como
+        cache, metricas o progreso. Todo queda en una sola transacción: si algo falla (o se
+        cancela), el almacén no cambia.
+        """
+        parametros = {
+            "tolerancia_dias": tolerancia_dias, "max_items_grupo": max_items_grupo,
+            **_opciones_registrables(opciones),
+        }
+        with self._con:
+            corrida = self._con.execute(
+                "INSERT INTO corridas (fecha, parametros) VALUES (?, ?)",
+                (datetime.now().isoformat(timespec="seconds"), json.dumps(parametros, ensure_ascii=False)),
+            ).lastrowid
+            nuevas_mayor = self._cargar(df_mayor, "MAYOR", corrida)
+            nuevas_banco = self._cargar(df_banco, "BANCO", corrida)
+
+            mayor, banco = self._leer("MAYOR", True), self._leer("BANCO", True)
+            ids, _ = conciliacion_mvp(mayor, banco, tolerancia_dias, max_items_grupo, salida="ids", **opciones)
+            ok = ids.dropna(subset=["fila_mayor", "fila_banco"])
+
+            # Los grupos de cada corrida siguen la numeración de las anteriores
+            base = self._con.execute("SELECT COALESCE(MAX(grupo), 0) FROM matches").fetchone()[0]
+            grupos = ok["grupo_id"].str.slice(1).astype(float) + base
+            id_mayor = mayor["id"].to_numpy()[ok["fila_mayor"].to_numpy(dtype=np.int64)]
+            id_banco = banco["id"].to_numpy()[ok["fila_banco"].to_numpy(dtype=np.int64)]
+            self._con.executemany(
+                "INSERT INTO matches (corrida, id_mayor, id_banco, estado, regla, diferencia_dias, grupo) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                zip(
+                    [corrida] * len(ok), id_mayor.tolist(), id_banco.tolist(),
+                    ok["estado"].tolist(), ok["regla"].tolist(),
+                    ok["diferencia_dias"].astype(np.int64).tolist(),
+                    [None if pd.isna(g) else int(g) for g in grupos],
+                ),
+            )
+            for tabla, ids_lado in (("mayor", id_mayor), ("banco", id_banco)):
+                self._con.executemany(
+                    f"UPDATE {tabla} SET conciliado = 1 WHERE id = ?", ((i,) for i in np.unique(ids_lado).tolist())
+                )
+        return Corrida(corrida, nuevas_mayor, nuevas_banco, len(ok))
+
+    # --- Consultas ---
+
+    def detalle(self) -> pd.DataFrame:
+        """
+        Detalle acumulado con el mismo formato que `conciliacion_mvp`: los matches en orden de
+        corrida y después las partidas abiertas de cada lado.
+        """
+        mayor, banco = self._leer("MAYOR", False), self._leer("BANCO", False)
+        matches = pd.read_sql_query(
+            "SELECT id_mayor, id_banco, estado, regla, diferencia_dias, grupo FROM matches ORDER BY id", self._con
+        )
+        abiertos_m = mayor["id"].to_numpy()[~np.isin(mayor["id"], matches["id_mayor"])]
+        abiertos_b = banco["id"].to_numpy()[~np.isin(banco["id"], matches["id_banco"])]
+        n_m, n_b = len(matches), len(abiertos_m) + len(abiertos_b)
+
+        pos_mayor = np.concatenate([
+            np.searchsorted(mayor["id"], matches["id_mayor"]),
+            np.searchsorted(mayor["id"], abiertos_m),
+            np.full(len(abiertos_b), -1),
+        ]).astype(np.int64)
+        pos_banco = np.concatenate([
+            np.searchsorted(banco["id"], matches["id_banco"]),
+            np.full(len(abiertos_m), -1),
+            np.searchsorted(banco["id"], abiertos_b),
+        ]).astype(np.int64)
+
+        grupo = np.full(n_m + n_b, "", dtype=object)
+        grupo[:n_m] = [None if pd.isna(g) else f"G{int(g)}" for g in matches["grupo"]]
+        dias = matches["diferencia_dias"].to_numpy(dtype=np.int64)
+        meta = {
+            "estado": pd.Categorical(np.concatenate([
+                matches["estado"].to_numpy(dtype=object),
+                np.full(len(abiertos_m), "Solo en Mayor", dtype=object),
+                np.full(len(abiertos_b), "Solo en Banco", dtype=object),
+            ]), categories=ESTADOS),
+            "regla": pd.Categorical(np.concatenate([matches["regla"].to_numpy(dtype=object), np.full(n_b, "", dtype=object)])),
+            "diferencia_dias": np.concatenate([dias, np.full(n_b, np.nan)]) if n_b else dias,
+            "grupo_id": pd.Categorical(grupo),
+        }
+        return armar_detalle(pos_mayor, pos_banco, mayor, banco, meta)
+
+    def resumen(self) -> pd.DataFrame:
+        """Cantidad de filas del detalle acumulado por estado, sin armar el detalle."""
+        consulta = """
+            SELECT estado, COUNT(*) AS cantidad FROM matches GROUP BY estado
+            UNION ALL SELECT 'Solo en Mayor', COUNT(*) FROM mayor WHERE conciliado = 0
+            UNION ALL SELECT 'Solo en Banco', COUNT(*) FROM banco WHERE conciliado = 0
+        """
+        resumen = pd.read_sql_query(consulta, self._con)
+        resumen = resumen[resumen["cantidad"] > 0]
+        return resumen.sort_values("cantidad", ascending=False, kind="stable").reset_index(drop=True)
+
+    def corridas(self) -> pd.DataFrame:
+        """Historial de corridas con sus parámetros."""
+        return pd.read_sql_query("SELECT id, fecha, parametros FROM corridas ORDER BY id", self._con)
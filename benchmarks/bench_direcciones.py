@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la agrupación en ambas direcciones.
+
+Genera un Mayor y un Banco sintéticos donde una parte de los movimientos de un lado está
+partida en varios del otro, y mide `conciliacion_mvp` con MAYOR→BANCO sobre datos con
+splits en el Mayor y con BANCO→MAYOR sobre los datos espejados. Ambas corridas deben
+quedar dentro del mismo presupuesto de tiempo.
+
+Uso:
+    python benchmarks/bench_direcciones.py --filas 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generador import generar_pares
+from reconciliacion import conciliacion_mvp
+
+
+def generar(filas: int, lado_partido: str, seed: int = 0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Genera (mayor, banco) con `filas` movimientos del lado no partido.
+
+    El 75% se copia al otro lado (con un desvío de fecha de hasta 2 días), el 15% se parte en
+    2 o 3 movimientos del lado `lado_partido` y el resto queda sin contrapartida.
+    """
+    return generar_pares(
+        filas, proporcion_exacta=0.0, proporcion_tolerancia=0.75, proporcion_partida=0.15,
+        desvio_dias=2, lado_partido=lado_partido, seed=seed,
+    )
+
+
+def medir(direccion: str, lado_partido: str, args) -> float:
+    df_mayor, df_banco = generar(args.filas, lado_partido, args.seed)
+    inicio = time.perf_counter()
+    _, resumen = conciliacion_mvp(
+        df_mayor, df_banco,
+        tolerancia_dias=args.tolerancia_dias,
+        max_items_grupo=args.max_items,
+        direccion=direccion,
+        procesos=args.procesos,
+    )
+    segundos = time.perf_counter() - inicio
+    agrupados = resumen.loc[resumen["estado"] == "Conciliado por agrupación", "cantidad"].sum()
+    print(f"{direccion:12s} Mayor={len(df_mayor):>8d} Banco={len(df_banco):>8d} "
+          f"agrupados={agrupados:>8d} tiempo={segundos:8.2f}s")
+    return segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--tolerancia-dias", type=int, default=3)
+    parser.add_argument("--max-items", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--procesos", type=int, default=1)
+    parser.add_argument("--margen", type=float, default=1.5,
+                        help="Cociente máximo aceptado entre los tiempos de ambas direcciones")
+    args = parser.parse_args()
+
+    t_mb = medir("MAYOR→BANCO", "MAYOR", args)
+    t_bm = medir("BANCO→MAYOR", "BANCO", args)
+    cociente = t_bm / t_mb if t_mb else float("inf")
+    print(f"BANCO→MAYOR / MAYOR→BANCO = {cociente:.2f} (margen {args.margen})")
+    sys.exit(0 if cociente <= args.margen else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Generador de pares Mayor/Banco sintéticos para medir el motor.
+
+Los DataFrames tienen las columnas de `MAYOR_COLS`/`BANCO_COLS` con fechas dd/mm/yyyy e
+importes con miles (.) y decimales (,), como los archivos reales. Con la misma semilla y
+parámetros el resultado es siempre el mismo.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reconciliacion import BANCO_COLS, MAYOR_COLS
+
+
+def _formatear_importes(cent: np.ndarray) -> list[str]:
+    """Centavos a texto con miles (.) y decimales (,), como vienen en los archivos reales."""
+    return [
+        f"{c / 100:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        for c in cent
+    ]
+
+
+def _formatear_fechas(dias: np.ndarray) -> list[str]:
+    return list(pd.to_datetime(dias, unit="D").strftime("%d/%m/%Y"))
+
+
+def _mayor(cent: np.ndarray, dias: np.ndarray) -> pd.DataFrame:
+    df = pd.DataFrame({col: "" for col in MAYOR_COLS}, index=range(len(cent)))
+    df["Nro. Comp"] = np.arange(len(cent))
+    df["Fecha"] = _formatear_fechas(dias)
+    df["Importe"] = _formatear_importes(cent)
+    return df
+
+
+def _banco(cent: np.ndarray, dias: np.ndarray) -> pd.DataFrame:
+    df = pd.DataFrame({col: "" for col in BANCO_COLS}, index=range(len(cent)))
+    df["NUM"] = np.arange(len(cent))
+    df["FECHA"] = _formatear_fechas(dias)
+    df["IMPORTE"] = _formatear_importes(cent)
+    return df
+
+
+def _partir(cent: np.ndarray, partes: int, rng: np.random.Generator) -> np.ndarray:
+    """Parte cada importe en `partes` trozos enteros que suman exactamente el original."""
+    cortes = np.sort(rng.random((len(cent), partes - 1)), axis=1)
+    pesos = np.diff(np.hstack([np.zeros((len(cent), 1)), cortes, np.ones((len(cent), 1))]), axis=1)
+    trozos = np.floor(pesos * cent[:, None]).astype(np.int64)
+    trozos[:, -1] = cent - trozos[:, :-1].sum(axis=1)
+    return trozos
+
+
+def generar_pares(
+    filas: int,
+    proporcion_exacta: float = 0.5,
+    proporcion_tolerancia: float = 0.25,
+    proporcion_partida: float = 0.15,
+    desvio_dias: int = 2,
+    ruido_valor: float = 0.0,
+    duplicacion: float = 0.0,
+    lado_partido: str = "MAYOR",
+    seed: int = 0,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Genera (mayor, banco) con `filas` movimientos del lado no partido.
+
+    De esos movimientos, `proporcion_exacta` aparece igual en el otro lado,
+    `proporcion_tolerancia` aparece con la fecha corrida hasta `desvio_dias` días y el importe
+    hasta `ruido_valor` pesos, y `proporcion_partida` aparece partido en 2 o 3 movimientos del
+    `lado_partido` (con el mismo desvío de fecha). El resto queda sin contrapartida.
+    `duplicacion` es la proporción de importes que salen de un conjunto chico de valores
+    repetidos (abonos, comisiones), que multiplica los candidatos de cada búsqueda.
+    """
+    if proporcion_exacta + proporcion_tolerancia + proporcion_partida > 1:
+        raise ValueError("Las proporciones exacta, con tolerancia y partida suman más de 1")
+    if lado_partido not in ("MAYOR", "BANCO"):
+        raise ValueError(f"Lado desconocido: {lado_partido!r}. Opciones: ['MAYOR', 'BANCO']")
+
+    rng = np.random.default_rng(seed)
+    base = int(np.datetime64("2024-01-01", "D").astype(np.int64))
+    cent = rng.integers(100, 5_000_000, filas)
+    repetidos = rng.random(filas) < duplicacion
+    cent[repetidos] = rng.choice(rng.integers(100, 5_000_000, max(10, filas // 1_000)), int(repetidos.sum()))
+    cent = cent * rng.choice([1, -1], filas, p=[0.4, 0.6])
+    dias = base + rng.integers(0, 365, filas)
+
+    sin_par = 1 - proporcion_exacta - proporcion_tolerancia - proporcion_partida
+    tipo = rng.choice(4, filas, p=[proporcion_exacta, proporcion_tolerancia, proporcion_partida, max(sin_par, 0)])
+    exacta = np.flatnonzero(tipo == 0)
+    tolerancia = np.flatnonzero(tipo == 1)
+    partida = np.flatnonzero(tipo == 2)
+
+    def desvio(n):
+        return rng.integers(-desvio_dias, desvio_dias + 1, n)
+
+    ruido = rng.integers(-int(round(ruido_valor * 100)), int(round(ruido_valor * 100)) + 1, len(tolerancia))
+    otro_cent = [cent[exacta], cent[tolerancia] + ruido]
+    otro_dias = [dias[exacta], dias[tolerancia] + desvio(len(tolerancia))]
+    partes = rng.integers(2, 4, len(partida))
+    for k in (2, 3):
+        idx = partida[partes == k]
+        otro_cent.append(_partir(cent[idx], k, rng).ravel())
+        otro_dias.append(np.repeat(dias[idx], k) + desvio(len(idx) * k))
+    otro_cent = np.concatenate(otro_cent)
+    otro_dias = np.concatenate(otro_dias)
+    mezcla = rng.permutation(len(otro_cent))
+    otro_cent, otro_dias = otro_cent[mezcla], otro_dias[mezcla]
+
+    if lado_partido == "MAYOR":
+        return _mayor(otro_cent, otro_dias), _banco(cent, dias)
+    return _mayor(cent, dias), _banco(otro_cent, otro_dias)
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Suite de benchmarks del motor de conciliación por etapas.
+
+Para cada tamaño genera un par Mayor/Banco con `generador.generar_pares` y mide por separado
+normalización, pasada exacta + one-to-one, agrupación, armado de la salida, combinación con
+un resultado previo y exportación a Excel. Las cuatro primeras salen de una corrida de
+`conciliacion_mvp` a través de sus `metricas` por fase, así se mide exactamente lo que corre
+el motor. Todo se corre una vez para medir el tiempo y, salvo `--sin-memoria`, otra bajo
+tracemalloc para medir el pico de memoria (tracemalloc frena la ejecución, por eso no se
+mezcla con el tiempo).
+
+Los resultados se guardan en JSON junto con el commit y las versiones, para comparar corridas:
+    python benchmarks/suite.py --tamanos 1000 10000 100000 --salida antes.json
+    python benchmarks/suite.py --tamanos 1000 10000 100000 --salida despues.json --comparar antes.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exportacion import escribir_excel
+from generador import generar_pares
+from reconciliacion import conciliacion_mvp, merge_with_previous
+
+ETAPAS = ["normalizacion", "one_to_one", "agrupacion", "salida", "merge", "excel"]
+
+
+def _commit() -> str | None:
+    """Commit actual del repositorio, si se puede saber."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _etapa_de(fase: str) -> str:
+    """Etapa de la suite a la que pertenece una fase de `conciliacion_mvp`."""
+    if fase == "pasada_exacta":
+        return "one_to_one"
+    # "one_to_one greedy", "agrupacion MAYOR→BANCO", ...
+    return fase.split(" ")[0]
+
+
+def _medir_conciliacion(df_mayor: pd.DataFrame, df_banco: pd.DataFrame, args, memoria: bool):
+    """
+    Corre `conciliacion_mvp` una vez y reparte en las etapas lo que informa cada fase a `metricas`.
+
+    Devuelve (medidas por etapa, detalle, resumen). Con `memoria`, el pico de cada etapa se toma
+    sobre lo que ya estaba vivo al empezarla, igual que si corriera sola bajo tracemalloc.
+    """
+    fases = []
+
+    def registrar(fila: dict):
+        if memoria:
+            actual, pico = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            fila = {**fila, "actual": actual, "pico": pico}
+        fases.append(fila)
+
+    if memoria:
+        tracemalloc.start()
+    try:
+        detalle, resumen = conciliacion_mvp(
+            df_mayor, df_banco, args.tolerancia_dias, args.max_items, direccion=args.direccion,
+            tolerancia_valor=args.tolerancia_valor, modo_asignacion=args.modo_asignacion,
+            procesos=args.procesos, metricas=registrar,
+        )
+    finally:
+        if memoria:
+            tracemalloc.stop()
+
+    medidas = {}
+    anterior, vivo, inicio_etapa = None, 0, 0
+    for fila in fases:
+        etapa = _etapa_de(fila["fase"])
+        if etapa != anterior:
+            inicio_etapa, anterior = vivo, etapa
+        if memoria:
+            medidas[etapa] = max(medidas.get(etapa, 0.0), (fila["pico"] - inicio_etapa) / 2**20)
+            vivo = fila["actual"]
+        else:
+            medidas[etapa] = medidas.get(etapa, 0.0) + fila["segundos"]
+    return medidas, detalle, resumen
+
+
+def _medir(funcion, memoria: bool) -> float:
+    """Segundos (o pico de MB con `memoria`) de una llamada a `funcion`."""
+    if memoria:
+        tracemalloc.start()
+        try:
+            funcion()
+            return tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    inicio = time.perf_counter()
+    funcion()
+    return time.perf_counter() - inicio
+
+
+def _correr(df_mayor: pd.DataFrame, df_banco: pd.DataFrame, args, memoria: bool) -> dict:
+    """Segundos (o pico de MB con `memoria`) de cada etapa; las que se saltean quedan en None."""
+    medidas, detalle, resumen = _medir_conciliacion(df_mayor, df_banco, args, memoria)
+    medidas.setdefault("agrupacion", None)
+    # Peor caso: el resultado previo es el mismo detalle, todo se detecta como duplicado
+    medidas["merge"] = _medir(lambda: merge_with_previous(detalle, detalle), memoria)
+    if len(df_mayor) + len(df_banco) > args.max_filas_excel:
+        medidas["excel"] = None
+    else:
+        medidas["excel"] = _medir(lambda: escribir_excel(detalle, resumen, io.BytesIO()), memoria)
+    return medidas
+
+
+def medir(filas: int, args) -> list[dict]:
+    df_mayor, df_banco = generar_pares(
+        filas,
+        proporcion_exacta=args.proporcion_exacta,
+        proporcion_tolerancia=args.proporcion_tolerancia,
+        proporcion_partida=args.proporcion_partida,
+        desvio_dias=args.desvio_dias,
+        ruido_valor=args.ruido_valor,
+        duplicacion=args.duplicacion,
+        lado_partido=args.lado_partido,
+        seed=args.seed,
+    )
+    tiempos = _correr(df_mayor, df_banco, args, memoria=False)
+    picos = _correr(df_mayor, df_banco, args, memoria=True) if not args.sin_memoria else {}
+    resultados = []
+    for etapa in ETAPAS:
+        segundos = tiempos[etapa]
+        pico = picos.get(etapa)
+        resultados.append({
+            "filas": filas, "filas_mayor": len(df_mayor), "filas_banco": len(df_banco), "etapa": etapa,
+            "segundos": None if segundos is None else round(segundos, 4),
+            "pico_mb": None if pico is None else round(pico, 1),
+        })
+        texto_t = "  salteada" if segundos is None else f"{segundos:9.3f}s"
+        texto_m = "" if pico is None else f" {pico:9.1f} MB"
+        print(f"{filas:>9d} {etapa:14s}{texto_t}{texto_m}", flush=True)
+    return resultados
+
+
+def comparar(resultados: list[dict], ruta: str):
+    """Imprime el cociente de tiempos (actual / anterior) por tamaño y etapa."""
+    with open(ruta, encoding="utf-8") as f:
+        anterior = json.load(f)
+    previos = {(r["filas"], r["etapa"]): r for r in anterior["resultados"]}
+    print(f"\nComparación con {ruta} (commit {anterior.get('commit')}): actual / anterior")
+    for r in resultados:
+        previo = previos.get((r["filas"], r["etapa"]))
+        if previo is None or not previo["segundos"] or r["segundos"] is None:
+            continue
+        print(f"{r['filas']:>9d} {r['etapa']:14s} {r['segundos'] / previo['segundos']:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--proporcion-exacta", type=float, default=0.5)
+    parser.add_argument("--proporcion-tolerancia", type=float, default=0.25)
+    parser.add_argument("--proporcion-partida", type=float, default=0.15)
+    parser.add_argument("--desvio-dias", type=int, default=2)
+    parser.add_argument("--ruido-valor", type=float, default=0.0)
+    parser.add_argument("--duplicacion", type=float, default=0.0)
+    parser.add_argument("--lado-partido", choices=["MAYOR", "BANCO"], default="MAYOR")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerancia-dias", type=int, default=3)
+    parser.add_argument("--tolerancia-valor", type=float, default=0.0)
+    parser.add_argument("--max-items", type=int, default=3)
+    parser.add_argument("--direccion", default="MAYOR→BANCO")
+    parser.add_argument("--modo-asignacion", choices=["greedy", "optimo"], default="greedy")
+    parser.add_argument("--procesos", type=int, default=1)
+    parser.add_argument("--max-filas-excel", type=int, default=250_000,
+                        help="Por encima de esta cantidad de filas (Mayor + Banco) no se mide el Excel")
+    parser.add_argument("--sin-memoria", action="store_true", help="No medir el pico de memoria")
+    parser.add_argument("--salida", default=None,
+                        help="Archivo JSON de resultados (por defecto benchmarks/resultados/<commit>.json)")
+    parser.add_argument("--comparar", default=None, help="JSON de una corrida anterior para comparar tiempos")
+    args = parser.parse_args()
+
+    commit = _commit()
+    resultados = []
+    for filas in args.tamanos:
+        resultados.extend(medir(filas, args))
+
+    salida = args.salida or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "resultados", f"{commit or 'sin_commit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    parametros = {k: v for k, v in vars(args).items() if k not in ("salida", "comparar")}
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "parametros": parametros,
+            "resultados": resultados,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados en {salida}")
+
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Cache en disco de resultados de conciliación, direccionado por contenido.
+
+Cada entrada es un .npz con los arrays compactos de matches de una corrida, bajo una clave
+que resume las entradas normalizadas y los parámetros. Varios procesos del mismo equipo
+(la página y los procesos batch) pueden compartir el directorio: las escrituras son atómicas
+y una entrada que desaparece o está incompleta se trata como ausente. Al superar el tamaño
+máximo se descartan las entradas usadas hace más tiempo (LRU por fecha de modificación).
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+# Directorio por defecto; se puede cambiar con la variable de entorno
+_VARIABLE_DIRECTORIO = "CONCILIACION_CACHE_DIR"
+_DIRECTORIO_DEFECTO = os.path.join(os.path.expanduser("~"), ".cache", "conciliacion")
+
+# Tamaño máximo por defecto del directorio de cache
+_MAX_BYTES_DEFECTO = 512 << 20
+
+
+class CacheResultados:
+    """Cache LRU de arrays en un directorio local."""
+
+    def __init__(self, directorio: str | None = None, max_bytes: int = _MAX_BYTES_DEFECTO):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes debe ser mayor que cero")
+        self.directorio = directorio or os.environ.get(_VARIABLE_DIRECTORIO, _DIRECTORIO_DEFECTO)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directorio, exist_ok=True)
+
+    @staticmethod
+    def clave(arrays: list[np.ndarray], parametros: dict) -> str:
+        """Huella de los arrays (contenido y dtype) y de los parámetros."""
+        h = hashlib.blake2b(digest_size=20)
+        h.update(json.dumps(parametros, sort_keys=True, ensure_ascii=False).encode())
+        for a in arrays:
+            a = np.ascontiguousarray(a)
+            h.update(f"{a.dtype.str}{a.shape}".encode())
+            h.update(a.view(np.uint8).data)
+        return h.hexdigest()
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, f"{clave}.npz")
+
+    def leer(self, clave: str) -> dict | None:
+        """Arrays guardados bajo `clave`, o None. Un acierto renueva la entrada para el LRU."""
+        ruta = self._ruta(clave)
+        try:
+            with np.load(ruta, allow_pickle=False) as datos:
+                arrays = {k: datos[k] for k in datos.files}
+            os.utime(ruta)
+        except (OSError, ValueError):
+            return None
+        return arrays
+
+    def guardar(self, clave: str, arrays: dict):
+        """Guarda los arrays de forma atómica y recorta el directorio al tamaño máximo."""
+        fd, tmp = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, self._ruta(clave))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self._recortar()
+
+    def _recortar(self):
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            if not nombre.endswith(".npz"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directorio, nombre))
+            except OSError:
+                continue
+            entradas.append((st.st_mtime, st.st_size, nombre))
+        total = sum(e[1] for e in entradas)
+        for _, tamano, nombre in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directorio, nombre))
+            except OSError:
+                pass
+            total -= tamano
+
+    def limpiar(self):
+        """Borra todas las entradas."""
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith(".npz"):
+                try:
+                    os.remove(os.path.join(self.directorio, nombre))
+                except OSError:
+                    pass
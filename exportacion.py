@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Exportación de resultados de conciliación.
+
+El Excel se escribe fila a fila con openpyxl en modo `write_only` (memoria constante): hoja
+Detalle con encabezado fijo, filtros, anchos calculados sobre una muestra y un formato
+condicional por estado aplicado al rango completo; hoja Resumen aparte. CSV y Parquet
+exportan solo el detalle, para sistemas que no necesitan Excel.
+"""
+
+import io
+import os
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+FORMATOS_EXPORTACION = ["xlsx", "csv", "parquet"]
+
+# Color de relleno por estado (el mismo criterio que la vista de resultados)
+COLORES_ESTADO = {
+    "Conciliado exacto": "C6EFCE",
+    "Conciliado por tolerancia de fecha": "DDEBF7",
+    "Conciliado por tolerancia de valor": "DDEBF7",
+    "Conciliado por tolerancia": "DDEBF7",
+    "Conciliado por agrupación": "FFF2CC",
+    "Solo en Mayor": "FCE4D6",
+    "Solo en Banco": "F8CBAD",
+}
+
+# Filas por tanda al convertir el DataFrame a valores de celda
+_FILAS_POR_TANDA = 10_000
+
+# Filas de muestra para calcular el ancho de columnas, y ancho máximo
+_FILAS_MUESTRA_ANCHO = 1_000
+_ANCHO_MAXIMO = 60
+
+_ESTILO_ENCABEZADO = {
+    "font": Font(bold=True, color="FFFFFF"),
+    "fill": PatternFill("solid", start_color="1F4E79", end_color="1F4E79"),
+}
+
+
+def _valores_celda(tanda: pd.DataFrame) -> pd.DataFrame:
+    """Pasa una tanda a valores que openpyxl escribe directo: fechas sin hora y None en faltantes."""
+    out = tanda.copy()
+    for c in out.columns:
+        if pd.api.types.is_datetime64_any_dtype(out[c]):
+            out[c] = out[c].dt.date
+    out = out.astype(object)
+    return out.where(tanda.notna(), None)
+
+
+def _anchos(df: pd.DataFrame) -> list[int]:
+    """Ancho de cada columna según el encabezado y una muestra de filas."""
+    muestra = df.head(_FILAS_MUESTRA_ANCHO)
+    anchos = []
+    for c in df.columns:
+        largo = muestra[c].dropna().astype(str).str.len().max() if not muestra.empty else 0
+        largo = 0 if pd.isna(largo) else int(largo)
+        anchos.append(min(max(len(str(c)), largo) + 2, _ANCHO_MAXIMO))
+    return anchos
+
+
+def _escribir_hoja(libro: Workbook, titulo: str, df: pd.DataFrame, columna_estado: str | None = None):
+    """Agrega una hoja y la escribe fila a fila; el formato se declara antes de la primera fila."""
+    hoja = libro.create_sheet(titulo)
+    ultima_col = get_column_letter(max(len(df.columns), 1))
+    ultima_fila = len(df) + 1
+
+    for i, ancho in enumerate(_anchos(df), start=1):
+        hoja.column_dimensions[get_column_letter(i)].width = ancho
+    hoja.freeze_panes = "A2"
+    hoja.auto_filter.ref = f"A1:{ultima_col}{ultima_fila}"
+
+    if columna_estado is not None and columna_estado in df.columns and len(df):
+        col = get_column_letter(df.columns.get_loc(columna_estado) + 1)
+        rango = f"A2:{ultima_col}{ultima_fila}"
+        for estado, color in COLORES_ESTADO.items():
+            relleno = PatternFill(start_color=color, end_color=color, fill_type="solid")
+            hoja.conditional_formatting.add(rango, FormulaRule(formula=[f'${col}2="{estado}"'], fill=relleno))
+
+    encabezado = []
+    for c in df.columns:
+        celda = WriteOnlyCell(hoja, value=str(c))
+        celda.font = _ESTILO_ENCABEZADO["font"]
+        celda.fill = _ESTILO_ENCABEZADO["fill"]
+        encabezado.append(celda)
+    hoja.append(encabezado)
+
+    for inicio in range(0, len(df), _FILAS_POR_TANDA):
+        tanda = _valores_celda(df.iloc[inicio:inicio + _FILAS_POR_TANDA])
+        for fila in tanda.itertuples(index=False, name=None):
+            hoja.append(fila)
+
+
+def escribir_excel(detalle: pd.DataFrame, resumen: pd.DataFrame, destino, metricas: pd.DataFrame | None = None):
+    """
+    Escribe el Excel de resultados (hojas Detalle y Resumen) en una ruta o archivo abierto.
+
+    Con `metricas` (la tabla de `MetricasConciliacion`) agrega la hoja Métricas.
+    """
+    libro = Workbook(write_only=True)
+    _escribir_hoja(libro, "Detalle", detalle, columna_estado="estado")
+    _escribir_hoja(libro, "Resumen", resumen, columna_estado="estado")
+    if metricas is not None:
+        _escribir_hoja(libro, "Métricas", metricas)
+    libro.save(destino)
+
+
+def _columnas_mixtas_a_texto(df: pd.DataFrame) -> pd.DataFrame:
+    """Columnas object con tipos mezclados (p. ej. números y texto) pasan a texto para Parquet."""
+    mixtas = [
+        c for c in df.columns
+        if df[c].dtype == object and pd.api.types.infer_dtype(df[c], skipna=True).startswith("mixed")
+    ]
+    if not mixtas:
+        return df
+    out = df.copy(deep=False)
+    for c in mixtas:
+        out[c] = df[c].where(df[c].isna(), df[c].astype(str))
+    return out
+
+
+def escribir_csv(detalle: pd.DataFrame, destino):
+    """Escribe el detalle como CSV UTF-8 separado por comas."""
+    detalle.to_csv(destino, index=False, chunksize=_FILAS_POR_TANDA)
+
+
+def escribir_parquet(detalle: pd.DataFrame, destino):
+    """Escribe el detalle como Parquet (requiere pyarrow)."""
+    _columnas_mixtas_a_texto(detalle).to_parquet(destino, index=False)
+
+
+def exportar(
+    detalle: pd.DataFrame, resumen: pd.DataFrame, formato: str, destino=None, metricas: pd.DataFrame | None = None
+):
+    """
+    Exporta los resultados en `formato` ("xlsx", "csv" o "parquet").
+
+    Con `destino` (ruta o archivo abierto) escribe ahí; sin destino devuelve los bytes, como
+    necesita `st.download_button`. `metricas` solo se usa en el Excel, como hoja aparte.
+    """
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato de exportación desconocido: {formato!r}. Opciones: {FORMATOS_EXPORTACION}")
+    salida = io.BytesIO() if destino is None else destino
+    if formato == "xlsx":
+        escribir_excel(detalle, resumen, salida, metricas)
+    elif formato == "csv":
+        if isinstance(salida, (str, os.PathLike)):
+            escribir_csv(detalle, salida)
+        else:
+            texto = io.TextIOWrapper(salida, encoding="utf-8", newline="")
+            escribir_csv(detalle, texto)
+            texto.detach()
+    else:
+        escribir_parquet(detalle, salida)
+    return salida.getvalue() if destino is None else None
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+Ingesta de archivos del Mayor y del Banco.
+
+Lee solo las columnas del esquema (`MAYOR_COLS` / `BANCO_COLS`), con tipos explícitos y por
+bloques, normalizando cada bloque a medida que llega. Así el pico de memoria queda cerca del
+tamaño de los datos normalizados en lugar del archivo completo como objetos.
+
+Un lado ya normalizado se puede guardar como instantánea (`guardar_instantanea`): un archivo
+Arrow IPC (Feather v2) sin comprimir que `leer_instantanea` (y `leer_lado`) abre con memoria
+mapeada, sin parsear ni copiar los textos; varios procesos que lo abren comparten las páginas.
+"""
+
+import csv
+import io
+import json
+import os
+
+import pandas as pd
+
+from reconciliacion import BANCO_COLS, COLUMNAS_NORMALIZADAS, MAYOR_COLS, TIPO_TEXTO, normalizar_fragmento
+
+# Filas por bloque en la lectura con pandas y en Excel
+_FILAS_POR_BLOQUE = 250_000
+
+# Tamaño de bloque (bytes) del lector CSV de pyarrow
+_BYTES_POR_BLOQUE = 32 << 20
+
+# Separadores que se prueban sobre el encabezado de un CSV
+_SEPARADORES = [",", ";", "\t", "|"]
+
+# Extensiones de Arrow IPC (Feather v2): instantáneas normalizadas o tablas crudas
+EXTENSIONES_ARROW = [".arrow", ".feather"]
+
+# Clave de los metadatos del esquema Arrow que marca una instantánea normalizada
+_CLAVE_INSTANTANEA = b"conciliacion"
+
+_ESQUEMAS = {"MAYOR": MAYOR_COLS, "BANCO": BANCO_COLS}
+
+
+def _extension(origen, nombre: str | None) -> str:
+    """Extensión en minúsculas a partir del nombre explícito, el atributo `name` o la ruta."""
+    nombre = nombre or getattr(origen, "name", None) or (origen if isinstance(origen, (str, os.PathLike)) else "")
+    return os.path.splitext(str(nombre))[1].lower()
+
+
+def _abrir_binario(origen):
+    """Devuelve (archivo binario posicionado al inicio, si hay que cerrarlo)."""
+    if isinstance(origen, (str, os.PathLike)):
+        return open(origen, "rb"), True
+    if isinstance(origen, bytes):
+        return io.BytesIO(origen), True
+    origen.seek(0)
+    return origen, False
+
+
+def _encabezado_csv(fh, encoding: str) -> tuple[str, list[str]]:
+    """Detecta el separador y lee los nombres de columna de la primera línea; vuelve al inicio."""
+    linea = fh.readline().decode(encoding).lstrip("\ufeff").rstrip("\r\n")
+    fh.seek(0)
+    sep = max(_SEPARADORES, key=linea.count)
+    columnas = next(csv.reader([linea], delimiter=sep), [])
+    return sep, columnas
+
+
+def _validar_columnas(presentes: list, esperadas: list[str], lado: str):
+    """Mismo error que el motor cuando faltan columnas del esquema."""
+    faltantes = [c for c in esperadas if c not in presentes]
+    if faltantes:
+        raise ValueError(f"{lado.capitalize()}: faltan columnas {faltantes}. Presentes: {list(presentes)}")
+
+
+def _bloques_csv_pyarrow(fh, sep: str, esperadas: list[str], encoding: str):
+    """
+    Bloques de un CSV con el lector en streaming de pyarrow, todas las columnas como texto
+    (`TIPO_TEXTO`, sin pasar por objetos de Python).
+    """
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    lector = pa_csv.open_csv(
+        fh,
+        read_options=pa_csv.ReadOptions(block_size=_BYTES_POR_BLOQUE, encoding=encoding),
+        parse_options=pa_csv.ParseOptions(delimiter=sep),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=esperadas,
+            column_types={c: pa.string() for c in esperadas},
+            strings_can_be_null=True,
+        ),
+    )
+    for lote in lector:
+        yield _a_pandas(lote)
+
+
+def _bloques_csv_pandas(fh, sep: str, esperadas: list[str], encoding: str, filas: int):
+    """Bloques de un CSV con el motor C de pandas, todas las columnas como texto."""
+    lector = pd.read_csv(
+        fh,
+        sep=sep,
+        usecols=esperadas,
+        dtype={c: str for c in esperadas},
+        encoding=encoding,
+        chunksize=filas,
+        engine="c",
+    )
+    with lector:
+        yield from lector
+
+
+def _bloques_csv(origen, lado: str, encoding: str, filas: int):
+    """Bloques de un CSV con el separador detectado, validando el encabezado antes de leer."""
+    esperadas = _ESQUEMAS[lado]
+    fh, cerrar = _abrir_binario(origen)
+    try:
+        sep, presentes = _encabezado_csv(fh, encoding)
+        _validar_columnas(presentes, esperadas, lado)
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            bloques = _bloques_csv_pandas(fh, sep, esperadas, encoding, filas)
+        else:
+            bloques = _bloques_csv_pyarrow(fh, sep, esperadas, encoding)
+        for bloque in bloques:
+            yield bloque[esperadas]
+    finally:
+        if cerrar:
+            fh.close()
+
+
+def _bloques_xlsx(origen, lado: str, filas: int):
+    """Bloques de la primera hoja de un .xlsx leída fila a fila en modo solo lectura."""
+    from openpyxl import load_workbook
+
+    esperadas = _ESQUEMAS[lado]
+    fh, cerrar = _abrir_binario(origen)
+    libro = load_workbook(fh, read_only=True, data_only=True)
+    try:
+        filas_hoja = libro.worksheets[0].iter_rows(values_only=True)
+        encabezado = [str(c).strip() if c is not None else "" for c in next(filas_hoja, ())]
+        _validar_columnas(encabezado, esperadas, lado)
+        posiciones = [encabezado.index(c) for c in esperadas]
+
+        bloque = []
+        for fila in filas_hoja:
+            bloque.append([fila[p] if p < len(fila) else None for p in posiciones])
+            if len(bloque) == filas:
+                yield pd.DataFrame(bloque, columns=esperadas)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=esperadas)
+    finally:
+        libro.close()
+        if cerrar:
+            fh.close()
+
+
+def _requerir_pyarrow(uso: str):
+    """Falla con un mensaje claro si pyarrow no está instalado."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as exc:
+        raise ImportError(f"{uso} requiere pyarrow (pip install pyarrow)") from exc
+
+
+def _fuente_arrow(origen):
+    """Ruta (para abrirla con memoria mapeada) o archivo binario para los lectores de pyarrow."""
+    if isinstance(origen, (str, os.PathLike)):
+        return os.fspath(origen)
+    if isinstance(origen, bytes):
+        return io.BytesIO(origen)
+    origen.seek(0)
+    return origen
+
+
+def _a_pandas(tabla) -> pd.DataFrame:
+    """Tabla o lote de Arrow a pandas, con los textos como `TIPO_TEXTO` (sin copiarlos)."""
+    import pyarrow as pa
+
+    return tabla.to_pandas(types_mapper={pa.string(): TIPO_TEXTO, pa.large_string(): TIPO_TEXTO}.get, split_blocks=True)
+
+
+def _bloques_parquet(origen, lado: str, filas: int):
+    """Bloques de un Parquet, leyendo del archivo solo las columnas del esquema."""
+    _requerir_pyarrow("Leer Parquet")
+    from pyarrow import parquet as pq
+
+    esperadas = _ESQUEMAS[lado]
+    archivo = pq.ParquetFile(_fuente_arrow(origen), memory_map=isinstance(origen, (str, os.PathLike)))
+    try:
+        _validar_columnas(archivo.schema_arrow.names, esperadas, lado)
+        for lote in archivo.iter_batches(batch_size=filas, columns=esperadas):
+            yield _a_pandas(lote)
+    finally:
+        archivo.close()
+
+
+def _tabla_arrow(origen):
+    """Tabla de un archivo Arrow IPC; desde una ruta queda con memoria mapeada."""
+    _requerir_pyarrow("Leer archivos Arrow")
+    from pyarrow import feather
+
+    return feather.read_table(_fuente_arrow(origen), memory_map=True)
+
+
+def _bloques_tabla(tabla, lado: str, filas: int):
+    """Bloques de una tabla Arrow cruda, proyectada a las columnas del esquema."""
+    esperadas = _ESQUEMAS[lado]
+    _validar_columnas(tabla.column_names, esperadas, lado)
+    for lote in tabla.select(esperadas).to_batches(max_chunksize=filas):
+        yield _a_pandas(lote)
+
+
+def _bloques_xls(origen, lado: str):
+    """Formato .xls: pandas no lo lee por partes, se proyecta en una sola lectura."""
+    esperadas = _ESQUEMAS[lado]
+    fh, cerrar = _abrir_binario(origen)
+    try:
+        df = pd.read_excel(fh, usecols=lambda c: str(c).strip() in esperadas)
+    finally:
+        if cerrar:
+            fh.close()
+    df.columns = [str(c).strip() for c in df.columns]
+    _validar_columnas(list(df.columns), esperadas, lado)
+    yield df[esperadas]
+
+
+def leer_lado(
+    origen,
+    lado: str,
+    nombre: str | None = None,
+    encoding: str = "utf-8",
+    filas_por_bloque: int = _FILAS_POR_BLOQUE,
+) -> pd.DataFrame:
+    """
+    Lee y normaliza el archivo de un lado ("MAYOR" o "BANCO").
+
+    `origen` puede ser una ruta, bytes o un archivo abierto (por ejemplo el de `st.file_uploader`);
+    el formato sale de la extensión de `nombre` o de `origen`: .csv, .xlsx, .xls, .parquet o
+    Arrow IPC (.arrow/.feather; estos dos y Parquet requieren pyarrow). Una instantánea de
+    `guardar_instantanea` se devuelve tal cual, sin volver a normalizar. Devuelve las columnas del esquema
+    más `COLUMNAS_NORMALIZADAS`, solo con las filas de fecha e importe válidos: el mismo
+    DataFrame que `conciliacion_mvp` armaría, que lo usa sin volver a parsear. En `attrs` quedan
+    los formatos de importe y fecha detectados y las filas rechazadas (`rechazos`: total, por importe y por
+    fecha).
+    """
+    if lado not in _ESQUEMAS:
+        raise ValueError(f"Lado desconocido: {lado!r}. Opciones: {list(_ESQUEMAS)}")
+    if filas_por_bloque < 1:
+        raise ValueError("filas_por_bloque debe ser mayor que cero")
+
+    ext = _extension(origen, nombre)
+    if ext == ".csv":
+        bloques = _bloques_csv(origen, lado, encoding, filas_por_bloque)
+    elif ext == ".xlsx":
+        bloques = _bloques_xlsx(origen, lado, filas_por_bloque)
+    elif ext == ".xls":
+        bloques = _bloques_xls(origen, lado)
+    elif ext == ".parquet":
+        bloques = _bloques_parquet(origen, lado, filas_por_bloque)
+    elif ext in EXTENSIONES_ARROW:
+        tabla = _tabla_arrow(origen)
+        if _CLAVE_INSTANTANEA in (tabla.schema.metadata or {}):
+            return _desde_instantanea(tabla, lado)
+        bloques = _bloques_tabla(tabla, lado, filas_por_bloque)
+    else:
+        raise ValueError(f"Formato no soportado: {ext!r}. Usar .csv, .xlsx, .xls, .parquet, .arrow o .feather")
+
+    # Los formatos de importe y fecha se detectan en el primer bloque y se mantienen en el resto
+    normalizados = []
+    formato_importe = formato_fecha = None
+    for bloque in bloques:
+        normalizados.append(normalizar_fragmento(bloque, lado, formato_importe, formato_fecha))
+        formato_importe = formato_importe or normalizados[-1].attrs["formato_importe"]
+        formato_fecha = formato_fecha or normalizados[-1].attrs["formato_fecha"]
+    if not normalizados:
+        return normalizar_fragmento(pd.DataFrame(columns=_ESQUEMAS[lado]), lado)
+    df = pd.concat(normalizados, ignore_index=True)[_ESQUEMAS[lado] + COLUMNAS_NORMALIZADAS]
+    df.attrs["formato_importe"] = formato_importe
+    df.attrs["formato_fecha"] = formato_fecha
+    df.attrs["rechazos"] = {
+        k: sum(n.attrs["rechazos"][k] for n in normalizados) for k in normalizados[0].attrs["rechazos"]
+    }
+    return df
+
+
+def leer_mayor(origen, nombre: str | None = None, **kwargs) -> pd.DataFrame:
+    """Lee y normaliza un archivo del Mayor; ver `leer_lado`."""
+    return leer_lado(origen, "MAYOR", nombre, **kwargs)
+
+
+def leer_banco(origen, nombre: str | None = None, **kwargs) -> pd.DataFrame:
+    """Lee y normaliza un archivo del Banco; ver `leer_lado`."""
+    return leer_lado(origen, "BANCO", nombre, **kwargs)
+
+
+# --- Instantáneas normalizadas ---
+
+def guardar_instantanea(df: pd.DataFrame, lado: str, destino):
+    """
+    Guarda un lado normalizado (el DataFrame de `leer_lado`) como instantánea Arrow IPC.
+
+    El archivo queda sin comprimir para poder mapearlo en memoria y lleva en los metadatos el
+    lado, los formatos detectados y los rechazos. Las columnas object con tipos mezclados (por
+    ejemplo números y texto de un Excel) se guardan como texto. Sobre una ruta escribe en un
+    temporal y lo renombra, así otro proceso nunca abre una instantánea a medio escribir.
+    """
+    _requerir_pyarrow("Guardar instantáneas")
+    import pyarrow as pa
+    from pyarrow import feather
+
+    if lado not in _ESQUEMAS:
+        raise ValueError(f"Lado desconocido: {lado!r}. Opciones: {list(_ESQUEMAS)}")
+    columnas = _ESQUEMAS[lado] + COLUMNAS_NORMALIZADAS
+    _validar_columnas(list(df.columns), columnas, lado)
+    metadatos = {
+        "lado": lado,
+        "formato_importe": df.attrs.get("formato_importe"),
+        "formato_fecha": df.attrs.get("formato_fecha"),
+        "rechazos": df.attrs.get("rechazos", {"filas": 0, "importe": 0, "fecha": 0}),
+    }
+    df = df[columnas]
+    mixtas = [
+        c for c in df.columns
+        if df[c].dtype == object and pd.api.types.infer_dtype(df[c], skipna=True) not in ("string", "empty")
+    ]
+    if mixtas:
+        df = df.assign(**{c: df[c].where(df[c].isna(), df[c].astype(str)) for c in mixtas})
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    tabla = tabla.replace_schema_metadata({
+        **(tabla.schema.metadata or {}), _CLAVE_INSTANTANEA: json.dumps(metadatos).encode("utf-8"),
+    })
+    if not isinstance(destino, (str, os.PathLike)):
+        feather.write_feather(tabla, destino, compression="uncompressed")
+        return
+    temporal = f"{os.fspath(destino)}.{os.getpid()}.tmp"
+    try:
+        feather.write_feather(tabla, temporal, compression="uncompressed")
+        os.replace(temporal, destino)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def leer_instantanea(origen, lado: str) -> pd.DataFrame:
+    """
+    Abre una instantánea de `guardar_instantanea` como el DataFrame que devolvía `leer_lado`.
+
+    Desde una ruta el archivo queda mapeado en memoria: los textos se usan sin copiar y los
+    procesos que abren la misma instantánea comparten las páginas.
+    """
+    if lado not in _ESQUEMAS:
+        raise ValueError(f"Lado desconocido: {lado!r}. Opciones: {list(_ESQUEMAS)}")
+    tabla = _tabla_arrow(origen)
+    if _CLAVE_INSTANTANEA not in (tabla.schema.metadata or {}):
+        raise ValueError("El archivo no es una instantánea normalizada")
+    return _desde_instantanea(tabla, lado)
+
+
+def _desde_instantanea(tabla, lado: str) -> pd.DataFrame:
+    """DataFrame normalizado de una instantánea, con sus formatos y rechazos en `attrs`."""
+    metadatos = json.loads(tabla.schema.metadata[_CLAVE_INSTANTANEA])
+    if metadatos["lado"] != lado:
+        raise ValueError(
+            f"Se esperaba una instantánea del {lado.capitalize()} y se recibió una del {metadatos['lado'].capitalize()}"
+        )
+    df = _a_pandas(tabla.select(_ESQUEMAS[lado] + COLUMNAS_NORMALIZADAS))
+    df.attrs["formato_importe"] = metadatos["formato_importe"]
+    df.attrs["formato_fecha"] = metadatos["formato_fecha"]
+    df.attrs["rechazos"] = metadatos["rechazos"]
+    return df
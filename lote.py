@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Conciliación por lotes desde la línea de comandos, sin Streamlit.
+
+Lee un manifiesto con un trabajo por cuenta y período (archivo del Mayor, archivo del Banco y
+parámetros), los reparte en un pool de procesos y deja, por trabajo, el detalle, el resumen y
+las métricas por fase en `<destino>/<nombre>/`, más un informe de tiempos de todo el lote en
+`<destino>/informe.csv`. Un trabajo que falla queda registrado en el informe sin frenar al resto.
+
+    python lote.py manifiesto.csv --destino salida --trabajadores 4
+
+El manifiesto es un CSV con columnas `mayor`, `banco` y, opcionales, `nombre` y cualquiera de
+`PARAMETROS_TRABAJO`; o un JSON `{"parametros": {...}, "trabajos": [{...}, ...]}` con las mismas
+claves, donde `parametros` vale para todos los trabajos que no los redefinen. Las rutas relativas
+se toman desde la carpeta del manifiesto.
+
+Con `--instantaneas DIR`, cada archivo leído deja en DIR su lado normalizado como instantánea
+Arrow; los lotes siguientes que usan el mismo archivo (misma ruta, tamaño y fecha de
+modificación) la abren mapeada en memoria en lugar de volver a parsearlo. Las instantáneas
+requieren pyarrow: sin él, el lote avisa y lee los archivos como siempre.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple
+
+import pandas as pd
+
+from cache_resultados import CacheResultados
+from exportacion import FORMATOS_EXPORTACION, exportar
+from ingesta import EXTENSIONES_ARROW, guardar_instantanea, leer_instantanea, leer_lado
+from reconciliacion import LibroNormalizado, MetricasConciliacion, conciliacion_mvp
+
+# Parámetros de `conciliacion_mvp` que acepta un trabajo, con su tipo y el valor por defecto
+# (los mismos que propone la página)
+PARAMETROS_TRABAJO = {
+    "tolerancia_dias": (int, 3),
+    "max_items_grupo": (int, 3),
+    "direccion": (str, "MAYOR→BANCO"),
+    "tolerancia_valor": (float, 0.0),
+    "modo_asignacion": (str, "greedy"),
+    "procesos": (int, 1),
+    "candidatos_grupo": (int, None),
+}
+
+# Columnas del informe de tiempos, una fila por trabajo
+COLUMNAS_INFORME = [
+    "nombre", "estado", "error", "filas_mayor", "filas_banco", "rechazadas_mayor", "rechazadas_banco",
+    "conciliados", "solo_mayor", "solo_banco",
+    "segundos_lectura", "segundos_conciliacion", "segundos_escritura", "segundos_total",
+]
+
+
+class Trabajo(NamedTuple):
+    """Una conciliación del lote: par de archivos y parámetros."""
+    nombre: str
+    mayor: str
+    banco: str
+    parametros: dict
+
+
+def _parametros(fila: dict, base: dict, ubicacion: str) -> dict:
+    """Parámetros de un trabajo: los de la fila sobre `base`, convertidos al tipo esperado."""
+    parametros = dict(base)
+    for clave, (tipo, _) in PARAMETROS_TRABAJO.items():
+        valor = fila.get(clave)
+        if valor is None or (isinstance(valor, str) and not valor.strip()) or (isinstance(valor, float) and pd.isna(valor)):
+            continue
+        try:
+            parametros[clave] = tipo(valor) if tipo is not int else int(float(valor))
+        except (TypeError, ValueError):
+            raise ValueError(f"{ubicacion}: valor inválido para {clave}: {valor!r}") from None
+    return parametros
+
+
+def _nombre_carpeta(nombre: str) -> str:
+    """Nombre de trabajo apto como carpeta: sin separadores ni caracteres raros."""
+    return re.sub(r"[^\w.-]+", "_", nombre).strip("._") or "trabajo"
+
+
+def leer_manifiesto(ruta: str, parametros: dict | None = None) -> list[Trabajo]:
+    """
+    Lee un manifiesto CSV o JSON y devuelve sus trabajos.
+
+    `parametros` son los valores por defecto del lote (p. ej. los de la línea de comandos); el
+    manifiesto y cada fila los pisan. Valida que haya archivos de ambos lados, que los
+    parámetros se puedan convertir y que los nombres no se repitan.
+    """
+    base = {clave: defecto for clave, (_, defecto) in PARAMETROS_TRABAJO.items()}
+    base.update(parametros or {})
+    carpeta = os.path.dirname(os.path.abspath(ruta))
+
+    if ruta.lower().endswith(".json"):
+        with open(ruta, encoding="utf-8") as f:
+            contenido = json.load(f)
+        if isinstance(contenido, list):
+            contenido = {"trabajos": contenido}
+        base = _parametros(contenido.get("parametros", {}), base, ruta)
+        filas = contenido.get("trabajos", [])
+    else:
+        filas = pd.read_csv(ruta, dtype=str, keep_default_na=False, encoding="utf-8-sig").to_dict("records")
+
+    trabajos = []
+    for i, fila in enumerate(filas, start=1):
+        ubicacion = f"{ruta}, trabajo {i}"
+        desconocidas = set(fila) - set(PARAMETROS_TRABAJO) - {"nombre", "mayor", "banco"}
+        if desconocidas:
+            raise ValueError(f"{ubicacion}: columnas desconocidas {sorted(desconocidas)}")
+        if not fila.get("mayor") or not fila.get("banco"):
+            raise ValueError(f"{ubicacion}: faltan los archivos del Mayor o del Banco")
+        mayor, banco = (os.path.join(carpeta, os.path.expanduser(str(fila[lado]))) for lado in ("mayor", "banco"))
+        nombre = _nombre_carpeta(str(fila.get("nombre") or os.path.splitext(os.path.basename(mayor))[0]))
+        trabajos.append(Trabajo(nombre, mayor, banco, _parametros(fila, base, ubicacion)))
+
+    repetidos = sorted(n for n, c in pd.Series([t.nombre for t in trabajos]).value_counts().items() if c > 1)
+    if repetidos:
+        raise ValueError(f"{ruta}: nombres de trabajo repetidos {repetidos}")
+    return trabajos
+
+
+def _leer(ruta: str, lado: str, directorio_instantaneas: str | None) -> pd.DataFrame:
+    """
+    Lado normalizado de un archivo. Con `directorio_instantaneas`, la primera lectura deja una
+    instantánea (identificada por ruta, tamaño y fecha de modificación) y las siguientes la abren.
+    Sin pyarrow avisa y lee el archivo sin instantánea.
+    """
+    if directorio_instantaneas is None or os.path.splitext(ruta)[1].lower() in EXTENSIONES_ARROW:
+        return leer_lado(ruta, lado)
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        warnings.warn("Las instantáneas requieren pyarrow (pip install pyarrow); se leen los archivos sin ellas")
+        return leer_lado(ruta, lado)
+    estado = os.stat(ruta)
+    clave = f"{lado}|{os.path.abspath(ruta)}|{estado.st_size}|{estado.st_mtime_ns}"
+    instantanea = os.path.join(directorio_instantaneas, hashlib.sha1(clave.encode("utf-8")).hexdigest() + ".arrow")
+    if os.path.exists(instantanea):
+        return leer_instantanea(instantanea, lado)
+    df = leer_lado(ruta, lado)
+    os.makedirs(directorio_instantaneas, exist_ok=True)
+    guardar_instantanea(df, lado, instantanea)
+    return df
+
+
+def correr_trabajo(
+    trabajo: Trabajo,
+    destino: str,
+    formato: str = "xlsx",
+    directorio_cache: str | None = None,
+    directorio_instantaneas: str | None = None,
+) -> dict:
+    """
+    Concilia un trabajo y escribe sus salidas en `<destino>/<nombre>/`.
+
+    Deja el detalle en `formato` (el Excel trae también las hojas Resumen y Métricas), más
+    `resumen.csv` y `metricas.csv`. Devuelve la fila del informe; un error no se propaga, queda
+    en las columnas `estado` y `error`.
+    """
+    registro = {"nombre": trabajo.nombre, "estado": "ok", "error": None}
+    inicio = time.perf_counter()
+    try:
+        df_mayor = _leer(trabajo.mayor, "MAYOR", directorio_instantaneas)
+        df_banco = _leer(trabajo.banco, "BANCO", directorio_instantaneas)
+        registro.update(
+            filas_mayor=len(df_mayor), filas_banco=len(df_banco),
+            rechazadas_mayor=df_mayor.attrs["rechazos"]["filas"], rechazadas_banco=df_banco.attrs["rechazos"]["filas"],
+        )
+        mayor, banco = LibroNormalizado(df_mayor, "MAYOR"), LibroNormalizado(df_banco, "BANCO")
+        del df_mayor, df_banco
+        lectura = time.perf_counter()
+
+        metricas = MetricasConciliacion()
+        cache = CacheResultados(directorio_cache) if directorio_cache else None
+        detalle, resumen = conciliacion_mvp(mayor, banco, cache=cache, metricas=metricas, **trabajo.parametros)
+        conciliacion = time.perf_counter()
+
+        carpeta = os.path.join(destino, trabajo.nombre)
+        os.makedirs(carpeta, exist_ok=True)
+        tabla_metricas = metricas.tabla()
+        exportar(detalle, resumen, formato, os.path.join(carpeta, f"detalle.{formato}"), metricas=tabla_metricas)
+        resumen.to_csv(os.path.join(carpeta, "resumen.csv"), index=False)
+        tabla_metricas.to_csv(os.path.join(carpeta, "metricas.csv"), index=False)
+        escritura = time.perf_counter()
+
+        cantidades = detalle["estado"].value_counts()
+        registro.update(
+            conciliados=int(cantidades[cantidades.index.str.startswith("Conciliado")].sum()),
+            solo_mayor=int(cantidades.get("Solo en Mayor", 0)),
+            solo_banco=int(cantidades.get("Solo en Banco", 0)),
+            segundos_lectura=round(lectura - inicio, 3),
+            segundos_conciliacion=round(conciliacion - lectura, 3),
+            segundos_escritura=round(escritura - conciliacion, 3),
+        )
+    except Exception as e:
+        registro.update(estado="error", error=f"{type(e).__name__}: {e}")
+    registro["segundos_total"] = round(time.perf_counter() - inicio, 3)
+    return registro
+
+
+def correr_lote(
+    trabajos: list[Trabajo],
+    destino: str,
+    formato: str = "xlsx",
+    trabajadores: int = 1,
+    directorio_cache: str | None = None,
+    al_terminar=None,
+    directorio_instantaneas: str | None = None,
+) -> pd.DataFrame:
+    """
+    Corre los trabajos en `trabajadores` procesos y escribe `<destino>/informe.csv`.
+
+    Devuelve el informe (una fila por trabajo, en el orden del manifiesto). `al_terminar`, si se
+    pasa, recibe la fila de cada trabajo a medida que termina. `directorio_instantaneas` guarda
+    y reutiliza las instantáneas normalizadas de los archivos (ver `_leer`).
+    """
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato de exportación desconocido: {formato!r}. Opciones: {FORMATOS_EXPORTACION}")
+    if trabajadores < 1:
+        raise ValueError("trabajadores debe ser mayor que cero")
+    os.makedirs(destino, exist_ok=True)
+
+    registros = {}
+    if trabajadores == 1 or len(trabajos) <= 1:
+        for trabajo in trabajos:
+            registros[trabajo.nombre] = correr_trabajo(
+                trabajo, destino, formato, directorio_cache, directorio_instantaneas
+            )
+            if al_terminar is not None:
+                al_terminar(registros[trabajo.nombre])
+    else:
+        with ProcessPoolExecutor(max_workers=min(trabajadores, len(trabajos))) as pool:
+            futuros = [
+                pool.submit(correr_trabajo, t, destino, formato, directorio_cache, directorio_instantaneas)
+                for t in trabajos
+            ]
+            for futuro in as_completed(futuros):
+                registro = futuro.result()
+                registros[registro["nombre"]] = registro
+                if al_terminar is not None:
+                    al_terminar(registro)
+
+    informe = pd.DataFrame([registros[t.nombre] for t in trabajos], columns=COLUMNAS_INFORME)
+    # Los trabajos con error no tienen cantidades: enteros con faltantes en lugar de float
+    cantidades = [c for c in COLUMNAS_INFORME[3:] if not c.startswith("segundos")]
+    informe[cantidades] = informe[cantidades].astype("Int64")
+    informe.to_csv(os.path.join(destino, "informe.csv"), index=False)
+    return informe
+
+
+def _imprimir(registro: dict):
+    if registro["estado"] == "ok":
+        print(
+            f"{registro['nombre']}: {registro['conciliados']} conciliados, {registro['solo_mayor']} solo en Mayor, "
+            f"{registro['solo_banco']} solo en Banco ({registro['segundos_total']:.1f}s)",
+            flush=True,
+        )
+    else:
+        print(f"{registro['nombre']}: ERROR {registro['error']}", file=sys.stderr, flush=True)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifiesto", help="CSV o JSON con los trabajos")
+    parser.add_argument("--destino", default="resultados_lote", help="Carpeta de salida")
+    parser.add_argument("--formato", choices=FORMATOS_EXPORTACION, default="xlsx", help="Formato del detalle")
+    parser.add_argument("--trabajadores", type=int, default=os.cpu_count() or 1,
+                        help="Procesos en paralelo (uno por trabajo)")
+    parser.add_argument("--cache", default=None,
+                        help="Directorio de la cache de resultados (por defecto el de la página)")
+    parser.add_argument("--sin-cache", action="store_true", help="No usar la cache de resultados")
+    parser.add_argument("--instantaneas", default=None,
+                        help="Carpeta de instantáneas normalizadas de los archivos (se crean en la primera lectura)")
+    for clave, (tipo, defecto) in PARAMETROS_TRABAJO.items():
+        parser.add_argument(f"--{clave.replace('_', '-')}", type=tipo, default=None,
+                            help=f"Valor para los trabajos que no lo definen (por defecto {defecto})")
+    args = parser.parse_args(argv)
+    if args.trabajadores < 1:
+        parser.error("--trabajadores debe ser mayor que cero")
+
+    parametros = {clave: getattr(args, clave) for clave in PARAMETROS_TRABAJO if getattr(args, clave) is not None}
+    try:
+        trabajos = leer_manifiesto(args.manifiesto, parametros)
+    except (OSError, ValueError) as e:
+        print(f"Manifiesto inválido: {e}", file=sys.stderr)
+        return 2
+    directorio_cache = None if args.sin_cache else (args.cache or CacheResultados().directorio)
+
+    informe = correr_lote(
+        trabajos, args.destino, args.formato, args.trabajadores, directorio_cache, al_terminar=_imprimir,
+        directorio_instantaneas=args.instantaneas,
+    )
+    errores = int((informe["estado"] != "ok").sum())
+    print(f"\n{len(informe) - errores} de {len(informe)} trabajos terminados; informe en "
+          f"{os.path.join(args.destino, 'informe.csv')}")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,14 @@
 # -*- coding: utf-8 -*-
 
+import bisect
+import itertools
+import math
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache, partial
+from typing import Iterator, NamedTuple
+
 import pandas as pd
 import numpy as np
 from datetime import datetime
@@ -13,30 +22,430 @@ BANCO_COLS = [
     "NUM", "FECHA", "COMBTE", "DESCRIPCION", "DEBITO", "CREDITO", "SALDO", "IMPORTE"
 ]
 
+# Direcciones de agrupación soportadas
+DIRECCIONES = ["MAYOR→BANCO", "BANCO→MAYOR", "AMBAS"]
+
+# Estados de la salida; los matches los guardan como código (posición en esta lista)
+ESTADOS = [
+    "Conciliado exacto",
+    "Conciliado por tolerancia de fecha",
+    "Conciliado por tolerancia de valor",
+    "Conciliado por tolerancia",
+    "Conciliado por agrupación",
+    "Solo en Mayor",
+    "Solo en Banco",
+]
+
+# Formas de salida de conciliacion_mvp: el detalle ancho o solo posiciones y códigos
+SALIDAS = ["detalle", "ids"]
+
+# Modos del one-to-one: "greedy" recorre el Banco en orden; "optimo" resuelve una asignación
+# de costo mínimo por componente conexa del grafo de candidatos
+MODOS_ASIGNACION = ["greedy", "optimo"]
+
+# Objetivos entre dos avisos de `progreso` dentro de una fase
+_OBJETIVOS_POR_AVISO = 512
+
+# Tipo de las columnas de texto: string de Arrow si pyarrow está instalado (sin él quedan object)
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    TIPO_TEXTO = None
+else:
+    TIPO_TEXTO = pd.StringDtype("pyarrow")
+
+# Columnas del detalle que se guardan como categóricas
+COLUMNAS_CATEGORICAS = ["estado", "regla", "grupo_id", "cuenta"]
+
+
+class ConciliacionCancelada(Exception):
+    """La lanza el callback `progreso` para cortar una conciliación en curso."""
+
 # --- Utilidades ---
 
 def _coerce_datetime64(df: pd.DataFrame) -> pd.DataFrame:
-    """Convierte columnas Fecha_norm* a datetime64 para compatibilidad con Streamlit/Arrow."""
-    out = df.copy()
-    for c in list(out.columns):
-        if isinstance(c, str) and c.startswith("Fecha_norm"):
-            out[c] = pd.to_datetime(out[c], errors="coerce")
-    return out
+    """
+    Convierte en el lugar las columnas Fecha_norm* a datetime64 para compatibilidad con
+    Streamlit/Arrow; las que ya lo son no se tocan. Devuelve el mismo DataFrame.
+    """
+    for c in list(df.columns):
+        if isinstance(c, str) and c.startswith("Fecha_norm") and not pd.api.types.is_datetime64_any_dtype(df[c]):
+            df[c] = pd.to_datetime(df[c], errors="coerce")
+    return df
+
+
+def _valores_texto(serie: pd.Series):
+    """
+    Valores de una columna listos para `take`: una columna object con solo textos o faltantes
+    pasa a `TIPO_TEXTO`; las demás quedan con su tipo.
+    """
+    if (
+        TIPO_TEXTO is not None and serie.dtype == object
+        and pd.api.types.infer_dtype(serie, skipna=True) in ("string", "empty")
+    ):
+        return pd.array(serie, dtype=TIPO_TEXTO)
+    return serie.array if isinstance(serie.dtype, pd.api.extensions.ExtensionDtype) else serie.to_numpy()
+
+
+def _compactar_tipos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    En el lugar: `COLUMNAS_CATEGORICAS` a categóricas y las columnas object de solo textos a
+    `TIPO_TEXTO`. Devuelve el mismo DataFrame.
+    """
+    for c in list(df.columns):
+        if c in COLUMNAS_CATEGORICAS:
+            if not isinstance(df[c].dtype, pd.CategoricalDtype):
+                df[c] = df[c].astype("category")
+        elif df[c].dtype == object:
+            df[c] = _valores_texto(df[c])
+    return df
+
+
+def _fecha_desde_dia(dias) -> np.ndarray:
+    """Días desde 1970-01-01 a datetime64[ns]."""
+    return np.asarray(dias, dtype=np.int64).astype("datetime64[D]").astype("datetime64[ns]")
+
+
+# --- Fechas ---
+
+# Formatos de fecha en texto que se prueban; ante un empate gana el primero
+FORMATOS_FECHA = ["%d/%m/%Y", "%d/%m/%Y %H:%M:%S", "ISO8601", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y", "%Y/%m/%d"]
+# Números de serie de Excel: días desde 1899-12-30, hasta el 31/12/9999
+SERIAL_EXCEL = "serial_excel"
+_DIA_ORIGEN_EXCEL = -25_569
+_MAX_SERIAL_EXCEL = 2_958_465
+
+# Textos distintos que se miran para detectar el formato de una columna
+_MUESTRA_FORMATO_FECHA = 200
 
 
-def _parse_fecha(series: pd.Series) -> pd.Series:
-    """Acepta dd/mm/yyyy o ya datetime/date."""
-    ser = pd.to_datetime(series, format="%d/%m/%Y", errors="coerce").dt.date
-    return ser
+class FechasParseadas(NamedTuple):
+    """Resultado de `parsear_fechas`, alineado con la serie de entrada."""
+    dias: np.ndarray  # int32, días desde 1970-01-01; 0 en las filas rechazadas
+    validos: np.ndarray
+    formato: str | None  # None si la columna ya era de fechas
 
+    @property
+    def rechazados(self) -> int:
+        """Filas sin una fecha válida (vacías o que no se pudieron leer)."""
+        return int((~self.validos).sum())
 
-def _parse_importe(series: pd.Series) -> pd.Series:
-    """Parsea importes con separador de miles (.) y decimales (,)."""
-    s = series.copy()
-    if s.dtype == object:
-        s = s.astype(str).str.replace(".", "", regex=False)  # separador de miles
-        s = s.str.replace(",", ".", regex=False)
-    return pd.to_numeric(s, errors="coerce")
+
+def _dias_desde_datetime(valores) -> np.ndarray:
+    """Fechas datetime64 a días (float, NaN en NaT)."""
+    crudos = np.asarray(valores, dtype="datetime64[ns]").astype("datetime64[D]")
+    return np.where(np.isnat(crudos), np.nan, crudos.astype(np.int64))
+
+
+def _dias_desde_serial(valores) -> np.ndarray:
+    """Números de serie de Excel (la hora se descarta) a días (float, NaN fuera de rango)."""
+    numeros = pd.to_numeric(pd.Series(valores, dtype=object), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    en_rango = (numeros >= 1) & (numeros <= _MAX_SERIAL_EXCEL)
+    return np.where(en_rango, np.floor(numeros) + _DIA_ORIGEN_EXCEL, np.nan)
+
+
+def _dias_desde_texto(textos: pd.Series, formato: str) -> np.ndarray:
+    """Textos en un formato de `FORMATOS_FECHA` o `SERIAL_EXCEL` a días (float, NaN si no encajan)."""
+    if formato == SERIAL_EXCEL:
+        return _dias_desde_serial(textos)
+    return _dias_desde_datetime(pd.to_datetime(textos, format=formato, errors="coerce"))
+
+
+def detectar_formato_fecha(serie: pd.Series) -> str:
+    """
+    Formato de una columna de fechas en texto: el de `FORMATOS_FECHA` (o `SERIAL_EXCEL`) que
+    lee más valores de una muestra de sus valores distintos.
+    """
+    textos = pd.Series(
+        [v.strip() for v in pd.unique(serie.head(_MUESTRA_FORMATO_FECHA * 50).dropna()) if isinstance(v, str)],
+        dtype=object,
+    ).head(_MUESTRA_FORMATO_FECHA)
+    leidos = {f: int((~np.isnan(_dias_desde_texto(textos, f))).sum()) for f in FORMATOS_FECHA + [SERIAL_EXCEL]}
+    return max(leidos, key=leidos.get)
+
+
+def _dias_desde_distintos(unicos: np.ndarray, formato: str | None) -> tuple[np.ndarray, str]:
+    """
+    Días (float, NaN si no se pudo) de valores distintos de cualquier tipo: fechas nativas,
+    números de serie de Excel o textos. Un texto que no encaja con el formato de la columna
+    se prueba con los demás formatos antes de descartarlo.
+    """
+    dias = np.full(len(unicos), np.nan)
+    tipos = pd.Series(unicos, dtype=object).map(type)
+    es_texto = (tipos == str).to_numpy()
+    es_numero = tipos.map(lambda t: issubclass(t, (int, float, np.number)) and not issubclass(t, (bool, np.bool_))).to_numpy()
+    es_fecha = ~es_texto & ~es_numero
+
+    if es_fecha.any():
+        fechas = pd.to_datetime(pd.Series(unicos[es_fecha], dtype=object), errors="coerce", utc=True).dt.tz_localize(None)
+        dias[es_fecha] = _dias_desde_datetime(fechas)
+    if es_numero.any():
+        dias[es_numero] = _dias_desde_serial(unicos[es_numero])
+    if es_texto.any():
+        textos = pd.Series(unicos[es_texto], dtype=object).str.strip()
+        if formato is None:
+            formato = detectar_formato_fecha(textos)
+        leidos = np.full(len(textos), np.nan)
+        for f in [formato] + [f for f in FORMATOS_FECHA + [SERIAL_EXCEL] if f != formato]:
+            pendientes = np.flatnonzero(np.isnan(leidos))
+            if len(pendientes) == 0:
+                break
+            leidos[pendientes] = _dias_desde_texto(textos.iloc[pendientes], f)
+        dias[es_texto] = leidos
+    return dias, formato
+
+
+def parsear_fechas(serie: pd.Series, formato: str | None = None) -> FechasParseadas:
+    """
+    Parsea una columna de fechas a días desde 1970-01-01.
+
+    Acepta columnas datetime64 (también con zona horaria), números de serie de Excel y textos
+    en alguno de `FORMATOS_FECHA`; para los textos usa el `formato` dado o el que detecta
+    `detectar_formato_fecha`. Los valores distintos se parsean una sola vez y el resultado
+    vuelve a cada fila por su código.
+    """
+    if formato is not None and formato not in FORMATOS_FECHA + [SERIAL_EXCEL]:
+        raise ValueError(f"Formato de fecha desconocido: {formato!r}. Opciones: {FORMATOS_FECHA + [SERIAL_EXCEL]}")
+    if isinstance(serie.dtype, pd.DatetimeTZDtype):
+        dias, formato = _dias_desde_datetime(serie.dt.tz_localize(None)), None
+    elif pd.api.types.is_datetime64_any_dtype(serie.dtype):
+        dias, formato = _dias_desde_datetime(serie), None
+    elif pd.api.types.is_numeric_dtype(serie.dtype) and not pd.api.types.is_bool_dtype(serie.dtype):
+        dias, formato = _dias_desde_serial(serie), SERIAL_EXCEL
+    else:
+        codigos, unicos = pd.factorize(serie.to_numpy(dtype=object), use_na_sentinel=True)
+        dias_unicos, formato = _dias_desde_distintos(np.asarray(unicos, dtype=object), formato)
+        # El último lugar queda NaN para los códigos -1 (nulos)
+        dias = np.append(dias_unicos, np.nan)[codigos]
+    validos = ~np.isnan(dias)
+    return FechasParseadas(np.where(validos, dias, 0).astype(np.int32), validos, formato)
+
+
+# --- Importes ---
+
+# Formatos de importe en texto: "coma_decimal" (1.234,56) o "punto_decimal" (1,234.56 / 1234.56)
+FORMATOS_IMPORTE = ["coma_decimal", "punto_decimal"]
+
+# Valores distintos que se miran para detectar el formato de una columna
+_MUESTRA_FORMATO = 1_000
+# Con menos de esta proporción de valores distintos en una muestra conviene parsear solo los distintos
+_MUESTRA_REPETIDOS = 10_000
+_PROPORCION_DISTINTOS = 0.5
+# Textos por tanda al parsear: la matriz de caracteres ocupa 4 bytes por carácter
+_IMPORTES_POR_TANDA = 65_536
+# Límites de un importe en texto; con 14 enteros y 4 decimales el numerador entra exacto en int64.
+# Un texto con decimales distintos de cero más allá del cuarto se rechaza en lugar de truncarse.
+_MAX_CARACTERES = 40
+_MAX_DIGITOS_ENTEROS = 14
+_MAX_DECIMALES = 4
+
+# Clases de carácter de un importe en texto
+_OTRO, _DIGITO, _DECIMAL, _MILES, _MENOS, _MAS, _ABRE, _CIERRA, _IGNORADO = range(9)
+
+
+@lru_cache(maxsize=None)
+def _clases_caracter(formato: str) -> np.ndarray:
+    """Tabla código de carácter -> clase para los códigos 0..255 (256 = cualquier otro)."""
+    decimal, miles = (",", ".") if formato == "coma_decimal" else (".", ",")
+    tabla = np.full(257, _OTRO, dtype=np.uint8)
+    tabla[ord("0"):ord("9") + 1] = _DIGITO
+    tabla[ord(decimal)], tabla[ord(miles)] = _DECIMAL, _MILES
+    tabla[ord("-")], tabla[ord("+")], tabla[ord("(")], tabla[ord(")")] = _MENOS, _MAS, _ABRE, _CIERRA
+    # Relleno de la matriz, espacios y símbolo de moneda no cambian el valor
+    for c in (0, ord(" "), ord("\t"), 0xA0, ord("$")):
+        tabla[c] = _IGNORADO
+    return tabla
+
+
+def _voto_formato(texto: str) -> str | None:
+    """Formato que delata un importe, o None si es ambiguo (p. ej. "1.234" o "100")."""
+    t = "".join(ch for ch in texto if ch in "0123456789.,")
+    puntos, comas = t.count("."), t.count(",")
+    if puntos and comas:
+        decimal = "." if t.rfind(".") > t.rfind(",") else ","
+    elif puntos + comas == 0:
+        return None
+    else:
+        sep = "." if puntos else ","
+        if puntos + comas > 1:
+            decimal = "," if sep == "." else "."
+        elif len(t) - t.rfind(sep) - 1 != 3:
+            decimal = sep
+        else:
+            return None
+    return "punto_decimal" if decimal == "." else "coma_decimal"
+
+
+def detectar_formato_importe(serie: pd.Series) -> str:
+    """
+    Formato de una columna de importes en texto según una muestra de sus valores distintos.
+
+    Vota cada valor que no es ambiguo; sin votos o con empate queda "coma_decimal", el formato
+    de los archivos del Mayor y del Banco.
+    """
+    votos = Counter()
+    for valor in pd.unique(serie.head(_MUESTRA_FORMATO * 10).dropna())[:_MUESTRA_FORMATO]:
+        if isinstance(valor, str):
+            votos[_voto_formato(valor)] += 1
+    return "punto_decimal" if votos["punto_decimal"] > votos["coma_decimal"] else "coma_decimal"
+
+
+class ImportesParseados(NamedTuple):
+    """Resultado de `parsear_importes`, alineado con la serie de entrada."""
+    valores: np.ndarray  # float64, NaN en las filas rechazadas
+    centavos: np.ndarray  # int64, 0 en las filas rechazadas
+    validos: np.ndarray
+    formato: str | None  # None si la columna ya era numérica
+
+    @property
+    def rechazados(self) -> int:
+        """Filas sin un importe válido (vacías o con texto que no es un número)."""
+        return int((~self.validos).sum())
+
+
+def _centavos_de_float(valores: np.ndarray) -> np.ndarray:
+    """Centavos de importes que ya llegan como float; 0 en los NaN."""
+    return np.where(np.isnan(valores), 0, np.round(np.nan_to_num(valores) * 100)).astype(np.int64)
+
+
+def _importes_desde_texto(textos: np.ndarray, formato: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Parsea un array de textos ("<U") en una pasada vectorizada a (float, centavos int64); NaN y
+    0 en los inválidos.
+
+    Los textos se ven como una matriz de códigos de carácter; cada carácter se clasifica con
+    una tabla y la matriz se recorre por columnas, avanzando a la vez el estado de todas las
+    filas. Acepta separador de miles, signo adelante o atrás, negativos entre paréntesis,
+    espacios y símbolo de moneda. Los centavos salen del numerador entero, redondeando el
+    tercer y cuarto decimal a la mitad hacia arriba en valor absoluto; el float es solo para
+    mostrar.
+    """
+    ancho = textos.dtype.itemsize // 4
+    n = len(textos)
+    if n == 0 or ancho == 0:
+        return np.full(n, np.nan), np.zeros(n, dtype=np.int64)
+    codigos = np.ascontiguousarray(textos.view(np.uint32).reshape(n, ancho).T)
+    clases = _clases_caracter(formato)[np.minimum(codigos, 256)]
+    clases[codigos == ord("€")] = _IGNORADO
+
+    numerador = np.zeros(n, dtype=np.int64)
+    decimales = np.zeros(n, dtype=np.int64)
+    enteros = np.zeros(n, dtype=np.int64)
+    invalido = np.zeros(n, dtype=bool)
+    visto_digito, visto_decimal, visto_signo = (np.zeros(n, dtype=bool) for _ in range(3))
+    negativo, abierto, cerrado, marca_tras_digito = (np.zeros(n, dtype=bool) for _ in range(4))
+    for j in range(ancho):
+        c = clases[j]
+        digito = c == _DIGITO
+        if digito.any():
+            # Un dígito después de un signo o paréntesis final ("1-2") invalida el texto
+            invalido |= digito & marca_tras_digito
+            toma = digito & (~visto_decimal | (decimales < _MAX_DECIMALES))
+            # Más allá del último decimal admitido solo pueden venir ceros
+            invalido |= digito & ~toma & (codigos[j] != ord("0"))
+            numerador = np.where(toma, numerador * 10 + (codigos[j].astype(np.int64) - ord("0")), numerador)
+            decimales += toma & visto_decimal
+            enteros += digito & ~visto_decimal
+            visto_digito |= digito
+        decimal = c == _DECIMAL
+        invalido |= decimal & visto_decimal
+        visto_decimal |= decimal
+        invalido |= (c == _MILES) & visto_decimal
+        menos = c == _MENOS
+        signo = menos | (c == _MAS)
+        invalido |= signo & visto_signo
+        visto_signo |= signo
+        negativo |= menos
+        abre, cierra = c == _ABRE, c == _CIERRA
+        invalido |= abre & (visto_digito | abierto)
+        abierto |= abre
+        invalido |= cierra & (~abierto | ~visto_digito | cerrado)
+        cerrado |= cierra
+        marca_tras_digito |= (signo | cierra) & visto_digito
+        invalido |= c == _OTRO
+    invalido |= ~visto_digito | (abierto != cerrado) | (enteros > _MAX_DIGITOS_ENTEROS)
+
+    negativo |= abierto
+    numerador = np.where(invalido, 0, numerador)
+    valores = numerador / 10.0 ** decimales
+    valores = np.where(invalido, np.nan, np.where(negativo, -valores, valores))
+
+    divisor = 10 ** np.maximum(decimales - 2, 0)
+    centavos = numerador // divisor * 10 ** np.maximum(2 - decimales, 0)
+    centavos += 2 * (numerador % divisor) >= divisor
+    return valores, np.where(negativo, -centavos, centavos)
+
+
+def _distintos(valores: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (códigos, valores) sin nulos, con -1 en los nulos. Factoriza solo si en una muestra
+    abundan los repetidos; si casi todo es distinto, el hash cuesta más que parsear.
+    """
+    muestra = valores[:_MUESTRA_REPETIDOS]
+    if len(muestra) and len(pd.unique(muestra)) < _PROPORCION_DISTINTOS * len(muestra):
+        return pd.factorize(valores, use_na_sentinel=True)
+    nulos = pd.isna(valores)
+    codigos = np.full(len(valores), -1, dtype=np.intp)
+    codigos[~nulos] = np.arange(int((~nulos).sum()))
+    return codigos, valores[~nulos]
+
+
+def _textos_a_importes(textos: np.ndarray, formato: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Parsea textos (object) por tandas a (float, centavos); los demasiado largos no son importes
+    y quedan NaN.
+    """
+    valores = np.full(len(textos), np.nan)
+    centavos = np.zeros(len(textos), dtype=np.int64)
+    for inicio in range(0, len(textos), _IMPORTES_POR_TANDA):
+        tanda = textos[inicio:inicio + _IMPORTES_POR_TANDA].astype(str)
+        if tanda.dtype.itemsize // 4 > _MAX_CARACTERES:
+            filas = inicio + np.flatnonzero(np.char.str_len(tanda) <= _MAX_CARACTERES)
+            tanda = tanda[filas - inicio].astype(f"<U{_MAX_CARACTERES}")
+        else:
+            filas = slice(inicio, inicio + len(tanda))
+        valores[filas], centavos[filas] = _importes_desde_texto(tanda, formato)
+    return valores, centavos
+
+
+def parsear_importes(serie: pd.Series, formato: str | None = None) -> ImportesParseados:
+    """
+    Parsea una columna de importes a float y a centavos enteros.
+
+    Los textos se parsean con el `formato` dado ("coma_decimal": 1.234,56; "punto_decimal":
+    1,234.56 o 1234.56) o, sin formato, con el que detecta `detectar_formato_importe`; sus
+    centavos son exactos y un texto con decimales distintos de cero después del cuarto se
+    rechaza. Los números (columnas numéricas o celdas numéricas de Excel) se toman tal cual.
+    """
+    if formato is not None and formato not in FORMATOS_IMPORTE:
+        raise ValueError(f"Formato de importe desconocido: {formato!r}. Opciones: {FORMATOS_IMPORTE}")
+    if pd.api.types.is_numeric_dtype(serie.dtype) and not pd.api.types.is_bool_dtype(serie.dtype):
+        valores = pd.to_numeric(serie, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        centavos = _centavos_de_float(valores)
+        formato = None
+    else:
+        codigos, unicos = _distintos(serie.to_numpy(dtype=object))
+        if pd.api.types.infer_dtype(unicos, skipna=False) == "string":
+            es_texto = np.ones(len(unicos), dtype=bool)
+        else:
+            es_texto = np.fromiter((isinstance(u, str) for u in unicos), dtype=bool, count=len(unicos))
+        if formato is None:
+            formato = detectar_formato_importe(pd.Series(unicos[es_texto], dtype=object))
+        # El último lugar queda NaN (y 0 centavos) para los códigos -1 (nulos)
+        valores_unicos = np.full(len(unicos) + 1, np.nan)
+        centavos_unicos = np.zeros(len(unicos) + 1, dtype=np.int64)
+        valores_unicos[:-1][es_texto], centavos_unicos[:-1][es_texto] = _textos_a_importes(
+            unicos[es_texto], formato
+        )
+        if not es_texto.all():
+            numeros = pd.to_numeric(
+                pd.Series(unicos[~es_texto], dtype=object), errors="coerce"
+            ).to_numpy(dtype=float, na_value=np.nan)
+            valores_unicos[:-1][~es_texto] = numeros
+            centavos_unicos[:-1][~es_texto] = _centavos_de_float(numeros)
+        valores, centavos = valores_unicos[codigos], centavos_unicos[codigos]
+    validos = ~np.isnan(valores)
+    return ImportesParseados(valores, centavos, validos, formato)
 
 
 def _validar_headers(df: pd.DataFrame, esperadas: list[str], nombre: str):
@@ -46,42 +455,1069 @@ def _validar_headers(df: pd.DataFrame, esperadas: list[str], nombre: str):
         raise ValueError(f"{nombre}: faltan columnas {faltantes}. Presentes: {list(df.columns)}")
 
 
-def _normalizar_mayor(df_mayor: pd.DataFrame) -> pd.DataFrame:
-    """Normaliza el DataFrame del Mayor."""
-    _validar_headers(df_mayor, MAYOR_COLS, "Mayor")
-    df = df_mayor.copy()
-    df["Fecha_norm"] = _parse_fecha(df["Fecha"])
-    df["Importe_norm"] = _parse_importe(df["Importe"])
-    df = df[~df["Importe_norm"].isna() & ~df["Fecha_norm"].isna()].copy()
-    df["origen"] = "MAYOR"
-    df["row_id"] = np.arange(len(df))
-    return df
+# Columnas que agrega la normalización; un DataFrame que ya las tiene no se vuelve a parsear
+COLUMNAS_NORMALIZADAS = ["Importe_norm", "Fecha_dia", "Importe_cent"]
+
+# Columnas de fecha e importe de cada lado
+_COLUMNAS_LADO = {
+    "MAYOR": (MAYOR_COLS, "Fecha", "Importe"),
+    "BANCO": (BANCO_COLS, "FECHA", "IMPORTE"),
+}
+
 
+def normalizar_fragmento(
+    df: pd.DataFrame, lado: str, formato_importe: str | None = None, formato_fecha: str | None = None
+) -> pd.DataFrame:
+    """
+    Parsea fecha e importe de un lado ("MAYOR" o "BANCO") y descarta las filas inválidas.
+
+    Trabaja sobre cualquier fragmento del archivo, por lo que la ingesta puede aplicarla a
+    medida que lee. No agrega `origen` ni `row_id`: esos dependen del lado completo.
+    `formato_importe`/`formato_fecha` fijan el formato de los textos; sin ellos se detectan en el
+    fragmento. En `attrs` quedan los formatos usados y las filas rechazadas (`rechazos`).
+    """
+    if lado not in _COLUMNAS_LADO:
+        raise ValueError(f"Lado desconocido: {lado!r}. Opciones: {list(_COLUMNAS_LADO)}")
+    return _normalizar_validas(df, lado, formato_importe, formato_fecha)[0]
 
-def _normalizar_banco(df_banco: pd.DataFrame) -> pd.DataFrame:
-    """Normaliza el DataFrame del Banco."""
-    _validar_headers(df_banco, BANCO_COLS, "Banco")
-    df = df_banco.copy()
-    df["Fecha_norm"] = _parse_fecha(df["FECHA"])
-    df["Importe_norm"] = _parse_importe(df["IMPORTE"])
-    df = df[~df["Importe_norm"].isna() & ~df["Fecha_norm"].isna()].copy()
-    df["origen"] = "BANCO"
+
+def _normalizar_validas(
+    df: pd.DataFrame, lado: str, formato_importe: str | None = None, formato_fecha: str | None = None
+) -> tuple[pd.DataFrame, np.ndarray]:
+    """`normalizar_fragmento` que además devuelve la máscara de filas válidas de la entrada."""
+    esperadas, col_fecha, col_importe = _COLUMNAS_LADO[lado]
+    _validar_headers(df, esperadas, lado.capitalize())
+    fechas = parsear_fechas(df[col_fecha], formato_fecha)
+    importes = parsear_importes(df[col_importe], formato_importe)
+    validas = importes.validos & fechas.validos
+    df = df[validas].copy()
+    df["Importe_norm"] = importes.valores[validas]
+    df["Fecha_dia"] = fechas.dias[validas]
+    df["Importe_cent"] = importes.centavos[validas]
+    df.attrs["formato_importe"] = importes.formato
+    df.attrs["formato_fecha"] = fechas.formato
+    df.attrs["rechazos"] = {
+        "filas": int((~validas).sum()),
+        "importe": importes.rechazados,
+        "fecha": fechas.rechazados,
+    }
+    return df, validas
+
+
+def _normalizar_lado(df_in: pd.DataFrame, lado: str) -> pd.DataFrame:
+    """
+    Normaliza un lado completo, reutilizando el parseo si ya viene de la ingesta.
+
+    `fila_entrada` guarda la posición de cada fila en el DataFrame recibido.
+    """
+    if all(c in df_in.columns for c in COLUMNAS_NORMALIZADAS):
+        _validar_headers(df_in, _COLUMNAS_LADO[lado][0], lado.capitalize())
+        df = df_in.copy(deep=False)
+        df["fila_entrada"] = np.arange(len(df))
+    else:
+        df, validas = _normalizar_validas(df_in, lado)
+        df["fila_entrada"] = np.flatnonzero(validas)
+    df["origen"] = lado
     df["row_id"] = np.arange(len(df))
     return df
 
 
-def _diferencia_dias(d1, d2) -> int:
-    """Calcula diferencia absoluta en días entre dos fechas."""
-    return abs((d1 - d2).days)
+def _solo_lectura(a: np.ndarray) -> np.ndarray:
+    a = np.ascontiguousarray(a)
+    a.flags.writeable = False
+    return a
+
+
+class LibroNormalizado:
+    """
+    Un lado ("MAYOR" o "BANCO") normalizado una sola vez, listo para conciliar muchas veces.
+
+    Guarda solo las columnas del esquema y las normalizadas de las filas válidas, indexadas por
+    row_id, junto con los arrays de signo, centavos y día y los órdenes que usan las búsquedas
+    binarias del motor, más las filas descartadas al parsear (`rechazos`) y los formatos de
+    importe y fecha usados. `conciliacion_mvp` lo acepta en lugar del DataFrame y no vuelve a
+    parsear ni a ordenar. El motor no lo modifica, así que se puede compartir entre corridas y
+    sesiones (por ejemplo con `st.cache_resource`).
+    """
+
+    def __init__(self, df: pd.DataFrame, lado: str):
+        if lado not in _COLUMNAS_LADO:
+            raise ValueError(f"Lado desconocido: {lado!r}. Opciones: {list(_COLUMNAS_LADO)}")
+        df = _normalizar_lado(df, lado)
+        self.rechazos = dict(df.attrs.get("rechazos", {"filas": 0, "importe": 0, "fecha": 0}))
+        self.formato_importe = df.attrs.get("formato_importe")
+        self.formato_fecha = df.attrs.get("formato_fecha")
+        esquema = _COLUMNAS_LADO[lado][0]
+        df = df[esquema + COLUMNAS_NORMALIZADAS + ["fila_entrada", "row_id"]]
+        df = df.assign(signo=np.sign(df["Importe_cent"]).astype(int), **{c: _valores_texto(df[c]) for c in esquema})
+        self.lado = lado
+        self.datos = df.set_index("row_id")
+        self.rid = _solo_lectura(self.datos.index.to_numpy())
+        self.sig = _solo_lectura(self.datos["signo"].to_numpy())
+        self.imp = _solo_lectura(self.datos["Importe_cent"].to_numpy())
+        self.dia = _solo_lectura(self.datos["Fecha_dia"].to_numpy(dtype=np.int64))
+        # Órdenes por (signo, importe, fecha, row_id) y por (signo, fecha, row_id)
+        self.orden_importe = _solo_lectura(np.lexsort((self.rid, self.dia, self.imp, self.sig)))
+        self.orden_fecha = _solo_lectura(np.lexsort((self.rid, self.dia, self.sig)))
+
+    def __len__(self) -> int:
+        return len(self.rid)
+
+    def __repr__(self) -> str:
+        return f"LibroNormalizado({self.lado}, {len(self)} filas)"
+
+
+def _libro(df, lado: str) -> LibroNormalizado:
+    """El libro recibido tal cual, o uno nuevo a partir de un DataFrame."""
+    if isinstance(df, LibroNormalizado):
+        if df.lado != lado:
+            raise ValueError(f"Se esperaba un libro del {lado.capitalize()} y se recibió uno del {df.lado.capitalize()}")
+        return df
+    return LibroNormalizado(df, lado)
+
+
+# --- Lado candidato ordenado ---
+
+class _Pool(NamedTuple):
+    """Lado candidato ordenado para búsquedas binarias, con la máscara de filas libres."""
+    rid: np.ndarray
+    sig: np.ndarray
+    imp: np.ndarray
+    dia: np.ndarray
+    libre: np.ndarray
+    bloques: dict
+
+
+def _pool_desde_ordenado(rid, sig, imp, dia, libre) -> _Pool:
+    """Arma el pool a partir de arrays ya ordenados, ubicando el bloque de cada signo."""
+    bloques = {
+        s: (int(np.searchsorted(sig, s, "left")), int(np.searchsorted(sig, s, "right")))
+        for s in (-1, 0, 1)
+    }
+    return _Pool(rid, sig, imp, dia, libre, bloques)
+
+
+def _armar_pool(libro: LibroNormalizado, usados: set, por_importe: bool) -> _Pool:
+    """
+    Pool de un lado con el orden ya calculado en el libro: por (signo, importe, fecha, row_id)
+    o, sin `por_importe`, por (signo, fecha, row_id).
+
+    El row_id al final replica el desempate estable de la implementación original.
+    """
+    orden = libro.orden_importe if por_importe else libro.orden_fecha
+    rid, sig, imp, dia, libre = _arrays_lado(libro, usados)
+    return _pool_desde_ordenado(rid[orden], sig[orden], imp[orden], dia[orden], libre[orden])
+
+
+def _arrays_lado(libro: LibroNormalizado, usados: set) -> tuple:
+    """(row_id, signo, centavos, día, libre) de un lado normalizado, como arrays."""
+    return libro.rid, libro.sig, libro.imp, libro.dia, ~np.isin(libro.rid, list(usados))
+
+
+def _objetivos_pendientes(libro: LibroNormalizado, usados: set, rango: tuple | None = None) -> tuple:
+    """
+    (row_id, signo, centavos, día) de las filas no usadas, en orden de row_id; con `rango`
+    (desde, hasta), solo las de row_id en [desde, hasta).
+    """
+    rid, sig, imp, dia, libre = _arrays_lado(libro, usados)
+    if rango is not None:
+        libre &= (rid >= rango[0]) & (rid < rango[1])
+    return rid[libre], sig[libre], imp[libre], dia[libre]
+
+
+# --- Matching one-to-one indexado ---
+
+# Reglas de los matches; las de agrupación se completan con "<=max_items_grupo" en la salida
+_REGLAS = ["", "one_to_one", "many_to_one", "one_to_many"]
+_REGLA_ONE_TO_ONE, _REGLA_MANY_TO_ONE, _REGLA_ONE_TO_MANY = 1, 2, 3
+
+
+class _Matches(NamedTuple):
+    """Matches como arrays paralelos: row_ids, códigos de estado y regla, días y grupo (0 = sin grupo)."""
+    mayor: np.ndarray
+    banco: np.ndarray
+    estado: np.ndarray
+    regla: np.ndarray
+    dias: np.ndarray
+    grupo: np.ndarray
+
+
+def _armar_matches(mayor, banco, estado, regla, dias, grupo=0) -> _Matches:
+    """Arma `_Matches` con dtypes compactos; `estado`, `regla` y `grupo` aceptan escalares."""
+    mayor = np.asarray(mayor, dtype=np.int64)
+    n = len(mayor)
+    return _Matches(
+        mayor,
+        np.asarray(banco, dtype=np.int64),
+        np.broadcast_to(np.asarray(estado, dtype=np.int8), (n,)).copy(),
+        np.broadcast_to(np.asarray(regla, dtype=np.int8), (n,)).copy(),
+        np.asarray(dias, dtype=np.int32),
+        np.broadcast_to(np.asarray(grupo, dtype=np.int32), (n,)).copy(),
+    )
+
+
+def _unir_matches(partes: list) -> _Matches:
+    """Concatena varios `_Matches` en orden."""
+    if not partes:
+        return _armar_matches([], [], [], [], [], [])
+    return _Matches(*(np.concatenate(cols) for cols in zip(*partes)))
+
+
+def _estados_one_to_one(diff_days: np.ndarray, diff_cent: np.ndarray, tolerancia_cent: int) -> np.ndarray:
+    """Código de estado de cada match one-to-one según las diferencias (importes en centavos)."""
+    diff_days, diff_cent = np.asarray(diff_days), np.asarray(diff_cent)
+    return np.select(
+        [
+            (diff_days == 0) & (diff_cent == 0),
+            (diff_cent == 0) & (diff_days > 0),
+            (diff_cent > 0) & (diff_cent <= tolerancia_cent),
+        ],
+        [0, 1, 2],
+        # Este caso no debería ocurrir por el filtro previo
+        default=3,
+    ).astype(np.int8)
+
+
+def _pasada_exacta(mayor: LibroNormalizado, banco: LibroNormalizado) -> _Matches:
+    """
+    Empareja en bloque los pares con (signo, centavos, fecha) idénticos mediante un hash join.
+
+    Dentro de cada clave, el k-ésimo Mayor se empareja con el k-ésimo Banco en orden de row_id,
+    que es la misma elección que haría el one-to-one fila por fila.
+    """
+    claves = ["signo", "Importe_cent", "Fecha_dia"]
+    m = pd.DataFrame({"signo": mayor.sig, "Importe_cent": mayor.imp, "Fecha_dia": mayor.dia, "row_id_mayor": mayor.rid})
+    b = pd.DataFrame({"signo": banco.sig, "Importe_cent": banco.imp, "Fecha_dia": banco.dia, "row_id_banco": banco.rid})
+    m["orden"] = m.groupby(claves, sort=False).cumcount()
+    b["orden"] = b.groupby(claves, sort=False).cumcount()
+    pares = b.merge(m, on=claves + ["orden"], how="inner")
+
+    return _armar_matches(
+        pares["row_id_mayor"].to_numpy(), pares["row_id_banco"].to_numpy(),
+        ESTADOS.index("Conciliado exacto"), _REGLA_ONE_TO_ONE, np.zeros(len(pares)),
+    )
+
+
+def _elegir_one_to_one(pool: "_Pool", sig: int, v: int, d: int, tolerancia_dias: int, tolerancia_cent: int):
+    """
+    Mejor fila libre del pool para un objetivo: menor diferencia de días, luego de importe y
+    luego la fecha más antigua. Devuelve (posición en el pool, diff_days, diff_cent) o None,
+    y la cantidad de candidatos.
+    """
+    ini, fin = pool.bloques[sig]
+    s_imp, s_dia = pool.imp, pool.dia
+    lo = max(ini, int(np.searchsorted(s_imp, v - tolerancia_cent, "left")))
+    hi = min(fin, int(np.searchsorted(s_imp, v + tolerancia_cent, "right")))
+    if lo >= hi:
+        return None, 0
+
+    # Con un único importe en la ventana, las fechas están ordenadas: acotar también por días
+    if s_imp[lo] == s_imp[hi - 1]:
+        lo, hi = (
+            lo + int(np.searchsorted(s_dia[lo:hi], d - tolerancia_dias, "left")),
+            lo + int(np.searchsorted(s_dia[lo:hi], d + tolerancia_dias, "right")),
+        )
+        if lo >= hi:
+            return None, 0
+
+    dias = s_dia[lo:hi]
+    diff_days = np.abs(dias - d)
+    diff_importe = np.abs(s_imp[lo:hi] - v)
+    validos = np.flatnonzero(pool.libre[lo:hi] & (diff_days <= tolerancia_dias))
+    if validos.size == 0:
+        return None, 0
+
+    # Ordenar por: diferencia de días, diferencia de importe, fecha más antigua
+    sel = validos[np.lexsort((
+        pool.rid[lo:hi][validos], dias[validos], diff_importe[validos], diff_days[validos]
+    ))[0]]
+    return (lo + sel, int(diff_days[sel]), int(diff_importe[sel])), validos.size
+
+
+def _one_to_one_indexado(
+    mayor: LibroNormalizado,
+    banco: LibroNormalizado,
+    tolerancia_dias: int,
+    tolerancia_cent: int,
+    usados_mayor: set,
+    usados_banco: set,
+    procesos: int = 1,
+    estadisticas: dict | None = None,
+    avance=None,
+    rango: tuple | None = None,
+) -> _Matches:
+    """
+    One-to-one con el Mayor ordenado por (signo, importe, fecha).
+
+    Recorre el Banco en orden (con `rango`, solo ese tramo de row_ids) y, para cada fila, ubica
+    por búsqueda binaria la ventana de importes dentro de `tolerancia_cent` y elige con
+    `_elegir_one_to_one`. Actualiza `usados_mayor`/`usados_banco` (y `estadisticas`, si se pasa)
+    y devuelve los matches.
+    """
+    pool = _armar_pool(mayor, usados_mayor, por_importe=True)
+    objetivos = _objetivos_pendientes(banco, usados_banco, rango)
+    decisiones = _ejecutar_fase("one_to_one", pool, objetivos, (tolerancia_dias, tolerancia_cent, 1, None), procesos, avance)
+    if estadisticas is not None:
+        estadisticas.update(_estadisticas_decisiones(decisiones))
+
+    elegidas = [dec for dec in decisiones if dec[1] is not None]
+    rid_m = np.array([dec[1][0] for dec in elegidas], dtype=np.int64)
+    rid_b = np.array([dec[0] for dec in elegidas], dtype=np.int64)
+    diff_days = np.array([dec[2][0] for dec in elegidas], dtype=np.int64)
+    diff_cent = np.array([dec[3][0] for dec in elegidas], dtype=np.int64)
+    usados_mayor.update(rid_m.tolist())
+    usados_banco.update(rid_b.tolist())
+    return _armar_matches(
+        rid_m, rid_b, _estados_one_to_one(diff_days, diff_cent, tolerancia_cent), _REGLA_ONE_TO_ONE, diff_days
+    )
+
+
+# Pares por importe expandidos a la vez en `_aristas_candidatas`, antes de filtrar por días
+_PARES_POR_BLOQUE = 1_000_000
+
+
+def _aristas_candidatas(
+    mayor: LibroNormalizado,
+    banco: LibroNormalizado,
+    tolerancia_dias: int,
+    tolerancia_cent: int,
+    usados_mayor: set,
+    usados_banco: set,
+):
+    """
+    Enumera todos los pares (Mayor, Banco) libres dentro de las tolerancias de días y valor.
+
+    Las ventanas de importe de todo el Banco se ubican de una sola vez con búsqueda binaria
+    sobre el Mayor ordenado por (signo, importe) y se expanden por bloques de a lo sumo
+    `_PARES_POR_BLOQUE` pares, filtrando cada bloque por días antes de seguir.
+    Devuelve (row_id_mayor, row_id_banco, diff_days, diff_cent) como arrays paralelos.
+    """
+    # El orden del libro restringido a las filas libres sigue ordenado
+    libre_m = ~np.isin(mayor.rid, list(usados_mayor))
+    orden = mayor.orden_importe[libre_m[mayor.orden_importe]]
+    s_rid, s_sig, s_imp, s_dia = mayor.rid[orden], mayor.sig[orden], mayor.imp[orden], mayor.dia[orden]
+    b_rid, b_sig, b_imp, b_dia, libre_b = _arrays_lado(banco, usados_banco)
+    b_rid, b_sig, b_imp, b_dia = b_rid[libre_b], b_sig[libre_b], b_imp[libre_b], b_dia[libre_b]
+
+    lo = np.maximum(np.searchsorted(s_sig, b_sig, "left"), np.searchsorted(s_imp, b_imp - tolerancia_cent, "left"))
+    hi = np.minimum(np.searchsorted(s_sig, b_sig, "right"), np.searchsorted(s_imp, b_imp + tolerancia_cent, "right"))
+    cuenta = np.maximum(hi - lo, 0)
+    total = int(cuenta.sum())
+    partes = []
+    for filas in np.array_split(np.arange(len(b_rid)), max(1, -(-total // _PARES_POR_BLOQUE))):
+        c_blq = cuenta[filas]
+        t_blq = int(c_blq.sum())
+        bi = np.repeat(filas, c_blq)
+        mi = np.repeat(lo[filas], c_blq) + np.arange(t_blq) - np.repeat(np.cumsum(c_blq) - c_blq, c_blq)
+        ok = np.abs(s_dia[mi] - b_dia[bi]) <= tolerancia_dias
+        partes.append((bi[ok], mi[ok]))
+    bi = np.concatenate([p[0] for p in partes])
+    mi = np.concatenate([p[1] for p in partes])
+    diff_days = np.abs(s_dia[mi] - b_dia[bi])
+    diff_cent = np.abs(s_imp[mi] - b_imp[bi])
+    return s_rid[mi], b_rid[bi], diff_days, diff_cent
+
+
+def _asignacion_optima(mi: np.ndarray, bi: np.ndarray, costo: np.ndarray) -> np.ndarray:
+    """
+    Aristas elegidas de una componente: máxima cantidad de pares y, entre ellas, menor costo.
+
+    Resuelve un matching bipartito completo de peso mínimo sobre la matriz dispersa de aristas
+    (scipy), con memoria proporcional a la cantidad de aristas. Cada nodo del lado menor tiene
+    además una arista ficticia con un costo mayor que cualquier suma de costos reales: así el
+    matching completo siempre existe, las ficticias solo se usan donde no queda par posible
+    y, con la cantidad de pares ya máxima, se minimiza el costo.
+    Devuelve las posiciones (en `mi`/`bi`) de las aristas elegidas.
+    """
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+    _, fi = np.unique(mi, return_inverse=True)
+    _, ci = np.unique(bi, return_inverse=True)
+    if fi.max() > ci.max():
+        fi, ci = ci, fi
+    n_f, n_c = int(fi.max()) + 1, int(ci.max()) + 1
+    premio = float((int(costo.max()) + 1) * (n_f + 1))
+    # Se suma 1 a los costos reales: scipy no admite aristas de peso cero
+    grafo = csr_matrix(
+        (np.concatenate([costo + 1.0, np.full(n_f, premio)]),
+         (np.concatenate([fi, np.arange(n_f)]), np.concatenate([ci, n_c + np.arange(n_f)]))),
+        shape=(n_f, n_c + n_f),
+    )
+    filas, cols = min_weight_full_bipartite_matching(grafo)
+    reales = cols < n_c
+    filas, cols = filas[reales], cols[reales]
+
+    clave = fi.astype(np.int64) * n_c + ci
+    orden = np.argsort(clave)
+    return orden[np.searchsorted(clave[orden], filas.astype(np.int64) * n_c + cols)]
+
+
+def _one_to_one_optimo(
+    mayor: LibroNormalizado,
+    banco: LibroNormalizado,
+    tolerancia_dias: int,
+    tolerancia_cent: int,
+    usados_mayor: set,
+    usados_banco: set,
+    estadisticas: dict | None = None,
+    avance=None,
+) -> _Matches:
+    """
+    One-to-one óptimo: máxima cantidad de pares y, entre ellas, menor costo total.
+
+    El grafo de pares candidatos se parte en componentes conexas independientes. Las de un
+    solo par se resuelven directamente; el resto con `_asignacion_optima`, donde el costo es
+    la diferencia de días y luego la de importe.
+    Actualiza `usados_mayor`/`usados_banco` (y `estadisticas`, si se pasa) y devuelve los matches.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    rid_m, rid_b, diff_days, diff_cent = _aristas_candidatas(
+        mayor, banco, tolerancia_dias, tolerancia_cent, usados_mayor, usados_banco
+    )
+    if estadisticas is not None:
+        pendientes = len(banco) - len(usados_banco)
+        por_objetivo = np.bincount(np.unique(rid_b, return_inverse=True)[1]) if len(rid_b) else np.empty(0, np.int64)
+        candidatos = np.concatenate([por_objetivo, np.zeros(pendientes - len(por_objetivo), dtype=np.int64)])
+        estadisticas.update(filas_entrada=pendientes, nodos=len(rid_m), truncados=0, **_distribucion(candidatos))
+    if len(rid_m) == 0:
+        return _unir_matches([])
+
+    # Nodos del grafo: primero los Mayor involucrados, después los Banco
+    nodos_m, mi = np.unique(rid_m, return_inverse=True)
+    nodos_b, bi = np.unique(rid_b, return_inverse=True)
+    n_m = len(nodos_m)
+    grafo = coo_matrix((np.ones(len(mi)), (mi, n_m + bi)), shape=(n_m + len(nodos_b),) * 2)
+    _, etiquetas = connected_components(grafo, directed=False)
+    comp = etiquetas[mi]
+
+    # Costo lexicográfico: días primero, importe después (diff_cent <= tolerancia_cent)
+    costo = diff_days * (tolerancia_cent + 1) + diff_cent
+    aristas_por_comp = np.bincount(comp)
+
+    elegidas = [np.flatnonzero(aristas_por_comp[comp] == 1)]
+    orden = np.argsort(comp, kind="stable")
+    grandes = np.flatnonzero(aristas_por_comp > 1)
+    limites = np.concatenate([[0], np.cumsum(aristas_por_comp)])
+    for i, c in enumerate(grandes):
+        if avance is not None and not i % _OBJETIVOS_POR_AVISO:
+            avance(i, len(grandes))
+        e = orden[limites[c]:limites[c + 1]]
+        elegidas.append(e[_asignacion_optima(mi[e], bi[e], costo[e])])
+    if avance is not None:
+        avance(len(grandes), len(grandes))
+    elegidas = np.sort(np.concatenate(elegidas))
+
+    usados_mayor.update(rid_m[elegidas].tolist())
+    usados_banco.update(rid_b[elegidas].tolist())
+    return _armar_matches(
+        rid_m[elegidas], rid_b[elegidas],
+        _estados_one_to_one(diff_days[elegidas], diff_cent[elegidas], tolerancia_cent),
+        _REGLA_ONE_TO_ONE, diff_days[elegidas],
+    )
+
+
+# --- Búsqueda de grupos (agrupación) ---
+
+# Tope de combinaciones por mitad en el meet-in-the-middle: fija el prefijo de candidatos
+_PRESUPUESTO_COMBINACIONES = 20_000
+# Tope de pares (mitad baja, mitad alta) cruzados por objetivo, sumando todos los tamaños
+_PRESUPUESTO_PARES = 1_000_000
+
+
+@lru_cache(maxsize=None)
+def _max_candidatos_grupo(tamano: int, candidatos: int | None = None) -> int:
+    """
+    Cantidad de candidatos (prefijo) entre los que se buscan grupos de `tamano` ítems.
+
+    Sin `candidatos`, es la mayor cantidad cuyas mitades entran en el presupuesto de
+    combinaciones: 20.000 candidatos para grupos de 1 y 2 ítems (mitades de un ítem), 199 para
+    3-4, 50 para 5-6, 27 para 7-8 y 20 para 9-10. Con `candidatos` se usa ese prefijo para todos
+    los tamaños. En ambos casos el cruce de mitades además se corta en `_PRESUPUESTO_PARES`
+    pares por objetivo (ver `_mejor_grupo`).
+    """
+    if candidatos is not None:
+        return candidatos
+    mitad = (tamano + 1) // 2
+    n = mitad
+    while math.comb(n + 1, mitad) <= _PRESUPUESTO_COMBINACIONES:
+        n += 1
+    return n
+
+
+def _validar_candidatos_grupo(candidatos_grupo: int | None) -> None:
+    """Rechaza un prefijo de candidatos de agrupación que no sea un entero positivo."""
+    if candidatos_grupo is not None and candidatos_grupo < 1:
+        raise ValueError(f"candidatos_grupo debe ser un entero positivo o None, no {candidatos_grupo!r}.")
+
+
+def _combinaciones(n: int, c: int) -> np.ndarray:
+    """Todas las combinaciones de `c` índices de range(n), una por fila y en orden lexicográfico."""
+    comb = np.arange(n, dtype=np.int32)[:, None]
+    for _ in range(c - 1):
+        ultimo = comb[:, -1].astype(np.int64)
+        cuenta = n - 1 - ultimo
+        total = int(cuenta.sum())
+        inicio = np.repeat(np.cumsum(cuenta) - cuenta, cuenta)
+        siguiente = np.arange(total) - inicio + np.repeat(ultimo + 1, cuenta)
+        comb = np.hstack([np.repeat(comb, cuenta, axis=0), siguiente.astype(np.int32)[:, None]])
+    return comb
+
+
+def _mejor_grupo(
+    importes: np.ndarray,
+    diffs: np.ndarray,
+    fechas: np.ndarray,
+    objetivo: int,
+    tolerancia_cent: int,
+    max_items: int,
+    candidatos: int | None = None,
+):
+    """
+    Busca por meet-in-the-middle el mejor grupo de hasta `max_items` candidatos cuya suma
+    quede a `tolerancia_cent` del objetivo.
+
+    Todo grupo de tamaño r se parte de forma única en sus ceil(r/2) índices menores y el resto;
+    las mitades se enumeran una sola vez y se cruzan por búsqueda binaria sobre las sumas.
+    Los grupos de tamaño r se buscan entre los primeros `_max_candidatos_grupo(r, candidatos)`
+    candidatos, y entre todos los tamaños se cruzan a lo sumo `_PRESUPUESTO_PARES` pares de
+    mitades con suma compatible, en orden de la mitad baja. Así el costo por objetivo queda
+    acotado aun con muchos importes iguales. Si el prefijo deja candidatos afuera o se agota el
+    presupuesto de pares, la búsqueda está truncada: un grupo fuera de lo recorrido no se encuentra.
+    Preferencia: menor diferencia máxima de días, menos ítems, fecha más antigua y, a igualdad,
+    el orden de los candidatos. Devuelve la tupla de índices elegidos o None, la cantidad de
+    nodos visitados (combinaciones enumeradas más pares cruzados) y si la búsqueda quedó truncada.
+    """
+    mitades = {}
+
+    def mitad(c: int, n: int):
+        if (c, n) not in mitades:
+            comb = _combinaciones(n, c)
+            mitades[c, n] = (comb, importes[comb].sum(axis=1), diffs[comb].max(axis=1), fechas[comb].min(axis=1))
+        return mitades[c, n]
+
+    mejor = None
+    nodos = 0
+    cruzados = 0
+    truncado = False
+    for r in range(1, max_items + 1):
+        a, b = (r + 1) // 2, r // 2
+        n = min(len(importes), _max_candidatos_grupo(r, candidatos))
+        if n < r:
+            break
+        truncado |= n < len(importes)
+        cl, sl, dl, fl = mitad(a, n)
+        nodos += len(cl)
+        if b == 0:
+            ok = np.flatnonzero(np.abs(sl - objetivo) <= tolerancia_cent)
+            grupos, max_diff, antigua = cl[ok], dl[ok], fl[ok]
+        else:
+            cr, sr, dr, fr = mitad(b, n)
+            orden = np.argsort(sr, kind="stable")
+            sr_ord = sr[orden]
+            lo = np.searchsorted(sr_ord, objetivo - tolerancia_cent - sl, "left")
+            hi = np.searchsorted(sr_ord, objetivo + tolerancia_cent - sl, "right")
+            cuenta = hi - lo
+            acumulado = np.cumsum(cuenta)
+            # Las mitades bajas se cruzan en orden hasta agotar el presupuesto de pares del objetivo
+            filas = int(np.searchsorted(acumulado, _PRESUPUESTO_PARES - cruzados, "right"))
+            truncado |= filas < len(cl)
+            total = int(acumulado[filas - 1]) if filas else 0
+            cruzados += total
+            nodos += len(cr) + total
+            if total == 0:
+                continue
+            cuenta = cuenta[:filas]
+            li = np.repeat(np.arange(filas), cuenta)
+            rj = orden[np.repeat(lo[:filas], cuenta) + np.arange(total) - np.repeat(acumulado[:filas] - cuenta, cuenta)]
+            # La mitad alta debe empezar después de la baja para que cada grupo aparezca una sola vez
+            ok = cl[li, -1] < cr[rj, 0]
+            li, rj = li[ok], rj[ok]
+            grupos = np.hstack([cl[li], cr[rj]])
+            max_diff, antigua = np.maximum(dl[li], dr[rj]), np.minimum(fl[li], fr[rj])
+
+        if len(grupos) == 0:
+            continue
+        claves = [grupos[:, j] for j in range(r - 1, -1, -1)] + [antigua, max_diff]
+        i = np.lexsort(claves)[0]
+        clave = (int(max_diff[i]), r, int(antigua[i]), tuple(int(x) for x in grupos[i]))
+        if mejor is None or clave < mejor:
+            mejor = clave
+    return (mejor[3] if mejor else None), nodos, truncado
+
+
+def _sentidos_agrupacion(direccion: str) -> list[str]:
+    """Traduce la dirección elegida en la secuencia de sentidos de agrupación a ejecutar."""
+    if direccion not in DIRECCIONES:
+        raise ValueError(f"Dirección de agrupación desconocida: {direccion!r}. Opciones: {DIRECCIONES}")
+    if direccion == "AMBAS":
+        return ["MAYOR→BANCO", "BANCO→MAYOR"]
+    return [direccion]
+
+
+def _elegir_grupo(
+    pool: _Pool,
+    sig: int,
+    objetivo: int,
+    d: int,
+    tolerancia_dias: int,
+    tolerancia_cent: int,
+    max_items: int,
+    candidatos: int | None = None,
+):
+    """
+    Mejor grupo de filas libres del pool para un objetivo.
+
+    Los candidatos son las filas libres del mismo signo dentro de la ventana de días
+    (búsqueda binaria sobre el pool ordenado por signo y fecha) que no superan el importe
+    objetivo, ordenadas por diferencia de días e importe descendente.
+    Devuelve (posiciones en el pool, diff_days, cantidad de candidatos, nodos visitados,
+    truncado); sin grupo, las posiciones son None.
+    """
+    ini, fin = pool.bloques[sig]
+    s_imp, s_dia = pool.imp, pool.dia
+    lo = ini + int(np.searchsorted(s_dia[ini:fin], d - tolerancia_dias, "left"))
+    hi = ini + int(np.searchsorted(s_dia[ini:fin], d + tolerancia_dias, "right"))
+
+    # Con importes del mismo signo la suma es monótona: un ítem que ya excede no puede participar
+    imp = s_imp[lo:hi]
+    if sig >= 0:
+        alcanzable = imp <= objetivo + tolerancia_cent
+    else:
+        alcanzable = imp >= objetivo - tolerancia_cent
+    pos = lo + np.flatnonzero(pool.libre[lo:hi] & alcanzable)
+    if pos.size == 0:
+        return None, None, 0, 0, False
+
+    diffs = np.abs(s_dia[pos] - d)
+    pos = pos[np.lexsort((pool.rid[pos], -s_imp[pos], diffs))]
+    diffs = np.abs(s_dia[pos] - d)
+
+    sel, nodos, truncado = _mejor_grupo(
+        s_imp[pos], diffs, s_dia[pos], objetivo, tolerancia_cent, max_items, candidatos
+    )
+    if sel is None:
+        return None, None, pos.size, nodos, truncado
+    sel = list(sel)
+    return pos[sel], diffs[sel], pos.size, nodos, truncado
+
+
+def _agrupar(
+    grupo: LibroNormalizado,
+    objetivo: LibroNormalizado,
+    tolerancia_dias: int,
+    tolerancia_cent: int,
+    max_items_grupo: int,
+    usados_grupo: set,
+    usados_objetivo: set,
+    sentido: str,
+    secuencia_grupos,
+    procesos: int = 1,
+    estadisticas: dict | None = None,
+    avance=None,
+    rango: tuple | None = None,
+    candidatos_grupo: int | None = None,
+) -> _Matches:
+    """
+    Agrupa varias filas libres de un lado contra cada fila pendiente del otro.
+
+    `sentido` indica qué lado se agrupa: "MAYOR→BANCO" (varios Mayor contra un Banco) o
+    "BANCO→MAYOR" (varios Banco contra un Mayor). Cada objetivo, en orden de row_id (con
+    `rango`, solo ese tramo), se resuelve con `_elegir_grupo`. `secuencia_grupos` numera los grupos.
+    `candidatos_grupo` fija el prefijo de candidatos de la búsqueda (ver `_max_candidatos_grupo`).
+    """
+    pool = _armar_pool(grupo, usados_grupo, por_importe=False)
+    objetivos = _objetivos_pendientes(objetivo, usados_objetivo, rango)
+    params = (tolerancia_dias, tolerancia_cent, max_items_grupo, candidatos_grupo)
+    decisiones = _ejecutar_fase("grupo", pool, objetivos, params, procesos, avance)
+    if estadisticas is not None:
+        estadisticas.update(_estadisticas_decisiones(decisiones))
+
+    elegidas = [dec for dec in decisiones if dec[1] is not None]
+    tamanos = np.array([len(dec[1]) for dec in elegidas], dtype=np.int64)
+    miembros = np.concatenate([dec[1] for dec in elegidas]).astype(np.int64) if elegidas else np.empty(0, np.int64)
+    diffs = np.concatenate([dec[2] for dec in elegidas]) if elegidas else np.empty(0, np.int64)
+    objetivos_ok = np.repeat(np.array([dec[0] for dec in elegidas], dtype=np.int64), tamanos)
+    grupos = np.repeat(np.array([next(secuencia_grupos) for _ in elegidas], dtype=np.int64), tamanos)
+    usados_grupo.update(miembros.tolist())
+    usados_objetivo.update(dec[0] for dec in elegidas)
+
+    estado = ESTADOS.index("Conciliado por agrupación")
+    if sentido == "MAYOR→BANCO":
+        return _armar_matches(miembros, objetivos_ok, estado, _REGLA_MANY_TO_ONE, diffs, grupos)
+    return _armar_matches(objetivos_ok, miembros, estado, _REGLA_ONE_TO_MANY, diffs, grupos)
+
 
+# --- Ejecución de fases (secuencial y multiproceso) ---
 
-def _diferencia_dias_series(fecha_series: pd.Series, pivot_date) -> pd.Series:
-    """Calcula diferencia en días para una serie completa."""
-    return fecha_series.apply(lambda d: abs((d - pivot_date).days))
+# Bloques de fechas por proceso y signo: más bloques reparten mejor la carga, más bordes validar
+_BLOQUES_POR_PROCESO = 4
+# Por debajo de esta cantidad de objetivos no compensa levantar procesos
+_MIN_OBJETIVOS_PARALELO = 2_000
+
+
+def _decidir(fase: str, pool: _Pool, sig: int, imp: int, dia: int, params: tuple):
+    """
+    Decide un objetivo según la fase.
+
+    Devuelve (posiciones, diffs días, diffs centavos, truncado, candidatos, nodos); sin match
+    las posiciones son None. `truncado` indica que la búsqueda de grupos no recorrió todos
+    los candidatos o combinaciones; `candidatos` y `nodos` alimentan las métricas.
+    """
+    tolerancia_dias, tolerancia_cent, max_items, candidatos = params
+    if fase == "one_to_one":
+        r, n_cand = _elegir_one_to_one(pool, sig, imp, dia, tolerancia_dias, tolerancia_cent)
+        if r is None:
+            return None, None, None, False, n_cand, n_cand
+        return np.array([r[0]]), np.array([r[1]]), np.array([r[2]]), False, n_cand, n_cand
+    pos, diffs, n_cand, nodos, truncado = _elegir_grupo(
+        pool, sig, imp, dia, tolerancia_dias, tolerancia_cent, max_items, candidatos
+    )
+    if pos is None:
+        return None, None, None, truncado, n_cand, nodos
+    return pos, diffs, np.zeros(len(pos), dtype=np.int64), truncado, n_cand, nodos
+
+
+def _correr_fase(fase: str, pool: _Pool, objetivos: tuple, params: tuple, avance=None) -> list[tuple]:
+    """
+    Recorre los objetivos en orden, decide cada uno contra el pool y marca lo que usa.
+
+    `objetivos` es (row_id, signo, centavos, día). Devuelve una decisión por objetivo:
+    (row_id objetivo, row_ids elegidos o None, diffs días, diffs centavos, truncado,
+    candidatos, nodos). `avance(hechos, total)` se llama cada `_OBJETIVOS_POR_AVISO` objetivos.
+    """
+    o_rid, o_sig, o_imp, o_dia = objetivos
+    decisiones = []
+    for i in range(len(o_rid)):
+        if avance is not None and not i % _OBJETIVOS_POR_AVISO:
+            avance(i, len(o_rid))
+        pos, dds, dis, truncado, n_cand, nodos = _decidir(
+            fase, pool, int(o_sig[i]), int(o_imp[i]), int(o_dia[i]), params
+        )
+        if pos is not None:
+            pool.libre[pos] = False
+        decisiones.append((o_rid[i], None if pos is None else pool.rid[pos], dds, dis, truncado, n_cand, nodos))
+    if avance is not None:
+        avance(len(o_rid), len(o_rid))
+    return decisiones
+
+
+def _trabajo_bloque(fase: str, pool_arrays: tuple, objetivos: tuple, params: tuple) -> list[tuple]:
+    """Resuelve un bloque en un proceso hijo a partir de arrays compactos."""
+    return _correr_fase(fase, _pool_desde_ordenado(*pool_arrays), objetivos, params)
+
+
+class _DiferenciasBloque:
+    """
+    Filas cuyo estado real difiere del que vio el proceso de un bloque, indexadas por (signo, día).
+
+    `quitadas`: usadas en la corrida real pero libres para el bloque. `agregadas`: libres en la
+    corrida real pero usadas por el bloque.
+    """
+
+    def __init__(self):
+        self.quitadas: set = set()
+        self.agregadas: set = set()
+        self.conteo_quitadas: Counter = Counter()
+        self.conteo_agregadas: Counter = Counter()
+
+    @staticmethod
+    def _mover(origen: set, conteo_origen: Counter, destino: set, conteo_destino: Counter, rid, clave):
+        # Una fila usada de un lado y luego del otro vuelve a coincidir
+        if rid in origen:
+            origen.remove(rid)
+            conteo_origen[clave] -= 1
+            if not conteo_origen[clave]:
+                del conteo_origen[clave]
+        else:
+            destino.add(rid)
+            conteo_destino[clave] += 1
+
+    def usada_real(self, rid, clave: tuple):
+        self._mover(self.agregadas, self.conteo_agregadas, self.quitadas, self.conteo_quitadas, rid, clave)
+
+    def usada_bloque(self, rid, clave: tuple):
+        self._mover(self.quitadas, self.conteo_quitadas, self.agregadas, self.conteo_agregadas, rid, clave)
+
+    @staticmethod
+    def _en_ventana(conteo: Counter, sig: int, d: int, tolerancia_dias: int) -> bool:
+        if len(conteo) <= 2 * tolerancia_dias + 1:
+            return any(sg == sig and abs(dia - d) <= tolerancia_dias for sg, dia in conteo)
+        return any((sig, x) in conteo for x in range(d - tolerancia_dias, d + tolerancia_dias + 1))
+
+    def vigente(self, decision: tuple, sig: int, d: int, tolerancia_dias: int) -> bool:
+        """
+        Indica si la decisión del bloque sigue valiendo frente al estado real.
+
+        Filas agregadas en la ventana pueden ofrecer algo mejor. Filas quitadas solo la invalidan
+        si eran parte de lo elegido o si la búsqueda estaba truncada: sin truncar, quitar
+        candidatos no elegidos no cambia el mejor.
+        """
+        if self._en_ventana(self.conteo_agregadas, sig, d, tolerancia_dias):
+            return False
+        if not self._en_ventana(self.conteo_quitadas, sig, d, tolerancia_dias):
+            return True
+        rids, truncado = decision[1], decision[4]
+        if truncado:
+            return False
+        return rids is None or not any(rid in self.quitadas for rid in rids)
+
+
+def _correr_fase_paralela(
+    fase: str, pool: _Pool, objetivos: tuple, params: tuple, procesos: int, avance=None
+) -> list[tuple]:
+    """
+    Versión multiproceso de `_correr_fase`, con el mismo resultado.
+
+    Los objetivos se parten por signo y en bloques de fechas. Cada bloque viaja a un proceso
+    con las filas del pool de su rango ampliado en `tolerancia_dias` (el halo) y se resuelve
+    como si fuera el único. Después se recorren las decisiones en el orden global: cada una se
+    acepta si sigue vigente frente a lo que cambiaron los bloques vecinos sobre el halo y las
+    correcciones previas (ver `_DiferenciasBloque`); si no, se recalcula contra el estado real.
+    `avance` cuenta los objetivos a medida que terminan los bloques y al validarlos.
+    """
+    tolerancia_dias = params[0]
+    o_rid, o_sig, o_imp, o_dia = objetivos
+
+    # Bloques por signo con cortes en los cuantiles de fecha de los objetivos
+    bloque_de = np.empty(len(o_rid), dtype=np.int64)
+    rangos: list[tuple[int, int, int]] = []  # (signo, primer día, día final exclusivo)
+    for sig in (-1, 0, 1):
+        sel = np.flatnonzero(o_sig == sig)
+        if sel.size == 0:
+            continue
+        dias = o_dia[sel]
+        cuantiles = np.linspace(0, 1, procesos * _BLOQUES_POR_PROCESO + 1)[1:-1]
+        cortes = np.unique(np.quantile(dias, cuantiles).astype(np.int64))
+        bordes = np.concatenate([[dias.min()], cortes, [dias.max() + 1]])
+        local = np.searchsorted(cortes, dias, "right")
+        for k in range(len(bordes) - 1):
+            bloque_de[sel[local == k]] = len(rangos)
+            rangos.append((sig, int(bordes[k]), int(bordes[k + 1])))
+
+    with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+        futuros = {}
+        for b, (sig, ini, fin) in enumerate(rangos):
+            sel = np.flatnonzero(bloque_de == b)
+            if sel.size == 0:
+                continue
+            halo = (pool.sig == sig) & (pool.dia >= ini - tolerancia_dias) & (pool.dia < fin + tolerancia_dias)
+            pool_arrays = (pool.rid[halo], pool.sig[halo], pool.imp[halo], pool.dia[halo], pool.libre[halo])
+            objetivos_b = (o_rid[sel], o_sig[sel], o_imp[sel], o_dia[sel])
+            futuros[b] = ejecutor.submit(_trabajo_bloque, fase, pool_arrays, objetivos_b, params)
+        # Los bloques cuentan como la primera mitad del avance y la validación como la segunda
+        resueltos = 0
+        try:
+            for futuro in as_completed(futuros.values()):
+                bloque = futuro.result()
+                resueltos += len(bloque)
+                if avance is not None:
+                    avance(resueltos, 2 * len(o_rid))
+        except BaseException:
+            for futuro in futuros.values():
+                futuro.cancel()
+            raise
+        especulado = {b: {dec[0]: dec for dec in f.result()} for b, f in futuros.items()}
+
+    pos_de_rid = np.empty(int(pool.rid.max()) + 1, dtype=np.int64)
+    pos_de_rid[pool.rid] = np.arange(len(pool.rid))
+    diferencias = [_DiferenciasBloque() for _ in rangos]
+    por_signo = {
+        sig: [(ini, fin, b) for b, (sg, ini, fin) in enumerate(rangos) if sg == sig]
+        for sig in (-1, 0, 1)
+    }
+    inicios = {sig: [r[0] for r in rs] for sig, rs in por_signo.items()}
+    finales = {sig: [r[1] for r in rs] for sig, rs in por_signo.items()}
+
+    def bloques_que_ven(sig: int, dia: int) -> list[int]:
+        desde = bisect.bisect_right(finales[sig], dia - tolerancia_dias)
+        hasta = bisect.bisect_right(inicios[sig], dia + tolerancia_dias)
+        return [por_signo[sig][k][2] for k in range(desde, hasta)]
+
+    decisiones = []
+    for i in range(len(o_rid)):
+        if avance is not None and not i % _OBJETIVOS_POR_AVISO:
+            avance(len(o_rid) + i, 2 * len(o_rid))
+        b, sig, d = int(bloque_de[i]), int(o_sig[i]), int(o_dia[i])
+        spec = especulado[b][o_rid[i]]
+
+        if diferencias[b].vigente(spec, sig, d, tolerancia_dias):
+            real = spec
+        else:
+            pos, dds, dis, truncado, n_cand, nodos = _decidir(fase, pool, sig, int(o_imp[i]), d, params)
+            real = (o_rid[i], None if pos is None else pool.rid[pos], dds, dis, truncado, n_cand, nodos)
+        decisiones.append(real)
+
+        if real[1] is not None:
+            for rid in real[1]:
+                pos = pos_de_rid[rid]
+                pool.libre[pos] = False
+                clave = (sig, int(pool.dia[pos]))
+                for k in bloques_que_ven(*clave):
+                    diferencias[k].usada_real(rid, clave)
+        if spec[1] is not None:
+            for rid in spec[1]:
+                diferencias[b].usada_bloque(rid, (sig, int(pool.dia[pos_de_rid[rid]])))
+    if avance is not None:
+        avance(2 * len(o_rid), 2 * len(o_rid))
+    return decisiones
+
+
+def _ejecutar_fase(fase: str, pool: _Pool, objetivos: tuple, params: tuple, procesos: int, avance=None) -> list[tuple]:
+    """Corre una fase en este proceso o, si hay trabajo suficiente, en `procesos` procesos."""
+    # Sin filas en el pool ningún objetivo tiene candidatos: no hay nada que repartir
+    if procesos > 1 and len(objetivos[0]) >= _MIN_OBJETIVOS_PARALELO and len(pool.rid):
+        return _correr_fase_paralela(fase, pool, objetivos, params, procesos, avance)
+    return _correr_fase(fase, pool, objetivos, params, avance)
+
+
+# --- Métricas por fase ---
+
+# Columnas de la tabla de métricas; cada fase completa las que le corresponden
+COLUMNAS_METRICAS = [
+    "fase", "segundos", "filas_entrada", "filas_salida",
+    "candidatos_media", "candidatos_p50", "candidatos_p90", "candidatos_max",
+    "nodos", "nodos_max", "truncados",
+]
+
+
+class MetricasConciliacion:
+    """
+    Colector para el parámetro `metricas` de `conciliacion_mvp`.
+
+    Recibe un dict por fase con las claves de `COLUMNAS_METRICAS` (las que apliquen) y los
+    devuelve como tabla. Cualquier función que reciba un dict sirve igual como `metricas`.
+    """
+
+    def __init__(self):
+        self.fases: list[dict] = []
+
+    def __call__(self, registro: dict):
+        self.fases.append(registro)
+
+    def tabla(self) -> pd.DataFrame:
+        """Una fila por fase, en el orden en que corrieron."""
+        return pd.DataFrame(self.fases, columns=COLUMNAS_METRICAS)
+
+
+def _distribucion(candidatos: np.ndarray) -> dict:
+    """Media, mediana, p90 y máximo de la cantidad de candidatos por objetivo."""
+    if len(candidatos) == 0:
+        return {}
+    p50, p90 = np.percentile(candidatos, [50, 90])
+    return {
+        "candidatos_media": round(float(candidatos.mean()), 2),
+        "candidatos_p50": float(p50),
+        "candidatos_p90": float(p90),
+        "candidatos_max": int(candidatos.max()),
+    }
+
+
+def _estadisticas_decisiones(decisiones: list[tuple]) -> dict:
+    """Objetivos, candidatos, nodos visitados y truncados de las decisiones de una fase."""
+    candidatos = np.fromiter((dec[5] for dec in decisiones), dtype=np.int64, count=len(decisiones))
+    nodos = np.fromiter((dec[6] for dec in decisiones), dtype=np.int64, count=len(decisiones))
+    return {
+        "filas_entrada": len(decisiones),
+        "nodos": int(nodos.sum()),
+        "nodos_max": int(nodos.max()) if len(nodos) else 0,
+        "truncados": sum(1 for dec in decisiones if dec[4]),
+        **_distribucion(candidatos),
+    }
+
+
+def _registrar(metricas, fase: str, inicio: float, **datos):
+    """Envía a `metricas` (si hay) el registro de una fase que empezó en `inicio`."""
+    if metricas is not None:
+        metricas({"fase": fase, "segundos": round(time.perf_counter() - inicio, 4), **datos})
 
 
 # --- Heurística MVP de conciliación ---
 
+# Se incrementa cuando cambia el algoritmo, para no reutilizar resultados cacheados viejos
+_VERSION_CACHE = 3
+
+
+def _conciliar_indices(
+    mayor: LibroNormalizado,
+    banco: LibroNormalizado,
+    tolerancia_dias: int,
+    tolerancia_cent: int,
+    max_items_grupo: int,
+    direccion: str,
+    modo_asignacion: str,
+    procesos: int,
+    metricas=None,
+    progreso=None,
+    candidatos_grupo: int | None = None,
+) -> _Matches:
+    """
+    Corre todas las fases sobre los lados normalizados y devuelve los matches en orden de salida.
+
+    Con `metricas`, cada fase le envía su registro (ver `MetricasConciliacion`); con `progreso`,
+    su avance (ver `conciliacion_mvp`).
+    """
+    def avance(fase: str):
+        return None if progreso is None else partial(progreso, fase)
+
+    usados_mayor: set[int] = set()
+    usados_banco: set[int] = set()
+    partes: list[_Matches] = []
+    estadisticas = {} if metricas is not None else None
+
+    # --- Pasada exacta: (signo, centavos, fecha) idénticos en un solo join ---
+    inicio = time.perf_counter()
+    if progreso is not None:
+        progreso("pasada_exacta", 0, len(banco))
+    exactos = _pasada_exacta(mayor, banco)
+    usados_mayor.update(exactos.mayor.tolist())
+    usados_banco.update(exactos.banco.tolist())
+    if progreso is not None:
+        progreso("pasada_exacta", len(banco), len(banco))
+    _registrar(metricas, "pasada_exacta", inicio, filas_entrada=len(banco), filas_salida=len(exactos.banco))
+
+    # --- One-to-one con tolerancia de fechas y valores sobre lo que queda ---
+    inicio = time.perf_counter()
+    if modo_asignacion == "optimo":
+        tolerancia = _one_to_one_optimo(
+            mayor, banco, tolerancia_dias, tolerancia_cent, usados_mayor, usados_banco, estadisticas,
+            avance(f"one_to_one {modo_asignacion}"),
+        )
+    else:
+        tolerancia = _one_to_one_indexado(
+            mayor, banco, tolerancia_dias, tolerancia_cent, usados_mayor, usados_banco, procesos, estadisticas,
+            avance(f"one_to_one {modo_asignacion}"),
+        )
+    _registrar(metricas, f"one_to_one {modo_asignacion}", inicio, filas_salida=len(tolerancia.banco), **(estadisticas or {}))
+    one_to_one = _unir_matches([exactos, tolerancia])
+    partes.append(_Matches(*(col[np.argsort(one_to_one.banco, kind="stable")] for col in one_to_one)))
+
+    # --- Agrupación en el/los sentidos pedidos ---
+    sentidos = _sentidos_agrupacion(direccion)
+    if max_items_grupo and max_items_grupo > 1:
+        secuencia_grupos = itertools.count(1)
+        for sentido in sentidos:
+            inicio = time.perf_counter()
+            estadisticas = {} if metricas is not None else None
+            if sentido == "MAYOR→BANCO":
+                partes.append(_agrupar(
+                    mayor, banco, tolerancia_dias, tolerancia_cent, max_items_grupo,
+                    usados_mayor, usados_banco, sentido, secuencia_grupos, procesos, estadisticas,
+                    avance(f"agrupacion {sentido}"), candidatos_grupo=candidatos_grupo,
+                ))
+            else:
+                partes.append(_agrupar(
+                    banco, mayor, tolerancia_dias, tolerancia_cent, max_items_grupo,
+                    usados_banco, usados_mayor, sentido, secuencia_grupos, procesos, estadisticas,
+                    avance(f"agrupacion {sentido}"), candidatos_grupo=candidatos_grupo,
+                ))
+            _registrar(metricas, f"agrupacion {sentido}", inicio, filas_salida=len(partes[-1].mayor), **(estadisticas or {}))
+
+    return _unir_matches(partes)
+
+
 def conciliacion_mvp(
     df_mayor_in: pd.DataFrame,
     df_banco_in: pd.DataFrame,
@@ -89,271 +1525,536 @@ def conciliacion_mvp(
     max_items_grupo: int,
     direccion: str = "MAYOR→BANCO",
     tolerancia_valor: float = 0.0,
+    modo_asignacion: str = "greedy",
+    procesos: int = 1,
+    salida: str = "detalle",
+    cache=None,
+    metricas=None,
+    progreso=None,
+    candidatos_grupo: int | None = None,
 ):
     """
     Conciliación bancaria con estrategia MVP:
     1. One-to-one exacto con tolerancia de fechas y valores
-    2. Many-to-one (agrupación) si max_items_grupo > 1
+    2. Agrupación si max_items_grupo > 1, en el sentido indicado por `direccion`
     
+    `df_mayor_in`/`df_banco_in` pueden ser DataFrames o `LibroNormalizado` ya armados; con
+    libros no se vuelve a parsear ni a ordenar, lo que conviene al repetir con otros parámetros.
+
     Args:
+        direccion: "MAYOR→BANCO" (varios Mayor contra un Banco), "BANCO→MAYOR"
+            (varios Banco contra un Mayor) o "AMBAS" (primero uno y después el otro)
         tolerancia_valor: Diferencia máxima permitida entre importes (default: 0.0)
+        modo_asignacion: "greedy" (el Banco en orden toma su mejor candidato) u "optimo"
+            (asignación de costo mínimo por componente conexa; requiere scipy)
+        procesos: Cantidad de procesos para el one-to-one greedy y la agrupación. Con más de
+            uno se reparte por signo y bloques de fechas; el resultado es el mismo que con uno.
+        salida: "detalle" (una fila por registro con las columnas de ambos lados) o "ids"
+            (fila_mayor/fila_banco: posiciones en los DataFrames de entrada, más estado, regla,
+            diferencia_dias y grupo_id), para quien no necesita el detalle ancho.
+        cache: `CacheResultados` (u objeto con clave/leer/guardar). Si las fechas, importes y
+            parámetros ya se conciliaron, reutiliza los matches guardados sin recalcular.
+        metricas: Función que recibe un dict por fase (normalización, pasada exacta, one-to-one,
+            cada agrupación y salida) con tiempo, filas de entrada y salida, distribución de
+            candidatos por objetivo, nodos visitados y objetivos truncados; por ejemplo un
+            `MetricasConciliacion`. Sin ella no se mide nada.
+        progreso: Función `progreso(fase, hechos, total)` que recibe el avance de cada fase
+            (objetivos resueltos sobre el total; en paralelo, el total cuenta bloques y
+            validación). Para cancelar, puede lanzar `ConciliacionCancelada`, que corta la
+            corrida en el próximo aviso.
+        candidatos_grupo: Cantidad de candidatos (los más cercanos en fecha) entre los que se
+            buscan grupos. Por defecto depende del tamaño del grupo: 20.000 para grupos de 1 y
+            2 ítems, 199 para 3-4, 50 para 5-6, 27 para 7-8 y 20 para 9-10. Con un entero se usa
+            ese prefijo para todos los tamaños (60 replica la búsqueda original), a un costo de
+            enumeración que crece como C(candidatos_grupo, ceil(max_items_grupo/2)) por objetivo.
+            Además, por objetivo se cruzan a lo sumo un millón de pares de mitades con suma
+            compatible (muchos importes iguales), así el tiempo por objetivo queda acotado. Si el
+            prefijo deja candidatos afuera o se agotan los pares, un grupo fuera de lo recorrido
+            no se encuentra y el objetivo cuenta como truncado en las métricas.
     """
-    mayor = _normalizar_mayor(df_mayor_in)
-    banco = _normalizar_banco(df_banco_in)
+    if modo_asignacion not in MODOS_ASIGNACION:
+        raise ValueError(f"Modo de asignación desconocido: {modo_asignacion!r}. Opciones: {MODOS_ASIGNACION}")
+    if salida not in SALIDAS:
+        raise ValueError(f"Salida desconocida: {salida!r}. Opciones: {SALIDAS}")
+    _validar_candidatos_grupo(candidatos_grupo)
 
-    # Signo para acelerar búsquedas
-    mayor["signo"] = np.sign(mayor["Importe_norm"]).astype(int)
-    banco["signo"] = np.sign(banco["Importe_norm"]).astype(int)
+    inicio = time.perf_counter()
+    if progreso is not None:
+        progreso("normalizacion", 0, 2)
+    mayor = _libro(df_mayor_in, "MAYOR")
+    banco = _libro(df_banco_in, "BANCO")
+    if progreso is not None:
+        progreso("normalizacion", 2, 2)
+    _registrar(
+        metricas, "normalizacion", inicio, filas_entrada=len(df_mayor_in) + len(df_banco_in),
+        filas_salida=len(mayor) + len(banco),
+    )
+    matches = _matches(
+        mayor, banco, tolerancia_dias, int(round(tolerancia_valor * 100)), max_items_grupo, direccion,
+        modo_asignacion, procesos, cache, metricas, progreso, candidatos_grupo,
+    )
 
-    mayor_idx = mayor.set_index("row_id")
-    banco_idx = banco.set_index("row_id")
+    inicio = time.perf_counter()
+    if progreso is not None:
+        progreso("salida", 0, 1)
+    filas = _filas_salida(matches, len(mayor), len(banco))
+    if salida == "ids":
+        detalle = _detalle_ids(filas, mayor.datos, banco.datos, max_items_grupo)
+    else:
+        detalle = _detalle_ancho(filas, mayor.datos, banco.datos, max_items_grupo)
+    resumen = _resumen(detalle)
+    _registrar(metricas, "salida", inicio, filas_entrada=len(matches.mayor), filas_salida=len(detalle))
+    if progreso is not None:
+        progreso("salida", 1, 1)
 
-    usados_mayor: set[int] = set()
-    usados_banco: set[int] = set()
-    matches: list[dict] = []
+    return detalle, resumen
 
-    # --- One-to-one con tolerancia de fechas y valores ---
-    # Ahora no podemos usar un mapa directo por importe exacto
-    # Tenemos que buscar para cada banco todos los mayores compatibles
-    
-    for bid, b in banco_idx.iterrows():
-        if bid in usados_banco:
-            continue
-            
-        # Buscar candidatos del Mayor con mismo signo y dentro de tolerancia de valor
-        candidatos_mayor = mayor_idx[
-            (mayor_idx["signo"] == b["signo"]) & 
-            (~mayor_idx.index.isin(usados_mayor)) &
-            (abs(mayor_idx["Importe_norm"] - b["Importe_norm"]) <= tolerancia_valor)
-        ]
-        
-        if candidatos_mayor.empty:
-            continue
-            
-        # Filtrar por tolerancia de días
-        cand_validos = candidatos_mayor[
-            _diferencia_dias_series(candidatos_mayor["Fecha_norm"], b["Fecha_norm"]) <= tolerancia_dias
-        ]
-        
-        if cand_validos.empty:
-            continue
-            
-        # Ordenar por: diferencia de días, diferencia de importe, fecha más antigua
-        cand_validos = cand_validos.assign(
-            diff_days=cand_validos["Fecha_norm"].apply(lambda d: _diferencia_dias(d, b["Fecha_norm"])),
-            diff_importe=abs(cand_validos["Importe_norm"] - b["Importe_norm"])
+
+def _matches(
+    mayor: LibroNormalizado,
+    banco: LibroNormalizado,
+    tolerancia_dias: int,
+    tolerancia_cent: int,
+    max_items_grupo: int,
+    direccion: str,
+    modo_asignacion: str,
+    procesos: int,
+    cache,
+    metricas,
+    progreso=None,
+    candidatos_grupo: int | None = None,
+) -> _Matches:
+    """Matches de una corrida: de la cache si ya están, si no todas las fases (y se guardan)."""
+    # El resultado solo depende de fechas, importes y orden de las filas, no de `procesos`
+    parametros = {
+        "version": _VERSION_CACHE, "tolerancia_dias": tolerancia_dias, "tolerancia_cent": tolerancia_cent,
+        "max_items_grupo": max_items_grupo, "direccion": direccion, "modo_asignacion": modo_asignacion,
+    }
+    # Solo entra en la clave si se fijó, así las entradas guardadas con el prefijo por defecto siguen valiendo
+    if candidatos_grupo is not None:
+        parametros["candidatos_grupo"] = candidatos_grupo
+    clave = None
+    matches = None
+    if cache is not None:
+        inicio = time.perf_counter()
+        clave = cache.clave(
+            [mayor.datos["Fecha_dia"].to_numpy(), mayor.imp, banco.datos["Fecha_dia"].to_numpy(), banco.imp],
+            parametros,
         )
-        cand_validos = cand_validos.sort_values(
-            by=["diff_days", "diff_importe", "Fecha_norm"], 
-            ascending=[True, True, True]
+        guardado = cache.leer(clave)
+        if guardado is not None:
+            matches = _Matches(**guardado)
+            _registrar(metricas, "cache", inicio, filas_salida=len(matches.mayor))
+    if matches is None:
+        matches = _conciliar_indices(
+            mayor, banco, tolerancia_dias, tolerancia_cent, max_items_grupo, direccion,
+            modo_asignacion, procesos, metricas, progreso, candidatos_grupo,
         )
-        
-        # Seleccionar el mejor candidato
-        rid_sel = cand_validos.index[0]
-        r_sel = cand_validos.iloc[0]
-        
-        usados_mayor.add(rid_sel)
-        usados_banco.add(bid)
-        
-        diff_days = int(r_sel["diff_days"])
-        diff_importe = float(r_sel["diff_importe"])
-        
-        # Determinar estado según las diferencias
-        if diff_days == 0 and diff_importe == 0:
-            estado = "Conciliado exacto"
-        elif diff_importe == 0 and diff_days > 0:
-            estado = "Conciliado por tolerancia de fecha"
-        elif diff_importe > 0 and diff_importe <= tolerancia_valor:
-            estado = "Conciliado por tolerancia de valor"
-        else:
-            # Este caso no debería ocurrir por el filtro previo
-            estado = "Conciliado por tolerancia"
-            
-        matches.append({
-            "row_id_mayor": rid_sel,
-            "row_id_banco": bid,
-            "estado": estado,
-            "regla": "one_to_one",
-            "diferencia_dias": diff_days,
-            "grupo_id": None,
-        })
-
-    # --- Many-to-one (Mayor → Banco) ---
-    if max_items_grupo and max_items_grupo > 1 and direccion.startswith("MAYOR"):
-        no_usados_mayor = mayor_idx.drop(index=list(usados_mayor), errors="ignore")
-        no_usados_banco = banco_idx.drop(index=list(usados_banco), errors="ignore")
-
-        mayor_por_signo = {
-            -1: no_usados_mayor[no_usados_mayor["signo"] < 0],
-            0: no_usados_mayor[no_usados_mayor["signo"] == 0],
-            1: no_usados_mayor[no_usados_mayor["signo"] > 0],
-        }
-
-        grupo_seq = 1
-
-        for bid, b in no_usados_banco.iterrows():
-            sign_key = int(np.sign(b["Importe_norm"]))
-            candidatos = mayor_por_signo.get(sign_key, pd.DataFrame())
-            if candidatos.empty:
-                continue
+        if cache is not None:
+            cache.guardar(clave, matches._asdict())
+    return matches
 
-            cand = candidatos[_diferencia_dias_series(candidatos["Fecha_norm"], b["Fecha_norm"]) <= tolerancia_dias]
-            if cand.empty:
-                continue
 
-            cand = cand.assign(diff_days=cand["Fecha_norm"].apply(lambda d: _diferencia_dias(d, b["Fecha_norm"])))
-            cand = cand.sort_values(by=["diff_days", "Importe_norm"], ascending=[True, False])
-            cand = cand.head(60)
-
-            objetivo = b["Importe_norm"]
-            rids = cand.index.tolist()
-            importes = cand["Importe_norm"].values
-            fechas = cand["Fecha_norm"].values
-            diffs = cand["diff_days"].values
-
-            mejor_sol = None  # (indices, max_diff, len)
-            visited_limit = 5000
-            visited = 0
-
-            def backtrack(start, curr_sum, indices):
-                nonlocal mejor_sol, visited
-                if visited > visited_limit:
-                    return
-                visited += 1
-
-                if len(indices) > max_items_grupo:
-                    return
-                    
-                # Cambio clave: usar tolerancia_valor en vez de 1e-9
-                if abs(curr_sum - objetivo) <= tolerancia_valor and len(indices) >= 1:
-                    max_diff = max(diffs[i] for i in indices) if indices else 0
-                    cand_tuple = (tuple(indices), max_diff, len(indices))
-                    if mejor_sol is None:
-                        mejor_sol = cand_tuple
-                    else:
-                        curr_best = mejor_sol
-                        curr_oldest = min(fechas[i] for i in curr_best[0])
-                        new_oldest = min(fechas[i] for i in indices)
-                        if (cand_tuple[1], cand_tuple[2], new_oldest) < (curr_best[1], curr_best[2], curr_oldest):
-                            mejor_sol = cand_tuple
-                    return
-                    
-                # Podas optimizadas considerando tolerancia_valor
-                if sign_key >= 0 and curr_sum > objetivo + tolerancia_valor:
-                    return
-                if sign_key < 0 and curr_sum < objetivo - tolerancia_valor:
-                    return
-
-                for i in range(start, len(rids)):
-                    idx = i
-                    backtrack(i + 1, curr_sum + importes[idx], indices + [idx])
-
-            backtrack(0, 0.0, [])
-
-            if mejor_sol:
-                sel = mejor_sol[0]
-                grupo_id = f"G{grupo_seq}"
-                grupo_seq += 1
-                for idx in sel:
-                    rid_sel = rids[idx]
-                    usados_mayor.add(rid_sel)
-                    matches.append({
-                        "row_id_mayor": rid_sel,
-                        "row_id_banco": bid,
-                        "estado": "Conciliado por agrupación",
-                        "regla": f"many_to_one<={max_items_grupo}",
-                        "diferencia_dias": int(diffs[idx]),
-                        "grupo_id": grupo_id,
-                    })
-                usados_banco.add(bid)
-
-    # --- Construcción de salida ---
-    m_df = pd.DataFrame(matches)
-
-    solo_mayor_ids = [rid for rid in mayor_idx.index if rid not in usados_mayor]
-    solo_banco_ids = [bid for bid in banco_idx.index if bid not in usados_banco]
-
-    # Detalle conciliado
-    if not m_df.empty:
-        joined = (
-            m_df
-            .merge(mayor_idx.reset_index().rename(columns={"row_id": "row_id_mayor"}), on="row_id_mayor", how="left")
-            .merge(
-                banco_idx.reset_index().rename(columns={"row_id": "row_id_banco"}),
-                on="row_id_banco",
-                how="left",
-                suffixes=("_MAYOR", "_BANCO"),
+def _resumen(detalle: pd.DataFrame) -> pd.DataFrame:
+    """Cantidad de filas del detalle por estado."""
+    if detalle.empty:
+        return pd.DataFrame(columns=["estado", "cantidad"])
+    cantidades = detalle["estado"].value_counts()
+    # Las categorías sin filas no van al resumen
+    return cantidades[cantidades > 0].rename_axis("estado").reset_index(name="cantidad")
+
+
+# --- Conciliación en tandas ---
+
+# Objetivos (o filas sin match) por tanda de `conciliacion_en_tandas`
+_FILAS_POR_TANDA = 50_000
+
+
+class TandaConciliacion(NamedTuple):
+    """Parte del detalle producida por una fase de `conciliacion_en_tandas`."""
+    fase: str
+    detalle: pd.DataFrame
+
+
+def conciliacion_en_tandas(
+    df_mayor_in: pd.DataFrame,
+    df_banco_in: pd.DataFrame,
+    tolerancia_dias: int,
+    max_items_grupo: int,
+    direccion: str = "MAYOR→BANCO",
+    tolerancia_valor: float = 0.0,
+    modo_asignacion: str = "greedy",
+    procesos: int = 1,
+    salida: str = "detalle",
+    filas_por_tanda: int = _FILAS_POR_TANDA,
+    progreso=None,
+    candidatos_grupo: int | None = None,
+) -> Iterator[TandaConciliacion]:
+    """
+    Variante de `conciliacion_mvp` que entrega el detalle por tandas a medida que se produce.
+
+    Recorre las mismas fases con los mismos parámetros y rinde `TandaConciliacion(fase, detalle)`:
+    primero "pasada_exacta", después "one_to_one", cada "agrupacion <sentido>" y al final
+    "sin_match" (Mayor y después Banco). El one-to-one greedy y la agrupación avanzan de a
+    `filas_por_tanda` objetivos en orden de row_id, con el mismo resultado que de una vez; el
+    one-to-one óptimo resuelve todo junto y se entrega partido. Así quien consume puede mostrar
+    o guardar cada tanda y quedarse solo con una ventana acotada.
+
+    Juntando las tandas salen las mismas filas que en `conciliacion_mvp`; cambia el orden del
+    bloque one-to-one (exactos primero) y `diferencia_dias` es entera en las tandas sin filas
+    "Solo en ...". No usa cache.
+    """
+    if modo_asignacion not in MODOS_ASIGNACION:
+        raise ValueError(f"Modo de asignación desconocido: {modo_asignacion!r}. Opciones: {MODOS_ASIGNACION}")
+    if salida not in SALIDAS:
+        raise ValueError(f"Salida desconocida: {salida!r}. Opciones: {SALIDAS}")
+    if filas_por_tanda < 1:
+        raise ValueError("filas_por_tanda debe ser mayor que cero")
+    _validar_candidatos_grupo(candidatos_grupo)
+    return _tandas(
+        _libro(df_mayor_in, "MAYOR"), _libro(df_banco_in, "BANCO"), tolerancia_dias,
+        int(round(tolerancia_valor * 100)), max_items_grupo, direccion, modo_asignacion, procesos,
+        salida, filas_por_tanda, progreso, candidatos_grupo,
+    )
+
+
+def _tandas(
+    mayor: LibroNormalizado,
+    banco: LibroNormalizado,
+    tolerancia_dias: int,
+    tolerancia_cent: int,
+    max_items_grupo: int,
+    direccion: str,
+    modo_asignacion: str,
+    procesos: int,
+    salida: str,
+    filas_por_tanda: int,
+    progreso,
+    candidatos_grupo: int | None = None,
+) -> Iterator[TandaConciliacion]:
+    """Generador de `conciliacion_en_tandas`, con los argumentos ya validados."""
+    armar = _detalle_ids if salida == "ids" else _detalle_ancho
+    usados_mayor: set[int] = set()
+    usados_banco: set[int] = set()
+
+    def entregar(fase: str, matches: _Matches):
+        for ini in range(0, len(matches.mayor), filas_por_tanda):
+            parte = _Matches(*(col[ini:ini + filas_por_tanda] for col in matches))
+            yield TandaConciliacion(fase, armar(parte, mayor.datos, banco.datos, max_items_grupo))
+
+    def por_tramos(fase: str, objetivo: LibroNormalizado, usados_objetivo: set, correr):
+        # Tramos de row_ids del lado objetivo con `filas_por_tanda` pendientes cada uno
+        pendientes = _objetivos_pendientes(objetivo, usados_objetivo)[0]
+        cortes = list(pendientes[filas_por_tanda::filas_por_tanda]) + [len(objetivo)]
+        desde = 0
+        for hechos, hasta in zip(range(0, len(pendientes), filas_por_tanda), cortes):
+            avance = None if progreso is None else (
+                lambda h, t, hechos=hechos: progreso(fase, hechos + h, len(pendientes))
             )
-        )
-        mayor_cols = [c for c in mayor.columns if c in MAYOR_COLS] + ["Fecha_norm", "Importe_norm"]
-        banco_cols = [c for c in banco.columns if c in BANCO_COLS] + ["Fecha_norm", "Importe_norm"]
-        rename_map = {}
-        for c in mayor_cols:
-            rename_map[c] = f"{c}_MAYOR"
-        for c in banco_cols:
-            rename_map[c] = f"{c}_BANCO"
-        detalle_ok = joined.rename(columns=rename_map)
-    else:
-        detalle_ok = pd.DataFrame(columns=[])
-
-    # Solo en Mayor
-    solo_mayor = mayor_idx.loc[solo_mayor_ids].copy()
-    if not solo_mayor.empty:
-        solo_mayor["estado"] = "Solo en Mayor"
-        solo_mayor["regla"] = ""
-        solo_mayor["diferencia_dias"] = np.nan
-        solo_mayor["grupo_id"] = ""
-        for c in BANCO_COLS + ["Fecha_norm", "Importe_norm"]:
-            solo_mayor[f"{c}_BANCO"] = np.nan
-        for c in MAYOR_COLS + ["Fecha_norm", "Importe_norm"]:
-            if c in solo_mayor.columns:
-                solo_mayor[f"{c}_MAYOR"] = solo_mayor[c]
-        detalle_mayor_only = solo_mayor[[
-            col for col in solo_mayor.columns if col.endswith("_MAYOR") or col.endswith("_BANCO")
-        ] + ["estado", "regla", "diferencia_dias", "grupo_id"]]
+            yield from entregar(fase, correr((desde, int(hasta)), avance))
+            desde = int(hasta)
+
+    exactos = _pasada_exacta(mayor, banco)
+    usados_mayor.update(exactos.mayor.tolist())
+    usados_banco.update(exactos.banco.tolist())
+    if progreso is not None:
+        progreso("pasada_exacta", len(banco), len(banco))
+    yield from entregar("pasada_exacta", _Matches(*(col[np.argsort(exactos.banco, kind="stable")] for col in exactos)))
+
+    if modo_asignacion == "optimo":
+        avance = None if progreso is None else partial(progreso, "one_to_one")
+        yield from entregar("one_to_one", _one_to_one_optimo(
+            mayor, banco, tolerancia_dias, tolerancia_cent, usados_mayor, usados_banco, avance=avance,
+        ))
     else:
-        detalle_mayor_only = pd.DataFrame(columns=detalle_ok.columns if not detalle_ok.empty else None)
-
-    # Solo en Banco
-    solo_banco = banco_idx.loc[solo_banco_ids].copy()
-    if not solo_banco.empty:
-        solo_banco["estado"] = "Solo en Banco"
-        solo_banco["regla"] = ""
-        solo_banco["diferencia_dias"] = np.nan
-        solo_banco["grupo_id"] = ""
-        for c in MAYOR_COLS + ["Fecha_norm", "Importe_norm"]:
-            solo_banco[f"{c}_MAYOR"] = np.nan
-        for c in BANCO_COLS + ["Fecha_norm", "Importe_norm"]:
-            if c in solo_banco.columns:
-                solo_banco[f"{c}_BANCO"] = solo_banco[c]
-        detalle_banco_only = solo_banco[[
-            col for col in solo_banco.columns if col.endswith("_MAYOR") or col.endswith("_BANCO")
-        ] + ["estado", "regla", "diferencia_dias", "grupo_id"]]
+        yield from por_tramos("one_to_one", banco, usados_banco, lambda rango, avance: _one_to_one_indexado(
+            mayor, banco, tolerancia_dias, tolerancia_cent, usados_mayor, usados_banco, procesos,
+            avance=avance, rango=rango,
+        ))
+
+    if max_items_grupo and max_items_grupo > 1:
+        secuencia_grupos = itertools.count(1)
+        for sentido in _sentidos_agrupacion(direccion):
+            if sentido == "MAYOR→BANCO":
+                grupo, objetivo, usados_grupo, usados_objetivo = mayor, banco, usados_mayor, usados_banco
+            else:
+                grupo, objetivo, usados_grupo, usados_objetivo = banco, mayor, usados_banco, usados_mayor
+            yield from por_tramos(
+                f"agrupacion {sentido}", objetivo, usados_objetivo,
+                lambda rango, avance: _agrupar(
+                    grupo, objetivo, tolerancia_dias, tolerancia_cent, max_items_grupo, usados_grupo,
+                    usados_objetivo, sentido, secuencia_grupos, procesos, avance=avance, rango=rango,
+                    candidatos_grupo=candidatos_grupo,
+                ),
+            )
+
+    libre_m = ~np.isin(mayor.rid, np.fromiter(usados_mayor, dtype=np.int64, count=len(usados_mayor)))
+    libre_b = ~np.isin(banco.rid, np.fromiter(usados_banco, dtype=np.int64, count=len(usados_banco)))
+    yield from entregar("sin_match", _solos(mayor.rid[libre_m], banco.rid[libre_b]))
+
+
+# --- Conciliación por cuenta ---
+
+# Columnas del Mayor que identifican la cuenta bancaria
+COLUMNAS_CUENTA = ["Código", "Cuenta"]
+
+
+def _cuentas_banco(cuentas_banco, df_banco_in, banco: LibroNormalizado, mapa_cuentas: dict | None) -> np.ndarray:
+    """Clave de cuenta (texto) de cada fila válida del Banco, ya traducida con `mapa_cuentas`."""
+    if np.ndim(cuentas_banco) == 0:
+        claves = np.full(len(banco), cuentas_banco, dtype=object)
     else:
-        detalle_banco_only = pd.DataFrame(columns=detalle_ok.columns if not detalle_ok.empty else None)
-
-    # Combinar todos los detalles
-    frames = [df for df in [detalle_ok, detalle_mayor_only, detalle_banco_only] if df is not None and not df.empty]
-    detalle = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
-
-    # Ordenar columnas
-    mayor_out = [f"{c}_MAYOR" for c in MAYOR_COLS if f"{c}_MAYOR" in detalle.columns] + [c for c in ["Fecha_norm_MAYOR", "Importe_norm_MAYOR"] if c in detalle.columns]
-    banco_out = [f"{c}_BANCO" for c in BANCO_COLS if f"{c}_BANCO" in detalle.columns] + [c for c in ["Fecha_norm_BANCO", "Importe_norm_BANCO"] if c in detalle.columns]
-    meta_out = [c for c in ["estado", "regla", "diferencia_dias", "grupo_id"] if c in detalle.columns]
-    col_order = mayor_out + banco_out + meta_out
-    if not detalle.empty:
-        detalle = detalle.reindex(columns=col_order)
-        detalle = _coerce_datetime64(detalle)
-
-    # Resumen
-    resumen = (
-        detalle["estado"].value_counts().rename_axis("estado").reset_index(name="cantidad")
-        if not detalle.empty else pd.DataFrame(columns=["estado", "cantidad"])
+        cuentas = pd.Series(np.asarray(cuentas_banco, dtype=object))
+        esperadas = len(df_banco_in) if isinstance(df_banco_in, pd.DataFrame) else None
+        if esperadas is not None and len(cuentas) != esperadas:
+            raise ValueError(
+                f"cuentas_banco tiene {len(cuentas)} valores y el Banco {esperadas} filas; deben coincidir"
+            )
+        fila_entrada = banco.datos["fila_entrada"].to_numpy()
+        if len(fila_entrada) and fila_entrada.max() >= len(cuentas):
+            raise ValueError("cuentas_banco tiene menos valores que filas el Banco")
+        claves = cuentas.to_numpy()[fila_entrada]
+    claves = texto_clave(pd.Series(claves, dtype=object))
+    if mapa_cuentas:
+        mapa = dict(zip(texto_clave(pd.Series(list(mapa_cuentas), dtype=object)),
+                        texto_clave(pd.Series(list(mapa_cuentas.values()), dtype=object))))
+        claves = pd.Series(claves).map(lambda c: mapa.get(c, c)).to_numpy(dtype=object)
+    return claves
+
+
+def _matches_particion(
+    datos_mayor: pd.DataFrame, datos_banco: pd.DataFrame, parametros: dict, medir: bool, progreso=None
+):
+    """
+    Filas de salida de una cuenta (row_ids locales a la partición) y, con `medir`, sus métricas.
+
+    Recibe las filas ya normalizadas de cada lado; corre en el proceso principal o en un worker.
+    """
+    metricas = MetricasConciliacion() if medir else None
+    mayor, banco = LibroNormalizado(datos_mayor, "MAYOR"), LibroNormalizado(datos_banco, "BANCO")
+    matches = _matches(mayor, banco, metricas=metricas, progreso=progreso, **parametros)
+    return _filas_salida(matches, len(mayor), len(banco)), (metricas.fases if medir else [])
+
+
+def conciliacion_por_cuenta(
+    df_mayor_in: pd.DataFrame,
+    df_banco_in: pd.DataFrame,
+    tolerancia_dias: int,
+    max_items_grupo: int,
+    cuentas_banco,
+    columna_cuenta: str = "Cuenta",
+    mapa_cuentas: dict | None = None,
+    direccion: str = "MAYOR→BANCO",
+    tolerancia_valor: float = 0.0,
+    modo_asignacion: str = "greedy",
+    procesos: int = 1,
+    salida: str = "detalle",
+    cache=None,
+    metricas=None,
+    progreso=None,
+    candidatos_grupo: int | None = None,
+):
+    """
+    Conciliación separada por cuenta bancaria: cada fila del Banco solo se compara con las
+    filas del Mayor de su misma cuenta.
+
+    El Mayor se parte por `columna_cuenta` ("Código" o "Cuenta") y el Banco por
+    `cuentas_banco`: un valor para todo el extracto o uno por fila del Banco de entrada (alineado
+    con `df_banco_in`). `mapa_cuentas` traduce esas claves del Banco a los valores del Mayor
+    (p. ej. número de cuenta bancaria → código contable). Las claves se comparan como texto.
+
+    Cada cuenta se concilia por separado con las mismas reglas que `conciliacion_mvp` y, con
+    `procesos` > 1, las cuentas se reparten entre procesos. Devuelve (detalle, resumen) como
+    `conciliacion_mvp`, con una columna `cuenta` al final del detalle; las filas quedan por
+    cuenta (en orden de aparición en el Mayor y después las que solo tiene el Banco) y los
+    grupos se numeran de corrido. Las métricas de cada cuenta llevan la cuenta en `fase`, igual
+    que los avisos de `progreso` en un solo proceso; con varios, `progreso` recibe la fase
+    "cuentas" con las cuentas terminadas.
+    """
+    if columna_cuenta not in COLUMNAS_CUENTA:
+        raise ValueError(f"Columna de cuenta desconocida: {columna_cuenta!r}. Opciones: {COLUMNAS_CUENTA}")
+    if modo_asignacion not in MODOS_ASIGNACION:
+        raise ValueError(f"Modo de asignación desconocido: {modo_asignacion!r}. Opciones: {MODOS_ASIGNACION}")
+    if salida not in SALIDAS:
+        raise ValueError(f"Salida desconocida: {salida!r}. Opciones: {SALIDAS}")
+    _validar_candidatos_grupo(candidatos_grupo)
+
+    inicio = time.perf_counter()
+    mayor = _libro(df_mayor_in, "MAYOR")
+    banco = _libro(df_banco_in, "BANCO")
+    cuenta_mayor = texto_clave(mayor.datos[columna_cuenta])
+    cuenta_banco = _cuentas_banco(cuentas_banco, df_banco_in, banco, mapa_cuentas)
+    cuentas = pd.unique(np.concatenate([cuenta_mayor, cuenta_banco]))
+    codigos_m, codigos_b = pd.Index(cuentas).get_indexer(cuenta_mayor), pd.Index(cuentas).get_indexer(cuenta_banco)
+    orden_m, orden_b = np.argsort(codigos_m, kind="stable"), np.argsort(codigos_b, kind="stable")
+    cortes_m = np.searchsorted(codigos_m[orden_m], np.arange(len(cuentas) + 1))
+    cortes_b = np.searchsorted(codigos_b[orden_b], np.arange(len(cuentas) + 1))
+    particiones = [
+        (orden_m[cortes_m[i]:cortes_m[i + 1]], orden_b[cortes_b[i]:cortes_b[i + 1]]) for i in range(len(cuentas))
+    ]
+    _registrar(
+        metricas, "normalizacion", inicio, filas_entrada=len(df_mayor_in) + len(df_banco_in),
+        filas_salida=len(mayor) + len(banco),
     )
 
+    parametros = {
+        "tolerancia_dias": tolerancia_dias, "tolerancia_cent": int(round(tolerancia_valor * 100)),
+        "max_items_grupo": max_items_grupo, "direccion": direccion, "modo_asignacion": modo_asignacion,
+        "procesos": procesos if len(cuentas) == 1 else 1, "cache": cache, "candidatos_grupo": candidatos_grupo,
+    }
+    trabajos = [
+        (mayor.datos.iloc[pos_m].reset_index(drop=True), banco.datos.iloc[pos_b].reset_index(drop=True),
+         parametros, metricas is not None)
+        for pos_m, pos_b in particiones
+    ]
+    if procesos > 1 and len(cuentas) > 1:
+        with ProcessPoolExecutor(max_workers=min(procesos, len(cuentas))) as ex:
+            futuros = [ex.submit(_matches_particion, *t) for t in trabajos]
+            try:
+                for hechas, _ in enumerate(as_completed(futuros), start=1):
+                    if progreso is not None:
+                        progreso("cuentas", hechas, len(futuros))
+            except BaseException:
+                for futuro in futuros:
+                    futuro.cancel()
+                raise
+            resultados = [f.result() for f in futuros]
+    else:
+        resultados = [
+            _matches_particion(
+                *t, None if progreso is None else
+                lambda fase, hechos, total, cuenta=cuenta: progreso(f"{cuenta or '(sin cuenta)'}: {fase}", hechos, total)
+            )
+            for cuenta, t in zip(cuentas, trabajos)
+        ]
+
+    # Row_ids locales a globales y grupos numerados de corrido
+    inicio = time.perf_counter()
+    partes, cuenta_filas, base_grupos = [], [], 0
+    for cuenta, (pos_m, pos_b), (filas, fases) in zip(cuentas, particiones, resultados):
+        for fase in fases:
+            metricas({**fase, "fase": f"{cuenta or '(sin cuenta)'}: {fase['fase']}"})
+        con_grupo = filas.grupo > 0
+        partes.append(filas._replace(
+            mayor=np.where(filas.mayor >= 0, pos_m[np.maximum(filas.mayor, 0)] if len(pos_m) else -1, -1),
+            banco=np.where(filas.banco >= 0, pos_b[np.maximum(filas.banco, 0)] if len(pos_b) else -1, -1),
+            grupo=np.where(con_grupo, filas.grupo + base_grupos, 0),
+        ))
+        base_grupos += int(filas.grupo.max()) if len(filas.grupo) else 0
+        cuenta_filas.append(np.full(len(filas.mayor), cuenta, dtype=object))
+    filas = _unir_matches(partes)
+    if salida == "ids":
+        detalle = _detalle_ids(filas, mayor.datos, banco.datos, max_items_grupo)
+    else:
+        detalle = _detalle_ancho(filas, mayor.datos, banco.datos, max_items_grupo)
+    if len(detalle):
+        detalle["cuenta"] = pd.Categorical(np.concatenate(cuenta_filas))
+    resumen = _resumen(detalle)
+    _registrar(metricas, "salida", inicio, filas_entrada=len(filas.mayor), filas_salida=len(detalle))
+
     return detalle, resumen
 
 
+# --- Construcción de salida ---
+
+def _filas_salida(matches: _Matches, n_mayor: int, n_banco: int) -> _Matches:
+    """
+    Filas del detalle en orden: los matches, después el Mayor sin match y después el Banco sin
+    match (ambos por row_id). El lado ausente queda en -1.
+    """
+    libre_m = np.ones(n_mayor, dtype=bool)
+    libre_m[matches.mayor] = False
+    libre_b = np.ones(n_banco, dtype=bool)
+    libre_b[matches.banco] = False
+    return _unir_matches([matches, _solos(np.flatnonzero(libre_m), np.flatnonzero(libre_b))])
+
+
+def _solos(solo_m: np.ndarray, solo_b: np.ndarray) -> _Matches:
+    """Filas "Solo en Mayor" y después "Solo en Banco" para los row_ids dados."""
+    return _unir_matches([
+        _armar_matches(solo_m, np.full(len(solo_m), -1), ESTADOS.index("Solo en Mayor"), 0, np.zeros(len(solo_m))),
+        _armar_matches(np.full(len(solo_b), -1), solo_b, ESTADOS.index("Solo en Banco"), 0, np.zeros(len(solo_b))),
+    ])
+
+
+def _columnas_meta(filas: _Matches, max_items_grupo: int) -> dict:
+    """
+    estado, regla, diferencia_dias y grupo_id a partir de los códigos. estado y regla son
+    categóricas con todas sus categorías; grupo_id, con "" (filas "Solo en ...") y los grupos
+    presentes, y faltante en los matches sin grupo.
+    """
+    reglas = [
+        f"{r}<={max_items_grupo}" if codigo in (_REGLA_MANY_TO_ONE, _REGLA_ONE_TO_MANY) else r
+        for codigo, r in enumerate(_REGLAS)
+    ]
+    solo = filas.regla == 0
+    # Sin filas "Solo en ..." las diferencias quedan enteras
+    dias = filas.dias.astype(np.int64)
+    if solo.any():
+        dias = np.where(solo, np.nan, dias)
+    con_grupo = filas.grupo > 0
+    numeros, codigos = np.unique(filas.grupo[con_grupo], return_inverse=True)
+    codigos_grupo = np.full(len(filas.grupo), -1, dtype=np.int64)
+    codigos_grupo[con_grupo] = codigos + 1
+    codigos_grupo[solo] = 0
+    return {
+        "estado": pd.Categorical.from_codes(filas.estado, categories=ESTADOS),
+        "regla": pd.Categorical.from_codes(filas.regla, categories=reglas),
+        "diferencia_dias": dias,
+        "grupo_id": pd.Categorical.from_codes(
+            codigos_grupo, categories=pd.Index(["", *np.char.add("G", numeros.astype(str))], dtype=object)
+        ),
+    }
+
+
+def _tomar(valores, posiciones: np.ndarray):
+    """
+    Toma por posición; las posiciones -1 quedan como faltante del tipo de la columna. Una
+    columna sin ningún valor (el lado no aparece) queda float NaN, salvo las fechas.
+    """
+    if len(posiciones) and (posiciones < 0).all() and valores.dtype.kind != "M":
+        return np.full(len(posiciones), np.nan)
+    return pd.api.extensions.take(valores, posiciones, allow_fill=True)
+
+
+def armar_detalle(pos_mayor: np.ndarray, pos_banco: np.ndarray, mayor: pd.DataFrame, banco: pd.DataFrame, meta: dict) -> pd.DataFrame:
+    """
+    Detalle ancho a partir de posiciones en cada lado normalizado (-1 = sin fila de ese lado).
+
+    Cada columna de salida es un `take` sobre la columna normalizada, sin merges ni copias
+    intermedias; las de texto salen como `TIPO_TEXTO`. `meta` aporta estado, regla,
+    diferencia_dias y grupo_id ya alineados.
+    """
+    if len(pos_mayor) == 0:
+        return pd.DataFrame()
+    columnas = {}
+    for sufijo, df_lado, esquema, pos in (
+        ("MAYOR", mayor, MAYOR_COLS, pos_mayor),
+        ("BANCO", banco, BANCO_COLS, pos_banco),
+    ):
+        for c in esquema:
+            columnas[f"{c}_{sufijo}"] = _tomar(_valores_texto(df_lado[c]), pos)
+        columnas[f"Fecha_norm_{sufijo}"] = _tomar(_fecha_desde_dia(df_lado["Fecha_dia"]), pos)
+        columnas[f"Importe_norm_{sufijo}"] = _tomar(df_lado["Importe_norm"].to_numpy(dtype=float), pos)
+    columnas.update(meta)
+    return pd.DataFrame(columnas, copy=False)
+
+
+def _detalle_ancho(filas: _Matches, mayor_idx: pd.DataFrame, banco_idx: pd.DataFrame, max_items_grupo: int) -> pd.DataFrame:
+    """Detalle completo de una corrida (row_id = posición en cada lado normalizado)."""
+    return armar_detalle(filas.mayor, filas.banco, mayor_idx, banco_idx, _columnas_meta(filas, max_items_grupo))
+
+
+def _detalle_ids(filas: _Matches, mayor_idx: pd.DataFrame, banco_idx: pd.DataFrame, max_items_grupo: int) -> pd.DataFrame:
+    """Detalle angosto: posición de cada fila en los DataFrames de entrada más las columnas de estado."""
+    columnas = {
+        "fila_mayor": pd.array(_tomar(mayor_idx["fila_entrada"].to_numpy(), filas.mayor), dtype="Int64"),
+        "fila_banco": pd.array(_tomar(banco_idx["fila_entrada"].to_numpy(), filas.banco), dtype="Int64"),
+    }
+    columnas.update(_columnas_meta(filas, max_items_grupo))
+    return pd.DataFrame(columnas, copy=False)
+
+
 # --- Helpers para usar "resultado previo" en la app ---
 
 def is_previous_result(df: pd.DataFrame) -> bool:
@@ -415,26 +2116,101 @@ def extract_mayor_from_previous(df: pd.DataFrame) -> pd.DataFrame:
     return out
 
 
+# Importes secundarios de cada lado: en la clave del detalle entran en centavos si se pueden leer
+_COLUMNAS_MONTO = {"MAYOR": ["Débito", "Crédito", "Saldo"], "BANCO": ["DEBITO", "CREDITO", "SALDO"]}
+# Columnas del resultado que entran en la clave del detalle, además de las de cada lado
+_COLUMNAS_RESULTADO = ["estado", "regla", "diferencia_dias", "grupo_id"]
+
+
+def texto_clave(serie: pd.Series) -> np.ndarray:
+    """
+    Texto comparable tras un ida y vuelta por Excel (sin espacios extremos ni '.0' de enteros),
+    normalizando solo los valores distintos.
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    unicos = pd.Series(unicos, dtype=object).astype(str).str.strip().str.replace(r"\.0$", "", regex=True)
+    return np.append(unicos.to_numpy(dtype=object), "")[codigos]
+
+
+def _clave_detalle(df: pd.DataFrame) -> np.ndarray:
+    """
+    Clave estable (uint64) de cada fila de un detalle: por lado, día de la fecha, importe en
+    centavos y el resto de las columnas del esquema (débito, crédito y saldo también en
+    centavos), más estado, regla, diferencia de días y grupo_id. Un float o una fecha
+    reformateados por Excel conservan la clave.
+    """
+    partes = {}
+    for lado, cols, (col_fecha, col_importe) in (
+        ("MAYOR", MAYOR_COLS, ("Fecha", "Importe")), ("BANCO", BANCO_COLS, ("FECHA", "IMPORTE"))
+    ):
+        fecha = df.get(f"Fecha_norm_{lado}")
+        if fecha is None:
+            fecha = df.get(f"{col_fecha}_{lado}", pd.Series(np.nan, index=df.index))
+        fechas = parsear_fechas(fecha)
+        importe = df.get(f"Importe_norm_{lado}")
+        if importe is None:
+            importe = parsear_importes(df.get(f"{col_importe}_{lado}", pd.Series(np.nan, index=df.index))).valores
+        partes[f"dia_{lado}"] = np.where(fechas.validos, fechas.dias, np.iinfo(np.int32).min)
+        partes[f"cent_{lado}"] = np.round(pd.to_numeric(importe, errors="coerce") * 100)
+        for c in cols:
+            col = f"{c}_{lado}"
+            if c in (col_fecha, col_importe):
+                continue
+            if col not in df.columns:
+                partes[col] = ""
+            elif c in _COLUMNAS_MONTO[lado]:
+                # Centavos donde el importe se puede leer; el texto queda para el resto
+                importes = parsear_importes(df[col])
+                partes[col] = np.where(importes.validos, importes.centavos, np.iinfo(np.int64).min)
+                partes[f"{col}_texto"] = np.where(importes.validos, "", texto_clave(df[col]))
+            else:
+                partes[col] = texto_clave(df[col])
+    for col in _COLUMNAS_RESULTADO:
+        partes[col] = texto_clave(df[col]) if col in df.columns else ""
+    return pd.util.hash_pandas_object(pd.DataFrame(partes, index=df.index), index=False).to_numpy()
+
+
 def merge_with_previous(prev_detalle: pd.DataFrame, nuevo_detalle: pd.DataFrame) -> pd.DataFrame:
-    """Une resultado previo con nuevo resultado, eliminando duplicados y sin arrastrar 'Solo en Mayor' del previo."""
+    """
+    Une resultado previo con nuevo resultado, eliminando duplicados y sin arrastrar 'Solo en Mayor' del previo.
+
+    Se descartan solo las filas del nuevo detalle que ya están en el previo según
+    `_clave_detalle`, contando repeticiones: si el previo tiene k filas con una clave, se
+    descartan las primeras k del nuevo. Filas iguales dentro de un mismo detalle (p. ej. dos
+    comisiones idénticas del mismo día) se conservan. Las columnas quedan en el orden del nuevo detalle, seguidas de las que solo
+    trae el previo, con los mismos tipos compactos que `conciliacion_mvp` (categóricas y texto
+    de Arrow).
+    """
     # Remover duplicados en cada DataFrame por separado
     if prev_detalle.columns.duplicated().any():
-        prev_detalle = prev_detalle.loc[:, ~prev_detalle.columns.duplicated()].copy()
+        prev_detalle = prev_detalle.loc[:, ~prev_detalle.columns.duplicated()]
     if nuevo_detalle.columns.duplicated().any():
-        nuevo_detalle = nuevo_detalle.loc[:, ~nuevo_detalle.columns.duplicated()].copy()
+        nuevo_detalle = nuevo_detalle.loc[:, ~nuevo_detalle.columns.duplicated()]
 
     # No arrastrar filas "Solo en Mayor" del resultado previo
     # (el nuevo_detalle ya trae el nuevo estado de esas filas)
     if "estado" in prev_detalle.columns:
-        prev_detalle = prev_detalle[prev_detalle["estado"] != "Solo en Mayor"].copy()
-
-    # Unir columnas
-    cols = list(set(prev_detalle.columns) | set(nuevo_detalle.columns))
-    prev_al = prev_detalle.reindex(columns=cols)
-    nuevo_al = nuevo_detalle.reindex(columns=cols)
-    combinado = pd.concat([prev_al, nuevo_al], ignore_index=True)
-    combinado = combinado.drop_duplicates()
-
-    # Normalizar fechas para Arrow/Streamlit
-    combinado = _coerce_datetime64(combinado)
-    return combinado
\ No newline at end of file
+        prev_detalle = prev_detalle[(prev_detalle["estado"] != "Solo en Mayor").to_numpy()]
+
+    def claves_numeradas(df: pd.DataFrame) -> pd.MultiIndex:
+        # (clave, número de repetición de la clave dentro del detalle)
+        claves = _clave_detalle(df)
+        return pd.MultiIndex.from_arrays([claves, pd.Series(claves).groupby(claves).cumcount().to_numpy()])
+
+    repetida = claves_numeradas(nuevo_detalle).isin(claves_numeradas(prev_detalle))
+
+    cols = list(nuevo_detalle.columns) + [c for c in prev_detalle.columns if c not in nuevo_detalle.columns]
+    previo = prev_detalle.reindex(columns=cols)
+    nuevo = nuevo_detalle[~repetida].reindex(columns=cols)
+    # Una columna sin valores en una parte toma el tipo de la otra, así la unión conserva el tipo
+    for c in cols:
+        if previo[c].dtype != nuevo[c].dtype:
+            if previo[c].isna().all():
+                previo[c] = previo[c].astype(nuevo[c].dtype)
+            elif nuevo[c].isna().all():
+                nuevo[c] = nuevo[c].astype(previo[c].dtype)
+    combinado = pd.concat([previo, nuevo], ignore_index=True)
+
+    # Normalizar fechas para Arrow/Streamlit y volver a los tipos compactos, que la unión con
+    # un previo leído de archivo pierde
+    return _compactar_tipos(_coerce_datetime64(combinado))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Conciliaciones en segundo plano para la página.
+
+Streamlit vuelve a correr el script ante cada interacción; una conciliación larga dentro de esa
+corrida se pierde si el usuario toca un widget. `TrabajoEnSegundoPlano` la manda a un hilo de un
+ejecutor compartido (la página lo guarda en `st.cache_resource`) y expone el avance que informa
+el motor por su callback `progreso`, para que la página lo consulte en cada corrida, muestre una
+barra y permita cancelar. El trabajo vive en `st.session_state` y su resultado queda disponible
+aunque el script se vuelva a ejecutar.
+"""
+
+import threading
+import time
+from concurrent.futures import CancelledError, Executor
+
+from reconciliacion import ConciliacionCancelada
+
+
+class TrabajoEnSegundoPlano:
+    """
+    Una función del motor corriendo en `ejecutor`, que recibe `progreso=` del trabajo.
+
+    `fase`, `hechos` y `total` reflejan el último aviso; `cancelar()` hace que el próximo aviso
+    lance `ConciliacionCancelada` (o evita que arranque, si todavía esperaba un hilo libre).
+    """
+
+    def __init__(self, ejecutor: Executor, funcion, *args, **kwargs):
+        self._cancelado = threading.Event()
+        self.fase: str | None = None
+        self.hechos = 0
+        self.total = 0
+        self.inicio = time.monotonic()
+        self.fin: float | None = None
+        self._futuro = ejecutor.submit(self._correr, funcion, args, kwargs)
+
+    def _correr(self, funcion, args, kwargs):
+        try:
+            return funcion(*args, progreso=self._avance, **kwargs)
+        finally:
+            self.fin = time.monotonic()
+
+    def _avance(self, fase: str, hechos: int, total: int):
+        if self._cancelado.is_set():
+            raise ConciliacionCancelada()
+        self.fase, self.hechos, self.total = fase, hechos, total
+
+    def cancelar(self):
+        self._cancelado.set()
+        if self._futuro.cancel():
+            self.fin = time.monotonic()
+
+    @property
+    def terminado(self) -> bool:
+        return self._futuro.done()
+
+    @property
+    def cancelado(self) -> bool:
+        """Cancelado antes de arrancar o cortado por un aviso."""
+        if not self._futuro.done():
+            return False
+        return self._futuro.cancelled() or isinstance(self._futuro.exception(), ConciliacionCancelada)
+
+    @property
+    def fraccion(self) -> float:
+        """Avance de la fase actual entre 0 y 1."""
+        return min(self.hechos / self.total, 1.0) if self.total else 0.0
+
+    @property
+    def segundos(self) -> float:
+        return (self.fin or time.monotonic()) - self.inicio
+
+    def resultado(self):
+        """Lo que devolvió la función; relanza su error. Solo con el trabajo terminado."""
+        if self.cancelado:
+            raise CancelledError()
+        return self._futuro.result(timeout=0)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Utilidades compartidas por los tests: armado de extractos Mayor y Banco."""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reconciliacion import BANCO_COLS, MAYOR_COLS  # noqa: E402
+
+_INICIO = pd.Timestamp("2024-01-01")
+
+
+def armar_mayor(fechas, importes, **columnas) -> pd.DataFrame:
+    """Mayor con las columnas esperadas; las no indicadas se completan con texto fijo."""
+    df = pd.DataFrame({c: "x" for c in MAYOR_COLS}, index=range(len(importes)))
+    df["Nro. Comp"] = [str(i) for i in range(len(importes))]
+    df["Fecha"] = list(fechas)
+    df["Importe"] = list(importes)
+    for nombre, valores in columnas.items():
+        df[nombre] = valores
+    return df
+
+
+def armar_banco(fechas, importes, **columnas) -> pd.DataFrame:
+    """Banco con las columnas esperadas; las no indicadas se completan con texto fijo."""
+    df = pd.DataFrame({c: "x" for c in BANCO_COLS}, index=range(len(importes)))
+    df["NUM"] = [str(i) for i in range(len(importes))]
+    df["FECHA"] = list(fechas)
+    df["IMPORTE"] = list(importes)
+    for nombre, valores in columnas.items():
+        df[nombre] = valores
+    return df
+
+
+def fechas_texto(dias) -> list[str]:
+    """Fechas dd/mm/yyyy a `dias` días del 01/01/2024."""
+    return [(_INICIO + pd.Timedelta(days=int(d))).strftime("%d/%m/%Y") for d in dias]
+
+
+def libros_aleatorios(semilla: int, n_mayor: int = 200, n_banco: int = 160, ruido: float = 0.0):
+    """
+    Mayor y Banco al azar con muchos importes repetidos, fechas corridas, algunos grupos de dos
+    ítems del Mayor y, con `ruido`, diferencias de centavos en el Banco.
+    """
+    rng = np.random.default_rng(semilla)
+    importes = rng.integers(1, 12, n_mayor) * 100.0 + rng.choice([0, 0.5, 0.25], n_mayor)
+    importes *= rng.choice([1, -1], n_mayor)
+    dias = rng.integers(0, 30, n_mayor)
+    elegidos = rng.choice(n_mayor, n_banco, replace=False)
+    importes_banco = importes[elegidos] + rng.choice([0, 0, ruido, -ruido], n_banco)
+    for j in range(n_banco // 10):
+        a, b = rng.choice(n_mayor, 2, replace=False)
+        if np.sign(importes[a]) == np.sign(importes[b]):
+            importes_banco[j] = importes[a] + importes[b]
+    dias_banco = dias[elegidos] + rng.integers(-4, 5, n_banco)
+    return (
+        armar_mayor(fechas_texto(dias), [f"{x:.2f}".replace(".", ",") for x in importes]),
+        armar_banco(fechas_texto(dias_banco), [f"{x:.2f}".replace(".", ",") for x in importes_banco]),
+    )
+
+
+@pytest.fixture
+def libros():
+    """Un par Mayor/Banco al azar (ver `libros_aleatorios`)."""
+    return libros_aleatorios(0)
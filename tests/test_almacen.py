@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+import json
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from almacen import AlmacenConciliacion, huellas
+from cache_resultados import CacheResultados
+from conftest import armar_banco, armar_mayor, fechas_texto
+from reconciliacion import MetricasConciliacion, normalizar_fragmento
+
+
+def _mayor_csv():
+    """Mayor como llega de un CSV: todo texto."""
+    return armar_mayor(
+        fechas_texto([0, 1, 2]), ["100,00", "-50,25", "1.234,56"],
+        **{"Nro. Comp": ["123", "124", "125"], "CUIT": ["20123456789", "", "30111222333"]},
+    )
+
+
+def _mayor_xlsx():
+    """El mismo Mayor como llega de un xlsx: números como float, fechas como Timestamp, vacíos como NaN."""
+    return armar_mayor(
+        pd.to_datetime(fechas_texto([0, 1, 2]), format="%d/%m/%Y"), [100.0, -50.25, 1234.56],
+        **{"Nro. Comp": [123.0, 124.0, 125.0], "CUIT": [20123456789.0, np.nan, 30111222333.0]},
+    )
+
+
+def test_huella_no_depende_del_formato_de_origen():
+    csv = normalizar_fragmento(_mayor_csv(), "MAYOR")
+    xlsx = normalizar_fragmento(_mayor_xlsx(), "MAYOR")
+    np.testing.assert_array_equal(huellas(csv, "MAYOR"), huellas(xlsx, "MAYOR"))
+
+
+def test_huella_distingue_filas_distintas():
+    mayor = normalizar_fragmento(_mayor_csv().assign(Importe="100,00", Fecha="01/01/2024"), "MAYOR")
+    assert len(set(huellas(mayor, "MAYOR").tolist())) == 3
+
+
+def test_reimportar_en_otro_formato_no_duplica(tmp_path):
+    banco = armar_banco(fechas_texto([0]), ["100,00"])
+    with AlmacenConciliacion(str(tmp_path / "conciliacion.sqlite")) as almacen:
+        primera = almacen.conciliar(_mayor_csv(), banco, 3, 1)
+        segunda = almacen.conciliar(_mayor_xlsx(), banco, 3, 1)
+        detalle = almacen.detalle()
+    assert (primera.nuevas_mayor, primera.nuevas_banco, primera.matches) == (3, 1, 1)
+    assert (segunda.nuevas_mayor, segunda.nuevas_banco, segunda.matches) == (0, 0, 0)
+    assert len(detalle) == 3
+
+
+def test_huellas_viejas_se_recalculan_al_abrir(tmp_path):
+    ruta = str(tmp_path / "conciliacion.sqlite")
+    with AlmacenConciliacion(ruta) as almacen:
+        almacen.conciliar(_mayor_xlsx(), None, 3, 1)
+    # Simula un almacén guardado antes de normalizar el texto de las huellas
+    con = sqlite3.connect(ruta)
+    with con:
+        con.execute("UPDATE mayor SET huella = huella + 1")
+        con.execute("PRAGMA user_version = 0")
+    con.close()
+
+    with AlmacenConciliacion(ruta) as almacen:
+        corrida = almacen.conciliar(_mayor_csv(), None, 3, 1)
+    assert corrida.nuevas_mayor == 0
+
+
+def test_fila_identica_de_un_extracto_posterior_se_guarda(tmp_path):
+    # El segundo extracto trae otra comisión igual del mismo día, pero no la transferencia ya
+    # guardada: no es un reenvío, así que la comisión es nueva
+    primero = armar_banco(fechas_texto([0, 0]), ["-10,00", "500,00"], NUM=["1", "2"], DESCRIPCION=["Comisión", "Transf"])
+    segundo = armar_banco(fechas_texto([0]), ["-10,00"], NUM=["1"], DESCRIPCION=["Comisión"])
+    with AlmacenConciliacion(str(tmp_path / "conciliacion.sqlite")) as almacen:
+        assert almacen.conciliar(None, primero, 3, 1).nuevas_banco == 2
+        assert almacen.conciliar(None, segundo, 3, 1).nuevas_banco == 1
+        # Un acumulado con todo lo anterior y una comisión más agrega solo esa
+        acumulado = pd.concat([primero, segundo, segundo], ignore_index=True)
+        assert almacen.conciliar(None, acumulado, 3, 1).nuevas_banco == 1
+        assert almacen.conciliar(None, acumulado, 3, 1).nuevas_banco == 0
+        assert len(almacen.detalle()) == 4
+
+
+def test_corrida_registra_solo_opciones_simples(tmp_path):
+    banco = armar_banco(fechas_texto([0]), ["100,00"])
+    with AlmacenConciliacion(str(tmp_path / "conciliacion.sqlite")) as almacen:
+        almacen.conciliar(
+            _mayor_csv(), banco, 3, 1, tolerancia_valor=0.5, cache=CacheResultados(str(tmp_path / "cache")),
+            metricas=MetricasConciliacion(), progreso=lambda *_: None,
+        )
+        parametros = json.loads(almacen.corridas()["parametros"].iloc[0])
+    assert parametros == {"tolerancia_dias": 3, "max_items_grupo": 1, "tolerancia_valor": 0.5}
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import io
+import sys
+
+import pandas as pd
+import pytest
+
+import lote
+from conftest import libros_aleatorios
+from ingesta import guardar_instantanea, leer_banco, leer_instantanea, leer_lado, leer_mayor
+from reconciliacion import conciliacion_mvp
+
+
+def _csv(df: pd.DataFrame, sep: str = ",") -> bytes:
+    return df.to_csv(index=False, sep=sep).encode("utf-8")
+
+
+def _textos(df: pd.DataFrame) -> pd.DataFrame:
+    """Valores comparables entre lecturas: texto sin nulos y tipos numéricos tal cual."""
+    return df.astype(object).where(df.notna(), "").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("importes, esperados, sep", [
+    (["1234.56", "-50.25"], [1234.56, -50.25], ","),
+    (["1.234,56", "-50,25"], [1234.56, -50.25], ";"),
+])
+def test_csv_lee_importes_con_cualquier_separador_decimal(importes, esperados, sep):
+    _, banco = libros_aleatorios(0, n_banco=2)
+    banco["IMPORTE"] = importes
+    leido = leer_banco(io.BytesIO(_csv(banco, sep)), "banco.csv")
+    assert leido["Importe_norm"].tolist() == esperados
+    assert leido["IMPORTE"].tolist() == importes
+
+
+def test_csv_descarta_filas_invalidas():
+    mayor, _ = libros_aleatorios(0, n_mayor=5, n_banco=2)
+    mayor.loc[1, "Fecha"] = "sin fecha"
+    mayor.loc[3, "Importe"] = "abc"
+    leido = leer_mayor(io.BytesIO(_csv(mayor)), "mayor.csv")
+    assert len(leido) == 3
+    assert leido.attrs["rechazos"] == {"filas": 2, "importe": 1, "fecha": 1}
+
+
+@pytest.mark.parametrize("en_disco", [True, False])
+def test_instantanea_ida_y_vuelta(tmp_path, en_disco):
+    mayor, banco = libros_aleatorios(3)
+    leidos = {
+        "MAYOR": leer_mayor(io.BytesIO(_csv(mayor)), "mayor.csv"),
+        "BANCO": leer_banco(io.BytesIO(_csv(banco)), "banco.csv"),
+    }
+    abiertos = {}
+    for lado, df in leidos.items():
+        if en_disco:
+            ruta = str(tmp_path / f"{lado}.arrow")
+            guardar_instantanea(df, lado, ruta)
+            abiertos[lado] = leer_instantanea(ruta, lado)
+            # `leer_lado` también reconoce la instantánea y no la vuelve a normalizar
+            pd.testing.assert_frame_equal(leer_lado(ruta, lado), abiertos[lado])
+        else:
+            destino = io.BytesIO()
+            guardar_instantanea(df, lado, destino)
+            abiertos[lado] = leer_instantanea(io.BytesIO(destino.getvalue()), lado)
+
+        assert list(abiertos[lado].columns) == list(df.columns)
+        pd.testing.assert_frame_equal(_textos(abiertos[lado]), _textos(df), check_dtype=False)
+        assert abiertos[lado].attrs == df.attrs
+
+    directo, _ = conciliacion_mvp(leidos["MAYOR"], leidos["BANCO"], 3, 3, salida="ids")
+    desde_instantanea, _ = conciliacion_mvp(abiertos["MAYOR"], abiertos["BANCO"], 3, 3, salida="ids")
+    pd.testing.assert_frame_equal(directo, desde_instantanea)
+
+
+def test_instantanea_de_otro_lado_o_archivo_comun(tmp_path):
+    mayor, _ = libros_aleatorios(0)
+    leido = leer_mayor(io.BytesIO(_csv(mayor)), "mayor.csv")
+    ruta = str(tmp_path / "mayor.arrow")
+    guardar_instantanea(leido, "MAYOR", ruta)
+    with pytest.raises(ValueError, match="instantánea del Banco"):
+        leer_instantanea(ruta, "BANCO")
+
+    comun = str(tmp_path / "comun.arrow")
+    mayor.to_feather(comun)
+    with pytest.raises(ValueError, match="no es una instantánea"):
+        leer_instantanea(comun, "MAYOR")
+    # Un Arrow común se lee y normaliza como cualquier otro archivo
+    pd.testing.assert_frame_equal(_textos(leer_mayor(comun)), _textos(leido), check_dtype=False)
+
+
+def test_parquet_igual_que_csv(tmp_path):
+    mayor, _ = libros_aleatorios(1)
+    ruta = str(tmp_path / "mayor.parquet")
+    mayor.to_parquet(ruta, index=False)
+    desde_csv = leer_mayor(io.BytesIO(_csv(mayor)), "mayor.csv")
+    pd.testing.assert_frame_equal(_textos(leer_mayor(ruta)), _textos(desde_csv), check_dtype=False)
+
+
+def test_sin_pyarrow_el_lote_lee_sin_instantaneas(tmp_path, monkeypatch):
+    mayor, _ = libros_aleatorios(0)
+    ruta = tmp_path / "mayor.csv"
+    ruta.write_bytes(_csv(mayor))
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+
+    with pytest.raises(ImportError, match="requiere pyarrow"):
+        guardar_instantanea(leer_mayor(str(ruta)), "MAYOR", str(tmp_path / "mayor.arrow"))
+    with pytest.warns(UserWarning, match="requieren pyarrow"):
+        leido = lote._leer(str(ruta), "MAYOR", str(tmp_path / "instantaneas"))
+    assert len(leido) == len(mayor)
+    assert not (tmp_path / "instantaneas").exists()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Paridad con la conciliación original, la que recorría el Banco con iterrows y filtraba el Mayor
+con máscaras. `datos/paridad.csv` guarda los pares que devolvía en cada caso. Los libros se arman
+sin competencia entre movimientos del Banco por una misma partida, así el resultado no depende
+del orden en que se recorren.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import armar_banco, armar_mayor, fechas_texto
+from reconciliacion import conciliacion_mvp
+
+_COLUMNAS = ["NUM_BANCO", "Nro. Comp_MAYOR", "estado", "regla", "diferencia_dias"]
+_ESPERADO = pd.read_csv(
+    os.path.join(os.path.dirname(__file__), "datos", "paridad.csv"), dtype=str, keep_default_na=False
+)
+
+
+def _texto(x: float) -> str:
+    return f"{x:.2f}".replace(".", ",")
+
+
+def libros_sin_competencia(semilla: int, n_banco: int = 80, ruido: float = 0.0):
+    """
+    Cada movimiento del Banco tiene un importe propio (múltiplo de 10) que aparece de cero a tres
+    veces en el Mayor, con fechas corridas hasta cuatro días.
+    """
+    rng = np.random.default_rng(semilla)
+    importes = rng.choice(np.arange(1, 1000), n_banco, replace=False) * 10.0 * rng.choice([1, -1], n_banco)
+    dias = rng.integers(5, 35, n_banco)
+    copias = rng.integers(0, 4, n_banco)
+    importes_mayor = np.repeat(importes, copias)
+    dias_mayor = np.repeat(dias, copias) + rng.integers(-4, 5, len(importes_mayor))
+    importes_banco = importes + rng.choice([0, 0, ruido, -ruido], n_banco)
+
+    orden = rng.permutation(len(importes_mayor))
+    return (
+        armar_mayor(fechas_texto(dias_mayor[orden]), [_texto(x) for x in importes_mayor[orden]]),
+        armar_banco(fechas_texto(dias), [_texto(x) for x in importes_banco]),
+    )
+
+
+def _pares(detalle: pd.DataFrame) -> pd.DataFrame:
+    """Filas con ambos lados como texto, ordenadas por movimiento del Banco y partida del Mayor."""
+    filas = detalle[detalle["Nro. Comp_MAYOR"].notna() & detalle["NUM_BANCO"].notna()]
+    pares = pd.DataFrame({
+        "NUM_BANCO": filas["NUM_BANCO"].astype(int),
+        "Nro. Comp_MAYOR": filas["Nro. Comp_MAYOR"].astype(int),
+        "estado": filas["estado"].astype(str),
+        "regla": filas["regla"].astype(str),
+        "diferencia_dias": filas["diferencia_dias"].astype(int),
+    })
+    return pares.sort_values(["NUM_BANCO", "Nro. Comp_MAYOR"]).astype(str).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("semilla", range(3))
+@pytest.mark.parametrize("tolerancia_valor", [0.0, 0.5])
+@pytest.mark.parametrize("tolerancia_dias", [1, 3])
+def test_mismos_pares_que_la_version_original(semilla, tolerancia_valor, tolerancia_dias):
+    mayor, banco = libros_sin_competencia(semilla, ruido=0.25 if tolerancia_valor else 0.0)
+    detalle, _ = conciliacion_mvp(mayor, banco, tolerancia_dias, 1, tolerancia_valor=tolerancia_valor)
+
+    caso = _ESPERADO["caso"] == f"{semilla}-{tolerancia_valor}-{tolerancia_dias}"
+    esperado = _ESPERADO.loc[caso, _COLUMNAS].reset_index(drop=True)
+    pd.testing.assert_frame_equal(_pares(detalle), esperado)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from reconciliacion import parsear_fechas, parsear_importes
+
+
+def _dia(fecha: str) -> int:
+    return int((pd.Timestamp(fecha) - pd.Timestamp("1970-01-01")).days)
+
+
+# --- Importes ---
+
+@pytest.mark.parametrize("textos, centavos, formato", [
+    (["1.234,56", "-50,25", "0,5", "100"], [123456, -5025, 50, 10000], "coma_decimal"),
+    (["1,234.56", "-50.25", "0.5", "100"], [123456, -5025, 50, 10000], "punto_decimal"),
+    # Decimales con punto sin separador de miles, como los exporta cualquier sistema
+    (["1234.56", "12.5", "-3.10"], [123456, 1250, -310], "punto_decimal"),
+])
+def test_importes_en_texto_segun_el_separador_decimal(textos, centavos, formato):
+    importes = parsear_importes(pd.Series(textos, dtype=object))
+    assert importes.formato == formato
+    assert importes.centavos.tolist() == centavos
+    assert importes.validos.all()
+
+
+@pytest.mark.parametrize("texto, valor", [
+    ("-1.000,00", -1000.0),
+    ("1.000,00-", -1000.0),
+    ("(1.000,00)", -1000.0),
+    ("+1.000,00", 1000.0),
+    ("$ 1.000,00", 1000.0),
+    (" 1.000,00 ", 1000.0),
+])
+def test_importes_con_signo_y_adornos(texto, valor):
+    importes = parsear_importes(pd.Series([texto, "1,50"], dtype=object))
+    assert importes.valores[0] == valor
+
+
+@pytest.mark.parametrize("texto", ["abc", "", "1,2,3", "--5", "1-2", "(10", "10)", "1" * 20])
+def test_importes_invalidos_se_rechazan(texto):
+    importes = parsear_importes(pd.Series([texto, "1,50", None], dtype=object))
+    assert importes.validos.tolist() == [False, True, False]
+    assert np.isnan(importes.valores[0]) and importes.centavos[0] == 0
+    assert importes.rechazados == 2
+
+
+def test_centavos_exactos_con_redondeo_a_la_mitad_hacia_arriba():
+    textos = ["99.999.999.999.999,99", "-12.345.678.901.234,56", "1,005", "-1,005", "1,0049", "0,0050"]
+    importes = parsear_importes(pd.Series(textos, dtype=object))
+    assert importes.centavos.tolist() == [9999999999999999, -1234567890123456, 101, -101, 100, 1]
+    assert importes.validos.all()
+
+
+def test_importes_con_decimales_de_mas_se_rechazan():
+    # Los ceros de más no cambian el valor; cualquier otro dígito después del cuarto decimal sí
+    importes = parsear_importes(pd.Series(["1,50000", "1,00001", "2,123456"], dtype=object))
+    assert importes.validos.tolist() == [True, False, False]
+    assert importes.centavos.tolist() == [150, 0, 0]
+
+
+def test_importes_numericos_se_toman_tal_cual():
+    importes = parsear_importes(pd.Series([1.5, -2.25, np.nan]))
+    assert importes.formato is None
+    assert importes.centavos.tolist() == [150, -225, 0]
+    assert importes.validos.tolist() == [True, True, False]
+
+
+def test_formato_de_importe_explicito():
+    importes = parsear_importes(pd.Series(["1.234"], dtype=object), formato="punto_decimal")
+    assert importes.valores.tolist() == [1.234]
+    with pytest.raises(ValueError):
+        parsear_importes(pd.Series(["1"], dtype=object), formato="otro")
+
+
+# --- Fechas ---
+
+@pytest.mark.parametrize("textos, formato", [
+    (["01/02/2024", "31/12/2023"], "%d/%m/%Y"),
+    (["2024-02-01", "2023-12-31"], "ISO8601"),
+    (["01-02-2024", "31-12-2023"], "%d-%m-%Y"),
+    (["01.02.2024", "31.12.2023"], "%d.%m.%Y"),
+    (["01/02/24", "31/12/23"], "%d/%m/%y"),
+])
+def test_fechas_en_texto_segun_el_formato(textos, formato):
+    fechas = parsear_fechas(pd.Series(textos, dtype=object))
+    assert fechas.formato == formato
+    assert fechas.dias.tolist() == [_dia("2024-02-01"), _dia("2023-12-31")]
+
+
+def test_fechas_de_excel_y_nativas():
+    assert parsear_fechas(pd.Series([45323, 45323.75])).dias.tolist() == [_dia("2024-02-01")] * 2
+    nativas = pd.Series(pd.to_datetime(["2024-02-01 10:00"]).tz_localize("America/Argentina/Buenos_Aires"))
+    assert parsear_fechas(nativas).dias.tolist() == [_dia("2024-02-01")]
+    mezcla = pd.Series([pd.Timestamp("2024-02-01"), "31/12/2023", 45323], dtype=object)
+    assert parsear_fechas(mezcla).dias.tolist() == [_dia("2024-02-01"), _dia("2023-12-31"), _dia("2024-02-01")]
+
+
+def test_fechas_invalidas_se_rechazan():
+    fechas = parsear_fechas(pd.Series(["01/02/2024", "32/01/2024", "mañana", "", None], dtype=object))
+    assert fechas.validos.tolist() == [True, False, False, False, False]
+    assert fechas.dias[1:].tolist() == [0, 0, 0, 0]
+    assert fechas.rechazados == 4
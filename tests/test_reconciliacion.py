@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.optimize import linear_sum_assignment
+
+import reconciliacion as rec
+from exportacion import exportar
+from conftest import armar_banco, armar_mayor, fechas_texto, libros_aleatorios
+
+
+def _pares(detalle):
+    """Cantidad de filas conciliadas (con ambos lados) de un detalle `salida="ids"`."""
+    return int((detalle["fila_mayor"].notna() & detalle["fila_banco"].notna()).sum())
+
+
+# --- One-to-one óptimo ---
+
+def _referencia_densa(mayor, banco, tolerancia_dias, tolerancia_cent):
+    """Cantidad de pares y costo de la asignación óptima resuelta con una matriz densa."""
+    rid_m, rid_b, diff_days, diff_cent = rec._aristas_candidatas(
+        mayor, banco, tolerancia_dias, tolerancia_cent, set(), set()
+    )
+    costo = diff_days * (tolerancia_cent + 1) + diff_cent
+    _, fi = np.unique(rid_m, return_inverse=True)
+    _, ci = np.unique(rid_b, return_inverse=True)
+    premio = (int(costo.max()) + 1) * (len(costo) + 1)
+    matriz = np.zeros((fi.max() + 1, ci.max() + 1), dtype=np.int64)
+    real = np.zeros_like(matriz, dtype=bool)
+    matriz[fi, ci] = costo - premio
+    real[fi, ci] = True
+    r, k = linear_sum_assignment(matriz)
+    ok = real[r, k]
+    return int(ok.sum()), int((matriz[r, k][ok] + premio).sum())
+
+
+@pytest.mark.parametrize("semilla", range(6))
+@pytest.mark.parametrize("tolerancia_dias, tolerancia_cent", [(1, 0), (3, 50), (10, 300)])
+def test_optimo_coincide_con_asignacion_densa(semilla, tolerancia_dias, tolerancia_cent):
+    df_m, df_b = libros_aleatorios(semilla, ruido=0.25 if tolerancia_cent else 0.0)
+    mayor, banco = rec.LibroNormalizado(df_m, "MAYOR"), rec.LibroNormalizado(df_b, "BANCO")
+    matches = rec._one_to_one_optimo(mayor, banco, tolerancia_dias, tolerancia_cent, set(), set())
+
+    imp_m = dict(zip(mayor.rid.tolist(), mayor.imp.tolist()))
+    imp_b = dict(zip(banco.rid.tolist(), banco.imp.tolist()))
+    diff_cent = np.array([abs(imp_m[m] - imp_b[b]) for m, b in zip(matches.mayor.tolist(), matches.banco.tolist())])
+    costo = int((matches.dias.astype(np.int64) * (tolerancia_cent + 1) + diff_cent).sum())
+    assert (len(matches.mayor), costo) == _referencia_densa(mayor, banco, tolerancia_dias, tolerancia_cent)
+    assert len(set(matches.mayor)) == len(matches.mayor) and len(set(matches.banco)) == len(matches.banco)
+
+
+def test_optimo_concilia_pares_que_greedy_pierde():
+    # Sin pares exactos: B0 toma M0 (mismo día) en greedy y B1, que solo alcanza a M0, queda sin par
+    mayor = armar_mayor(fechas_texto([10, 11]), ["100,00", "100,00"])
+    banco = armar_banco(fechas_texto([10, 8]), ["100,01", "100,01"])
+    greedy, _ = rec.conciliacion_mvp(mayor, banco, 2, 1, tolerancia_valor=0.01, salida="ids")
+    optimo, _ = rec.conciliacion_mvp(
+        mayor, banco, 2, 1, tolerancia_valor=0.01, modo_asignacion="optimo", salida="ids"
+    )
+    assert _pares(greedy) == 1
+    assert _pares(optimo) == 2
+
+
+@pytest.mark.parametrize("semilla", range(4))
+def test_optimo_nunca_concilia_menos_que_greedy(semilla):
+    mayor, banco = libros_aleatorios(semilla, ruido=0.25)
+    greedy, _ = rec.conciliacion_mvp(mayor, banco, 5, 1, tolerancia_valor=0.5, salida="ids")
+    optimo, _ = rec.conciliacion_mvp(mayor, banco, 5, 1, tolerancia_valor=0.5, modo_asignacion="optimo", salida="ids")
+    assert _pares(optimo) >= _pares(greedy)
+
+
+# --- Serie y multiproceso ---
+
+def _casos_paralelo():
+    mayor, banco = libros_aleatorios(1, n_mayor=300, n_banco=240, ruido=0.25)
+    positivos = mayor[~mayor["Importe"].str.startswith("-")].reset_index(drop=True)
+    return {
+        "completo": (mayor, banco),
+        "mayor_vacio": (mayor.iloc[:0], banco),
+        "banco_vacio": (mayor, banco.iloc[:0]),
+        "mayor_sin_filas_validas": (mayor.assign(Fecha="sin fecha"), banco),
+        "mayor_de_un_signo": (positivos, banco),
+    }
+
+
+@pytest.mark.parametrize("caso", list(_casos_paralelo()))
+@pytest.mark.parametrize("max_items, direccion", [(1, "MAYOR→BANCO"), (3, "AMBAS")])
+def test_multiproceso_igual_a_un_proceso(monkeypatch, caso, max_items, direccion):
+    monkeypatch.setattr(rec, "_MIN_OBJETIVOS_PARALELO", 10)
+    mayor, banco = _casos_paralelo()[caso]
+    serie, resumen_serie = rec.conciliacion_mvp(
+        mayor, banco, 3, max_items, direccion=direccion, tolerancia_valor=0.5, salida="ids"
+    )
+    paralelo, resumen_paralelo = rec.conciliacion_mvp(
+        mayor, banco, 3, max_items, direccion=direccion, tolerancia_valor=0.5, salida="ids", procesos=2
+    )
+    pd.testing.assert_frame_equal(serie, paralelo)
+    pd.testing.assert_frame_equal(resumen_serie, resumen_paralelo)
+
+
+# --- Unión con un resultado previo ---
+
+def test_merge_conserva_comprobantes_iguales_en_distintas_cuentas():
+    mayor = armar_mayor(fechas_texto([0, 0]), ["100,00", "100,00"], Cuenta=["A", "B"], **{"Nro. Comp": ["1", "1"]})
+    banco = armar_banco(fechas_texto([0, 0]), ["100,00", "100,00"], NUM=["7", "7"])
+    nuevo, _ = rec.conciliacion_mvp(mayor, banco, 3, 1)
+
+    assert len(rec.merge_with_previous(nuevo.iloc[:0], nuevo)) == 2
+    unido = rec.merge_with_previous(nuevo.iloc[:1], nuevo)
+    assert unido["Cuenta_MAYOR"].tolist() == ["A", "B"]
+
+
+@pytest.mark.parametrize("saldos", [["900,00", "800,00"], ["900,00", "900,00"]])
+def test_merge_conserva_filas_repetidas_del_nuevo(saldos):
+    # Dos comisiones idénticas del mismo día, con o sin el mismo saldo
+    banco = armar_banco(fechas_texto([3, 3]), ["-100,00", "-100,00"], NUM=["7", "7"], SALDO=saldos)
+    nuevo, _ = rec.conciliacion_mvp(armar_mayor([], []), banco, 3, 1)
+
+    assert len(rec.merge_with_previous(nuevo.iloc[:0], nuevo)) == 2
+    # Solo se descartan tantas repeticiones como trae el previo
+    assert len(rec.merge_with_previous(nuevo.iloc[:1], nuevo)) == 2
+    assert len(rec.merge_with_previous(nuevo, nuevo)) == 2
+
+
+@pytest.mark.parametrize("formato", ["xlsx", "csv"])
+def test_merge_reconoce_el_previo_exportado(formato):
+    mayor, banco = libros_aleatorios(2, ruido=0.25)
+    detalle, resumen = rec.conciliacion_mvp(mayor, banco, 3, 3, tolerancia_valor=0.5)
+    datos = io.BytesIO(exportar(detalle, resumen, formato))
+    previo = pd.read_excel(datos, sheet_name="Detalle") if formato == "xlsx" else pd.read_csv(datos)
+
+    # Del previo se descartan los "Solo en Mayor" y del nuevo todo lo demás, que ya estaba
+    unido = rec.merge_with_previous(previo, detalle)
+    assert len(unido) == len(detalle)
+    assert (unido["estado"] == "Solo en Mayor").sum() == (detalle["estado"] == "Solo en Mayor").sum()
+
+
+# --- Agrupación ---
+
+def test_agrupacion_encuentra_el_grupo_exacto():
+    mayor = armar_mayor(fechas_texto([0, 1, 2, 2]), ["60,00", "40,00", "25,00", "999,00"])
+    banco = armar_banco(fechas_texto([1]), ["125,00"])
+    detalle, _ = rec.conciliacion_mvp(mayor, banco, 3, 3)
+    grupo = detalle[detalle["estado"] == "Conciliado por agrupación"]
+    assert sorted(grupo["Nro. Comp_MAYOR"].astype(int)) == [0, 1, 2]
+    assert grupo["grupo_id"].nunique() == 1
+
+
+def test_agrupacion_no_se_corta_con_muchos_candidatos():
+    # 40 candidatos del mismo día que no suman el objetivo (centavos impares) antes que los
+    # miembros, a un día: una búsqueda con tope de nodos se agota antes de llegar a ellos
+    importes = [f"{100 + i},01" for i in range(40)] + ["1001,00", "1002,00", "1003,00"]
+    mayor = armar_mayor(fechas_texto([1] * 40 + [0] * 3), importes)
+    banco = armar_banco(fechas_texto([1]), ["3006,00"])
+    detalle, _ = rec.conciliacion_mvp(mayor, banco, 3, 3)
+    grupo = detalle[detalle["estado"] == "Conciliado por agrupación"]
+    assert sorted(grupo["Nro. Comp_MAYOR"].astype(int)) == [40, 41, 42]
+
+
+def test_candidatos_grupo_amplia_la_busqueda():
+    # 60 candidatos del mismo día que no suman el objetivo y los 5 miembros a dos días: con el
+    # prefijo por defecto para grupos de 5 (50 candidatos) los miembros quedan afuera
+    importes = [4100 + i for i in range(60)] + [1001, 1002, 1003, 1004, 1005]
+    mayor = armar_mayor(fechas_texto([0] * 60 + [2] * 5), [f"{x},00" for x in importes])
+    banco = armar_banco(fechas_texto([0]), [f"{sum(importes[60:])},00"])
+
+    metricas = rec.MetricasConciliacion()
+    detalle, _ = rec.conciliacion_mvp(mayor, banco, 3, 5, metricas=metricas)
+    assert not (detalle["estado"] == "Conciliado por agrupación").any()
+    assert metricas.tabla().set_index("fase").loc["agrupacion MAYOR→BANCO", "truncados"] == 1
+
+    detalle, _ = rec.conciliacion_mvp(mayor, banco, 3, 5, candidatos_grupo=70)
+    assert (detalle["estado"] == "Conciliado por agrupación").sum() == 5
+    with pytest.raises(ValueError):
+        rec.conciliacion_mvp(mayor, banco, 3, 5, candidatos_grupo=0)
+
+
+def test_agrupacion_con_importes_iguales_acota_los_pares():
+    # 1500 importes iguales dan más de un millón de pares de mitades para grupos de 2: se cruza
+    # hasta el presupuesto, el grupo igual se encuentra y el objetivo se informa como truncado
+    mayor = armar_mayor(fechas_texto([0] * 1500), ["100,00"] * 1500)
+    banco = armar_banco(fechas_texto([0]), ["200,00"])
+    metricas = rec.MetricasConciliacion()
+    detalle, _ = rec.conciliacion_mvp(mayor, banco, 3, 3, metricas=metricas)
+    assert (detalle["estado"] == "Conciliado por agrupación").sum() == 2
+    assert metricas.tabla().set_index("fase").loc["agrupacion MAYOR→BANCO", "truncados"] == 1
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Índice del detalle para la vista de resultados.
+
+Con cientos de miles de filas, mandar el detalle completo al navegador en cada corrida del
+script hace lenta cada interacción. `IndiceDetalle` se arma una vez por resultado: cuenta los
+estados en una sola pasada sobre códigos categóricos, guarda las posiciones de cada estado y de
+cada grupo y los arrays de día e importe, y con eso filtra y pagina sin recorrer el DataFrame;
+solo la página pedida se convierte para mostrar.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Día que se usa para las filas sin fecha: queda fuera de cualquier rango
+_SIN_DIA = np.iinfo(np.int64).min
+
+
+def _posiciones_por_codigo(codigos: np.ndarray, cantidad: int) -> list[np.ndarray]:
+    """Posiciones (ordenadas) de las filas de cada código; las de código -1 no entran."""
+    orden = np.argsort(codigos, kind="stable")
+    cortes = np.searchsorted(codigos[orden], np.arange(cantidad + 1))
+    return [orden[cortes[i]:cortes[i + 1]] for i in range(cantidad)]
+
+
+def _columna_por_lado(detalle: pd.DataFrame, nombre: str) -> pd.Series | None:
+    """La columna del Mayor completada con la del Banco donde falta, si existen."""
+    columnas = [f"{nombre}_MAYOR", f"{nombre}_BANCO"]
+    if not all(c in detalle.columns for c in columnas):
+        return None
+    return detalle[columnas[0]].fillna(detalle[columnas[1]])
+
+
+class IndiceDetalle:
+    """
+    Conteos, posiciones por estado y por grupo, y día e importe de cada fila de un detalle.
+
+    La fecha y el importe de una fila son los del Mayor o, si no tiene, los del Banco; el
+    importe se compara en valor absoluto.
+    """
+
+    def __init__(self, detalle: pd.DataFrame):
+        self.detalle = detalle
+        # Un estado categórico conserva el orden de sus categorías; las que no tienen filas no se listan
+        estado = pd.Categorical(detalle["estado"]) if "estado" in detalle.columns else pd.Categorical([])
+        estado = estado.remove_unused_categories()
+        self.estados: list[str] = list(estado.categories)
+        codigos = estado.codes
+        self.conteos = pd.Series(
+            np.bincount(codigos[codigos >= 0], minlength=len(self.estados)), index=self.estados, dtype=np.int64
+        )
+        self._por_estado = dict(zip(self.estados, _posiciones_por_codigo(codigos, len(self.estados))))
+
+        if "grupo_id" in detalle.columns:
+            grupo = detalle["grupo_id"]
+            codigos_grupo, grupos = pd.factorize(grupo.where(grupo != ""))
+        else:
+            codigos_grupo, grupos = np.full(len(detalle), -1), pd.Index([])
+        self._grupos = pd.Index(grupos)
+        self._por_grupo = _posiciones_por_codigo(codigos_grupo, len(grupos))
+
+        fechas = _columna_por_lado(detalle, "Fecha_norm")
+        self.dias = None
+        if fechas is not None:
+            dias = pd.to_datetime(fechas).to_numpy(dtype="datetime64[D]")
+            self.dias = np.where(np.isnat(dias), _SIN_DIA, dias.astype(np.int64))
+        importes = _columna_por_lado(detalle, "Importe_norm")
+        self.importes = None if importes is None else np.abs(importes.to_numpy(dtype=float))
+
+    def __len__(self) -> int:
+        return len(self.detalle)
+
+    @property
+    def conciliados(self) -> int:
+        return int(self.conteos[[e for e in self.estados if e.startswith("Conciliado")]].sum())
+
+    def cantidad(self, estado: str) -> int:
+        return int(self.conteos.get(estado, 0))
+
+    def rango_fechas(self) -> tuple | None:
+        """(primera, última) fecha del detalle, o None si no hay fechas."""
+        if self.dias is None or not (self.dias != _SIN_DIA).any():
+            return None
+        validos = self.dias[self.dias != _SIN_DIA]
+        return tuple(pd.to_datetime([validos.min(), validos.max()], unit="D").date)
+
+    def filtrar(
+        self,
+        estados: list[str] | None = None,
+        grupo_id: str | None = None,
+        desde=None,
+        hasta=None,
+        importe_min: float | None = None,
+        importe_max: float | None = None,
+    ) -> np.ndarray:
+        """
+        Posiciones de las filas que cumplen todos los filtros dados, en el orden del detalle.
+
+        `desde`/`hasta` son fechas inclusivas; `importe_min`/`importe_max`, en valor absoluto.
+        """
+        if grupo_id:
+            loc = self._grupos.get_indexer([grupo_id])[0]
+            posiciones = self._por_grupo[loc] if loc >= 0 else np.empty(0, dtype=np.int64)
+            if estados is not None:
+                posiciones = posiciones[np.isin(posiciones, self.posiciones_estados(estados))]
+        elif estados is not None:
+            posiciones = self.posiciones_estados(estados)
+        else:
+            posiciones = np.arange(len(self.detalle))
+
+        if self.dias is not None and (desde is not None or hasta is not None):
+            dias = self.dias[posiciones]
+            ok = dias != _SIN_DIA
+            if desde is not None:
+                ok &= dias >= pd.Timestamp(desde).to_datetime64().astype("datetime64[D]").astype(np.int64)
+            if hasta is not None:
+                ok &= dias <= pd.Timestamp(hasta).to_datetime64().astype("datetime64[D]").astype(np.int64)
+            posiciones = posiciones[ok]
+        if self.importes is not None and (importe_min is not None or importe_max is not None):
+            importes = self.importes[posiciones]
+            ok = ~np.isnan(importes)
+            if importe_min is not None:
+                ok &= importes >= importe_min
+            if importe_max is not None:
+                ok &= importes <= importe_max
+            posiciones = posiciones[ok]
+        return posiciones
+
+    def posiciones_estados(self, estados: list[str]) -> np.ndarray:
+        """Posiciones ordenadas de las filas con alguno de `estados`."""
+        partes = [self._por_estado[e] for e in estados if e in self._por_estado]
+        if not partes:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(partes))
+
+    def pagina(self, posiciones: np.ndarray, numero: int, tamano: int) -> pd.DataFrame:
+        """Filas de la página `numero` (desde 1) de `posiciones`, con el índice original del detalle."""
+        if tamano < 1:
+            raise ValueError("tamano debe ser mayor que cero")
+        inicio = (max(numero, 1) - 1) * tamano
+        return self.detalle.iloc[posiciones[inicio:inicio + tamano]]